@@ -1,43 +1,56 @@
 
 from fastapi import HTTPException, Depends, Header
-from sqlalchemy.orm import Session
-from passlib.hash import bcrypt
-from .database import get_db
+from sqlalchemy import select
+from .database import DBSession, get_db
+from .hashing import hash_password, verify_password
 from .models.models import User
+from .tokens import token_store
+import os
 import secrets
 
-# naive token store (demo only)
-TOKENS: dict[str, int] = {}
+# Bearer token for /admin; the endpoints refuse everyone while it is unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
 
-def hash_pw(pw: str) -> str:
-    return bcrypt.hash(pw)
-
-def verify_pw(pw: str, hashed: str) -> bool:
-    return bcrypt.verify(pw, hashed)
-
-def create_user(db: Session, username: str, password: str) -> User:
-    if db.query(User).filter(User.username == username).first():
+async def create_user(db: DBSession, username: str, password: str) -> User:
+    if await db.scalar(select(User).where(User.username == username)):
         raise HTTPException(status_code=400, detail="Username already exists")
-    u = User(username=username, password_hash=hash_pw(password))
+    u = User(username=username, password_hash=await hash_password(password))
     db.add(u)
-    db.commit()
-    db.refresh(u)
+    await db.commit()
+    await db.refresh(u)
     return u
 
-def login_user(db: Session, username: str, password: str) -> str:
-    u = db.query(User).filter(User.username == username).first()
-    if not u or not verify_pw(password, u.password_hash):
+async def login_user(db: DBSession, username: str, password: str) -> str:
+    u = await db.scalar(select(User).where(User.username == username))
+    if not u:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    ok, new_hash = await verify_password(password, u.password_hash)
+    if not ok:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made: upgrade it transparently
+        u.password_hash = new_hash
+        await db.commit()
+    return await issue_token(db, u.id)
+
+async def issue_token(db: DBSession, user_id: int) -> str:
     token = secrets.token_hex(16)
-    TOKENS[token] = u.id
+    await token_store.put(db, token, user_id)
     return token
 
-def get_current_user_id(authorization: str = Header(None)) -> int:
+def bearer_token(authorization: str = Header(None)) -> str:
     # Expect "Bearer <token>"
     if not authorization or not authorization.lower().startswith("bearer "):
         raise HTTPException(status_code=401, detail="Missing or invalid Authorization header")
-    token = authorization.split()[1]
-    user_id = TOKENS.get(token)
+    return authorization.split()[1]
+
+async def get_current_user_id(token: str = Depends(bearer_token), db: DBSession = Depends(get_db)) -> int:
+    user_id = await token_store.get(db, token)
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
     return user_id
+
+def require_admin(token: str = Depends(bearer_token)) -> None:
+    # anyone can sign up, so a user session is not enough: operators send ADMIN_TOKEN
+    if not ADMIN_TOKEN or not secrets.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
@@ -0,0 +1,86 @@
+import json
+from itertools import islice
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select
+
+from .database import DBSession
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_BATCH_SIZE = 10000
+
+
+async def bulk_body(request: Request) -> list:
+    """
+    Dependency: the request body as a list of items, sent either as a JSON
+    array or as NDJSON (one object per line, Content-Type application/x-ndjson).
+    """
+    body = await request.body()
+    try:
+        if "ndjson" in request.headers.get("content-type", ""):
+            return [json.loads(line) for line in body.splitlines() if line.strip()]
+        items = json.loads(body)
+    except ValueError:
+        raise HTTPException(400, "Invalid JSON body")
+    if not isinstance(items, list):
+        raise HTTPException(400, "Expected a JSON array")
+    return items
+
+
+def _error_text(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+
+
+async def existing_ids(db: DBSession, model, ids) -> set[int]:
+    """Which of `ids` exist in `model`'s table, in a single IN query."""
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return set()
+    return set(await db.scalars(select(model.id).where(model.id.in_(ids))))
+
+
+async def _dump_all(db: DBSession, batch: list):
+    return [(i, payload.model_dump()) for i, payload in batch], []
+
+
+async def run_bulk(db: DBSession, items: list, schema: type[BaseModel], model, batch_size: int,
+                   prepare=_dump_all, on_insert=None) -> list[dict]:
+    """
+    Validate `items` against `schema` and insert the valid ones into `model`
+    `batch_size` rows at a time (one multi-row INSERT ... RETURNING and one
+    commit per batch).
+
+    `await prepare(db, batch)` receives `[(index, payload), ...]` and returns
+    `(rows, errors)`: `[(index, column_dict), ...]` to insert and
+    `[{"index", "error"}, ...]` for rows it rejects (e.g. unknown references);
+    the default inserts every validated payload as-is. `await on_insert(db,
+    column_dicts, ids)` runs after each INSERT, in the same transaction (e.g. to
+    maintain derived tables or queue jobs).
+    Returns one `{"index", "id"}` or `{"index", "error"}` result per item.
+    """
+    results = []
+    valid = []
+    for i, item in enumerate(items):
+        try:
+            valid.append((i, schema.model_validate(item)))
+        except ValidationError as e:
+            results.append({"index": i, "error": _error_text(e)})
+
+    it = iter(valid)
+    while batch := list(islice(it, batch_size)):
+        rows, errors = await prepare(db, batch)
+        results += errors
+        if not rows:
+            continue
+        ids = (await db.scalars(
+            insert(model).returning(model.id, sort_by_parameter_order=True),
+            [r for _, r in rows],
+        )).all()
+        if on_insert is not None:
+            await on_insert(db, [r for _, r in rows], ids)
+        await db.commit()
+        results += [{"index": i, "id": id_} for (i, _), id_ in zip(rows, ids)]
+
+    results.sort(key=lambda r: r["index"])
+    return results
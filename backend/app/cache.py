@@ -0,0 +1,97 @@
+"""
+In-process cache for serialized list responses.
+
+Entries are grouped by namespace ("doctors", "patients"); write handlers call
+invalidate(namespace) after committing, so the worker that took the write
+never serves stale data. Other workers pick the change up within
+LIST_CACHE_TTL_SECONDS. Responses carry an ETag and a matching
+If-None-Match gets a bodiless 304.
+"""
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+from fastapi import Request, Response
+
+from .serialization import ListSerializer
+
+LIST_CACHE_TTL_SECONDS = float(os.getenv("LIST_CACHE_TTL_SECONDS", "30"))
+LIST_CACHE_MAX_ENTRIES = int(os.getenv("LIST_CACHE_MAX_ENTRIES", "256"))
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: dict
+    expires: float
+
+
+class ResponseCache:
+    # only touched from the event loop, so no locking is needed
+    def __init__(self, ttl: float = LIST_CACHE_TTL_SECONDS, max_entries: int = LIST_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, CachedResponse] = OrderedDict()
+        self._generations: dict[str, int] = {}
+
+    def get(self, key: tuple) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: tuple, entry: CachedResponse) -> None:
+        if self.ttl <= 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def generation(self, namespace: str) -> int:
+        return self._generations.get(namespace, 0)
+
+    def invalidate(self, namespace: str) -> None:
+        # bumping the generation also stops in-flight loads from storing stale results
+        self._generations[namespace] = self.generation(namespace) + 1
+        for key in [k for k in self._entries if k[0] == namespace]:
+            del self._entries[key]
+
+    async def respond(
+        self,
+        request: Request,
+        namespace: str,
+        serializer: ListSerializer,
+        load: Callable[[Response], Awaitable[list]],
+    ) -> Response:
+        """
+        Serve `request` from the cache, or build the body with `load` and cache
+        it. `load` receives a Response whose headers (e.g. the next-page
+        cursor) are stored and replayed with the body.
+        """
+        key = (namespace, request.url.path, tuple(sorted(request.query_params.multi_items())))
+        entry = self.get(key)
+        if entry is None:
+            generation = self.generation(namespace)
+            sub = Response()
+            rows = await load(sub)
+            body = serializer.dump(rows)
+            headers = {k: v for k, v in sub.headers.items() if k != "content-length"}
+            etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+            entry = CachedResponse(body, etag, headers, time.monotonic() + self.ttl)
+            if generation == self.generation(namespace):
+                self.put(key, entry)
+
+        headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": "no-cache"}
+        if entry.etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        return Response(entry.body, media_type="application/json", headers=headers)
+
+
+list_cache = ResponseCache()
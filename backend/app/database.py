@@ -1,33 +1,164 @@
 
 import os
+from typing import Union
+
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.engine import FrozenResult
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
+
+from . import sqlite_mode
+from .pooling import pool_options, track_pool
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./health.db")
-print(f"[DB] Using: {DATABASE_URL}")
+# DB_ASYNC=1 serves requests through an asyncio driver (aiosqlite / asyncpg)
+# instead of the sync driver running on the threadpool.
+DB_ASYNC = os.getenv("DB_ASYNC", "0").lower() in ("1", "true", "yes")
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def async_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto the matching asyncio driver."""
+    scheme, rest = url.split("://", 1)
+    return f"{ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)}://{rest}"
 
-if DATABASE_URL.startswith("sqlite"):
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_url(DATABASE_URL)
+print(f"[DB] Using: {ASYNC_DATABASE_URL if DB_ASYNC else DATABASE_URL}")
+
+SQLITE = DATABASE_URL.startswith("sqlite")
+# see app/sqlite_mode.py; in-memory databases are per connection, so they keep the defaults
+SQLITE_TUNED = SQLITE and sqlite_mode.SQLITE_TUNED and sqlite_mode.is_file_database(DATABASE_URL)
+SQLITE_WRITER = SQLITE_TUNED and sqlite_mode.SQLITE_SINGLE_WRITER
+WRITER_POOL = {"pool_size": 1, "max_overflow": 0, "pool_timeout": sqlite_mode.SQLITE_WRITE_TIMEOUT}
+
+if SQLITE:
     engine = create_engine(
         DATABASE_URL,
         connect_args={"check_same_thread": False}
     )
 else:
-    engine = create_engine(
-        DATABASE_URL,
-        pool_pre_ping=True,  # good for RDS: avoids stale connections
-        pool_size=5,
-        max_overflow=10,
-    )
+    engine = create_engine(DATABASE_URL, **pool_options(make_url(DATABASE_URL).get_driver_name()))
+track_pool(engine, "sync")
+
+write_engine = None
+if SQLITE_TUNED:
+    sqlite_mode.tune(engine)
+if SQLITE_WRITER:
+    write_engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False},
+                                 poolclass=QueuePool, **WRITER_POOL)
+    sqlite_mode.tune(write_engine)
+    track_pool(write_engine, "sync_writer")
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# The sync engine is always available: schema management, exports and
+# scripts use it directly even when requests are served asynchronously.
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=engine,
+    class_=sqlite_mode.WriteRoutingSession, info={"sqlite_writer": write_engine} if write_engine else None,
+)
 Base = declarative_base()
 
-def get_db():
+async_engine = None
+async_write_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    if SQLITE:
+        async_engine = create_async_engine(ASYNC_DATABASE_URL)
+        if SQLITE_TUNED:
+            sqlite_mode.tune(async_engine.sync_engine)
+        if SQLITE_WRITER:
+            async_write_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=AsyncAdaptedQueuePool, **WRITER_POOL)
+            sqlite_mode.tune(async_write_engine.sync_engine)
+            track_pool(async_write_engine.sync_engine, "async_writer")
+    else:
+        async_engine = create_async_engine(
+            ASYNC_DATABASE_URL, **pool_options(make_url(ASYNC_DATABASE_URL).get_driver_name())
+        )
+    track_pool(async_engine.sync_engine, "async")
+    # expire_on_commit=False: attributes must not lazy-load after commit under asyncio
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False,
+        sync_session_class=sqlite_mode.WriteRoutingSession,
+        info={"sqlite_writer": async_write_engine.sync_engine} if async_write_engine else None,
+    )
+
+
+class ThreadedSession:
+    """
+    The AsyncSession call surface over a sync Session, each database call run
+    on the threadpool. Routers are written once as `async def` against this
+    interface and work unchanged whether or not DB_ASYNC is set.
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, params=None, **kw):
+        def run():
+            result = self.sync_session.execute(statement, params, **kw)
+            # buffer rows like AsyncSession does, so no fetch happens on the event loop;
+            # ORM bulk INSERTs without RETURNING have no cursor behind their result
+            raw = getattr(result, "raw", result)
+            if raw is not None and raw.returns_rows:
+                return result.freeze()
+            return result
+        result = await run_in_threadpool(run)
+        return result() if isinstance(result, FrozenResult) else result
+
+    async def scalars(self, statement, params=None, **kw):
+        return (await self.execute(statement, params, **kw)).scalars()
+
+    async def scalar(self, statement, params=None, **kw):
+        return (await self.execute(statement, params, **kw)).scalar()
+
+    async def get(self, entity, ident, **kw):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kw)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def refresh(self, instance, attribute_names=None):
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def run_sync(self, fn, *args, **kw):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kw)
+
+
+DBSession = Union[AsyncSession, ThreadedSession]
+
+async def dispose_engines():
+    # aiosqlite runs each connection on a non-daemon thread, so pooled ones
+    # (the SQLite writer) keep the process alive until closed
+    for e in (async_engine, async_write_engine):
+        if e is not None:
+            await e.dispose()
+
+async def get_db():
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
     db = SessionLocal()
     try:
-        yield db
+        yield ThreadedSession(db)
     finally:
-        db.close()
+        await run_in_threadpool(db.close)
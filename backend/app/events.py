@@ -0,0 +1,250 @@
+"""
+Change feed for dashboards: GET /events streams inserts and deletes of
+appointments, patients and patient records as Server-Sent Events, so
+clients update incrementally instead of re-polling whole lists.
+
+Write handlers publish() into the `events` table in their own transaction
+(an outbox), so an event exists exactly when its change was committed, in
+whichever worker made it. Each worker runs one poller that reads new rows
+every EVENTS_POLL_SECONDS, only while it has listeners, and fans them out to
+its open streams through in-process queues; idle streams cost no database
+work. Event ids are the outbox ids, so a client that reconnects with
+Last-Event-ID (EventSource does this by itself) gets everything it missed
+replayed from the table, up to EVENTS_REPLAY_LIMIT events and within
+EVENTS_RETENTION_HOURS; beyond that it receives a `reset` event and should
+reload its lists. The job worker (app/worker.py) purges older events, so the
+table is bounded whether or not anyone listens.
+
+On Postgres, ids are handed out before commit, so a later id can become
+visible first. The poller waits up to EVENTS_GAP_SECONDS for a missing id
+before skipping it (it may belong to a transaction that rolled back).
+
+A stream whose client can't keep up (EVENTS_QUEUE_SIZE events behind) is
+closed; the client reconnects and catches up from the table.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .database import DB_ASYNC, DBSession, async_engine, engine
+from .models.models import Event
+
+EVENTS_POLL_SECONDS = float(os.getenv("EVENTS_POLL_SECONDS", "0.5"))
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))  # under the ALB's 60s idle timeout
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "1000"))
+EVENTS_REPLAY_LIMIT = int(os.getenv("EVENTS_REPLAY_LIMIT", "1000"))
+EVENTS_RETENTION_HOURS = float(os.getenv("EVENTS_RETENTION_HOURS", "24"))
+EVENTS_GAP_SECONDS = float(os.getenv("EVENTS_GAP_SECONDS", "5"))
+EVENTS_BATCH = 500
+RECONNECT_MS = 3000
+
+TOPICS = ("appointments", "patients", "patient_records")
+
+log = logging.getLogger("app.events")
+
+
+async def publish(db: DBSession, topic: str, op: str, payload: dict) -> None:
+    """Record a change in the caller's transaction; the caller commits."""
+    await db.execute(insert(Event).values(topic=topic, op=op, payload=payload))
+
+
+async def publish_inserts(db: DBSession, topic: str, schema, rows) -> None:
+    """An "insert" event carrying `rows` (models or column dicts with ids) as `schema` JSON."""
+    await publish(db, topic, "insert", {"rows": [schema.model_validate(r).model_dump(mode="json") for r in rows]})
+
+
+async def publish_deletes(db: DBSession, topic: str, ids: list[int]) -> None:
+    await publish(db, topic, "delete", {"ids": list(ids)})
+
+
+def _fetch_sync(stmt) -> list:
+    with engine.connect() as conn:
+        return conn.execute(stmt).all()
+
+
+async def _fetch(stmt) -> list:
+    if DB_ASYNC:
+        async with async_engine.connect() as conn:
+            return (await conn.execute(stmt)).all()
+    return await run_in_threadpool(_fetch_sync, stmt)
+
+
+def _columns():
+    return select(Event.id, Event.topic, Event.op, Event.payload)
+
+
+async def latest_id() -> int:
+    return (await _fetch(select(func.max(Event.id))))[0][0] or 0
+
+
+def purge_events(session: Session) -> int:
+    cutoff = datetime.utcnow() - timedelta(hours=EVENTS_RETENTION_HOURS)
+    deleted = session.execute(delete(Event).where(Event.created_at < cutoff)).rowcount
+    session.commit()
+    return deleted
+
+
+class Subscriber:
+    def __init__(self, topics: frozenset):
+        self.topics = topics
+        # (id, topic, op, payload) rows; None means the stream must close
+        self.queue: asyncio.Queue = asyncio.Queue(EVENTS_QUEUE_SIZE)
+
+    def offer(self, row) -> bool:
+        if row[1] not in self.topics:
+            return True
+        try:
+            self.queue.put_nowait(row)
+            return True
+        except asyncio.QueueFull:
+            self.close()
+            return False
+
+    def close(self) -> None:
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class Broker:
+    """One per worker: polls the outbox and hands new rows to this worker's streams."""
+
+    def __init__(self):
+        self.subscribers: set[Subscriber] = set()
+        self.last_id: Optional[int] = None  # None while nobody listens
+        self._gap_since: Optional[float] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, topics: frozenset, after: int) -> Subscriber:
+        sub = Subscriber(topics)
+        self.subscribers.add(sub)
+        if self.last_id is None:
+            self.last_id = after  # streams resuming from further back replay that part themselves
+        if self._task is None:
+            self.start()  # no lifespan (e.g. tests): start on first use
+        self._wake.set()
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self.subscribers.discard(sub)
+        if not self.subscribers:
+            self.last_id = None
+
+    def _deliverable(self, rows: list) -> list:
+        """The rows up to the first id gap that is still young enough to fill in."""
+        expected = self.last_id + 1
+        for i, row in enumerate(rows):
+            if row[0] != expected:
+                now = time.monotonic()
+                self._gap_since = self._gap_since or now
+                if now - self._gap_since < EVENTS_GAP_SECONDS:
+                    return rows[:i]
+                log.warning("event ids %d-%d never appeared, skipping them", expected, row[0] - 1)
+            self._gap_since = None
+            expected = row[0] + 1
+        return rows
+
+    async def poll_once(self) -> None:
+        if self.last_id is None:
+            return
+        rows = await _fetch(_columns().where(Event.id > self.last_id).order_by(Event.id).limit(EVENTS_BATCH))
+        if self.last_id is None:
+            return  # everybody left while the query ran
+        for row in self._deliverable(rows):
+            for sub in list(self.subscribers):
+                if not sub.offer(row):
+                    self.subscribers.discard(sub)
+            self.last_id = row[0]
+
+    async def _run(self) -> None:
+        while True:
+            if not self.subscribers:
+                self._wake.clear()
+                await self._wake.wait()
+            try:
+                await self.poll_once()
+            except Exception:
+                log.exception("polling the events table failed")
+            await asyncio.sleep(EVENTS_POLL_SECONDS)
+
+    def start(self) -> None:
+        self._wake = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        for sub in list(self.subscribers):
+            sub.close()  # ends the open streams so shutdown doesn't wait on them
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+broker = Broker()
+
+
+def _format(event_id: Optional[int], data: dict, event: Optional[str] = None) -> str:
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _message(row) -> str:
+    id_, topic, op, payload = row
+    return _format(id_, {"topic": topic, "op": op, **payload})
+
+
+async def _replay(topics: frozenset, after: int) -> Optional[list]:
+    """Events after `after`, or None when they can't all be replayed any more."""
+    oldest = (await _fetch(select(func.min(Event.id))))[0][0]
+    if oldest is not None and oldest > after + 1:
+        return None  # purged
+    rows = await _fetch(_columns().where(Event.id > after, Event.topic.in_(topics))
+                        .order_by(Event.id).limit(EVENTS_REPLAY_LIMIT + 1))
+    return rows if len(rows) <= EVENTS_REPLAY_LIMIT else None
+
+
+async def stream(topics: frozenset, last_event_id: Optional[int]) -> AsyncIterator[str]:
+    latest = await latest_id()
+    after = latest if last_event_id is None else min(last_event_id, latest)
+    # subscribe before replaying, so nothing committed meanwhile falls in between
+    sub = broker.subscribe(topics, after)
+    try:
+        yield f"retry: {RECONNECT_MS}\n\n"
+        sent = after
+        if last_event_id is not None and after < latest:
+            rows = await _replay(topics, after)
+            if rows is None:
+                yield _format(latest, {"reason": "too far behind; reload"}, "reset")
+                sent = latest
+            else:
+                for row in rows:
+                    yield _message(row)
+                    sent = row[0]
+        while True:
+            try:
+                row = await asyncio.wait_for(sub.queue.get(), EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if row is None:
+                return
+            if row[0] > sent:
+                yield _message(row)
+                sent = row[0]
+    finally:
+        broker.unsubscribe(sub)
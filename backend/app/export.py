@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+from datetime import date, time as Time
+from typing import Literal
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+
+from .database import SessionLocal
+
+ExportFormat = Literal["ndjson", "csv"]
+
+# rows fetched per server-side cursor round trip (and per chunk sent)
+EXPORT_BATCH = 1000
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _json_default(value):
+    if isinstance(value, (date, Time)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _partitions(stmt: Select):
+    # The request-scoped session from get_db is closed before a streaming body
+    # is sent, so the stream owns its own session for as long as it runs.
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=EXPORT_BATCH))
+        yield from result.partitions()
+    finally:
+        db.close()
+
+
+def _ndjson(stmt: Select):
+    keys = list(stmt.selected_columns.keys())
+    for rows in _partitions(stmt):
+        yield "".join(json.dumps(dict(zip(keys, row)), default=_json_default) + "\n" for row in rows)
+
+
+def _csv(stmt: Select):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(stmt.selected_columns.keys())
+    yield buf.getvalue()
+    for rows in _partitions(stmt):
+        buf.seek(0); buf.truncate()
+        writer.writerows(rows)
+        yield buf.getvalue()
+
+
+def export_response(stmt: Select, fmt: ExportFormat, name: str) -> StreamingResponse:
+    """
+    Stream the rows of a column select as NDJSON or CSV through a server-side
+    cursor, so memory stays flat regardless of how many rows match.
+    """
+    body = _csv(stmt) if fmt == "csv" else _ndjson(stmt)
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
@@ -0,0 +1,69 @@
+"""
+Password hashing off the request path.
+
+bcrypt costs ~100-300 ms of CPU per call at the default cost, so hashes run
+in a dedicated process pool (BCRYPT_WORKERS processes) rather than on the
+threadpool that serves every other endpoint. BCRYPT_ROUNDS sets the cost
+factor; hashes made with a different cost are re-hashed on the next login.
+
+This module is imported by the pool's worker processes, so it must not
+import the rest of the app.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# 0 hashes on the threadpool instead (tests, single-core boxes)
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+# min == max == rounds: any other cost is flagged for update on verify
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def hash_pw(pw: str) -> str:
+    return pwd_context.hash(pw)
+
+
+def verify_pw(pw: str, hashed: str) -> tuple[bool, Optional[str]]:
+    """(matches, replacement hash if the stored one uses another cost)."""
+    return pwd_context.verify_and_update(pw, hashed)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn, not fork: forking a process that already runs threads and an event loop is unsafe
+        _pool = ProcessPoolExecutor(max_workers=BCRYPT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+async def _run(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool() if BCRYPT_WORKERS > 0 else None, fn, *args)
+
+
+async def hash_password(pw: str) -> str:
+    return await _run(hash_pw, pw)
+
+
+async def verify_password(pw: str, hashed: str) -> tuple[bool, Optional[str]]:
+    return await _run(verify_pw, pw, hashed)
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
@@ -0,0 +1,127 @@
+"""
+Liveness and readiness.
+
+/healthz only says the process is serving. /readyz also needs the database:
+a `SELECT 1` through the same pool requests use, so a dead or exhausted pool
+fails it, and it fails while the pool is saturated (every connection,
+overflow included, checked out). Load balancers poll readiness often, so the
+check runs in the background every READINESS_INTERVAL_SECONDS and /readyz
+serves the last result; without the background task (no lifespan) a stale
+result is refreshed by one request at a time.
+"""
+import asyncio
+import os
+import time
+from typing import Optional
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from .database import DB_ASYNC, async_engine, engine
+from .pooling import POOL_STATS
+
+READINESS_INTERVAL_SECONDS = float(os.getenv("READINESS_INTERVAL_SECONDS", "5"))
+READINESS_TIMEOUT_SECONDS = float(os.getenv("READINESS_TIMEOUT_SECONDS", "2"))
+# a result older than this (e.g. the refresher is stuck) counts as a failure
+READINESS_MAX_AGE_SECONDS = float(os.getenv("READINESS_MAX_AGE_SECONDS", "30"))
+# fraction of pool capacity checked out at which the worker stops taking traffic
+READINESS_MAX_POOL_SATURATION = float(os.getenv("READINESS_MAX_POOL_SATURATION", "1.0"))
+
+
+def _ping_sync() -> None:
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+async def _ping() -> None:
+    if DB_ASYNC:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    else:
+        await run_in_threadpool(_ping_sync)
+
+
+def pool_saturation() -> dict:
+    """Checked-out connections against capacity (pool_size + max_overflow), per pooled engine."""
+    pools = {}
+    for name, stats in POOL_STATS.items():
+        pool = stats.engine.pool
+        if not hasattr(pool, "checkedout"):
+            continue  # NullPool & co. have no fixed capacity
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        checked_out = pool.checkedout()
+        pools[name] = {"checked_out": checked_out, "capacity": capacity,
+                       "saturation": round(checked_out / capacity, 3) if capacity else 0.0}
+    return pools
+
+
+class Readiness:
+    def __init__(self):
+        self.ok = False
+        self.error: Optional[str] = "not checked yet"
+        self.latency_ms: Optional[float] = None
+        self.checked_at = 0.0  # monotonic
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def check(self) -> None:
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(_ping(), READINESS_TIMEOUT_SECONDS)
+            self.ok, self.error = True, None
+        except asyncio.TimeoutError:
+            self.ok, self.error = False, f"database check timed out after {READINESS_TIMEOUT_SECONDS}s"
+        except Exception as e:
+            # the driver's message, without SQLAlchemy's statement/background lines
+            message = str(getattr(e, "orig", None) or e).splitlines()[0] if str(e) else ""
+            self.ok, self.error = False, f"{type(e).__name__}: {message}"
+        self.latency_ms = round((time.perf_counter() - t0) * 1000, 2)
+        self.checked_at = time.monotonic()
+
+    async def current(self) -> "Readiness":
+        stale = time.monotonic() - self.checked_at >= READINESS_INTERVAL_SECONDS
+        # with the refresher running, only the very first request may have to wait for a check
+        if stale and (self._task is None or not self.checked_at):
+            async with self._lock:
+                # another request may have refreshed it while this one waited
+                if time.monotonic() - self.checked_at >= READINESS_INTERVAL_SECONDS:
+                    await self.check()
+        return self
+
+    async def _refresh(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(READINESS_INTERVAL_SECONDS)
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._refresh())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def report(self) -> tuple[bool, dict]:
+        age = time.monotonic() - self.checked_at
+        db_ok = self.ok and age <= READINESS_MAX_AGE_SECONDS
+        pools = pool_saturation()
+        # the SQLite writer pools hold one connection that is busy by design
+        saturated = [name for name, p in pools.items()
+                     if p["saturation"] >= READINESS_MAX_POOL_SATURATION and not name.endswith("_writer")]
+        ready = db_ok and not saturated
+        error = self.error
+        if self.ok and not db_ok:
+            error = "database check is stale"
+        return ready, {
+            "status": "ready" if ready else "unavailable",
+            "database": {"ok": db_ok, "latency_ms": self.latency_ms, "age_seconds": round(age, 1), "error": error},
+            "pools": pools,
+            "saturated": saturated,
+        }
+
+
+readiness = Readiness()
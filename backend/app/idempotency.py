@@ -0,0 +1,151 @@
+"""
+Idempotency-Key support for create endpoints.
+
+Clients retry POSTs on timeouts, and without a key every retry inserts
+another row. With an `Idempotency-Key` header the first request reserves the
+key in `idempotency_keys` (a short commit of its own), runs the write and
+stores its response in the write's transaction. A retry with the same key
+and body gets the stored response back from one primary-key read, marked
+`Idempotent-Replayed: true`, without running the handler. While the first
+request is still running a retry gets 409; if the first fails, its
+reservation is dropped and a retry runs normally. Reusing a key with a
+different body is a 422. Only successful responses are stored.
+
+Keys live in the database, so every worker sees them. A key expires after
+IDEMPOTENCY_TTL_HOURS and the table keeps at most IDEMPOTENCY_MAX_KEYS
+(oldest first); each worker prunes at most every IDEMPOTENCY_PRUNE_SECONDS.
+"""
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Request, Response
+from pydantic import BaseModel
+from sqlalchemy import and_, delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .database import DBSession
+from .models.models import IdempotencyRecord
+
+IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000"))
+# a reservation this old belongs to a request that died; a retry may take it over
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+IDEMPOTENCY_PRUNE_SECONDS = float(os.getenv("IDEMPOTENCY_PRUNE_SECONDS", "300"))
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+_pruned_at = 0.0  # monotonic; only touched from the event loop
+
+
+async def prune(db: DBSession) -> None:
+    """Drop expired keys, then the oldest beyond IDEMPOTENCY_MAX_KEYS, and commit."""
+    cutoff = datetime.utcnow() - timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+    await db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.created_at < cutoff)
+                     .execution_options(synchronize_session=False))
+    newest_dropped = (select(IdempotencyRecord.created_at).order_by(IdempotencyRecord.created_at.desc())
+                      .offset(IDEMPOTENCY_MAX_KEYS).limit(1).scalar_subquery())
+    await db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.created_at <= newest_dropped)
+                     .execution_options(synchronize_session=False))
+    await db.commit()
+
+
+async def _maybe_prune(db: DBSession) -> None:
+    global _pruned_at
+    if time.monotonic() - _pruned_at >= IDEMPOTENCY_PRUNE_SECONDS:
+        _pruned_at = time.monotonic()
+        await prune(db)
+
+
+class Idempotency:
+    def __init__(self, scope: str, key: Optional[str] = None, fingerprint: str = ""):
+        self.scope = scope
+        self.key = key
+        self.fingerprint = fingerprint
+
+    def _this(self):
+        return and_(IdempotencyRecord.scope == self.scope, IdempotencyRecord.key == self.key)
+
+    async def _reserve(self, db: DBSession) -> Optional[Response]:
+        """Reserve the key, or return the stored response to replay."""
+        await _maybe_prune(db)
+        now = datetime.utcnow()
+        row = (await db.execute(
+            select(IdempotencyRecord.fingerprint, IdempotencyRecord.status_code,
+                   IdempotencyRecord.body, IdempotencyRecord.created_at).where(self._this())
+        )).first()
+        try:
+            if row is None:
+                await db.execute(insert(IdempotencyRecord).values(
+                    scope=self.scope, key=self.key, fingerprint=self.fingerprint, created_at=now))
+            else:
+                done = row.status_code is not None
+                age = now - row.created_at
+                if age < (timedelta(hours=IDEMPOTENCY_TTL_HOURS) if done else timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)):
+                    if row.fingerprint != self.fingerprint:
+                        raise HTTPException(422, f"{IDEMPOTENCY_HEADER} was already used with a different request body")
+                    if not done:
+                        raise HTTPException(409, f"A request with this {IDEMPOTENCY_HEADER} is still in progress",
+                                            headers={"Retry-After": "1"})
+                    return Response(row.body, status_code=row.status_code, media_type="application/json",
+                                    headers={REPLAYED_HEADER: "true"})
+                # expired, or left behind by a request that never finished
+                taken = await db.execute(
+                    update(IdempotencyRecord).where(self._this(), IdempotencyRecord.created_at == row.created_at)
+                    .values(fingerprint=self.fingerprint, status_code=None, body=None, created_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+                if taken.rowcount != 1:
+                    raise IntegrityError("idempotency key taken over concurrently", None, None)
+            await db.commit()
+        except IntegrityError:
+            # a concurrent request with the same key reserved it first
+            await db.rollback()
+            raise HTTPException(409, f"A request with this {IDEMPOTENCY_HEADER} is still in progress",
+                                headers={"Retry-After": "1"})
+        return None
+
+    async def _release(self, db: DBSession) -> None:
+        await db.execute(delete(IdempotencyRecord).where(self._this(), IdempotencyRecord.status_code.is_(None))
+                         .execution_options(synchronize_session=False))
+        await db.commit()
+
+    async def run(self, db: DBSession, write: Callable[[], Awaitable[object]], schema: type[BaseModel]):
+        """
+        Run `write` (adds and flushes a row, doesn't commit) and commit.
+        Without a key this returns the refreshed row, as before; with one,
+        the `schema` JSON of the row, stored for replays in the same commit.
+        """
+        if self.key is None:
+            obj = await write()
+            await db.commit()
+            await db.refresh(obj)
+            return obj
+        replay = await self._reserve(db)
+        if replay is not None:
+            return replay
+        try:
+            body = schema.model_validate(await write()).model_dump_json().encode()
+            await db.execute(update(IdempotencyRecord).where(self._this()).values(status_code=200, body=body)
+                             .execution_options(synchronize_session=False))
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            await self._release(db)
+            raise
+        return Response(body, media_type="application/json")
+
+
+async def idempotency(request: Request) -> Idempotency:
+    """Dependency: the request's Idempotency-Key, scoped to its method and path and bound to its body."""
+    scope = f"{request.method} {request.url.path}"
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        return Idempotency(scope)
+    if not 0 < len(key) <= MAX_KEY_LENGTH:
+        raise HTTPException(400, f"{IDEMPOTENCY_HEADER} must be 1 to {MAX_KEY_LENGTH} characters")
+    return Idempotency(scope, key, hashlib.sha256(await request.body()).hexdigest())
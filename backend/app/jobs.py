@@ -0,0 +1,171 @@
+"""
+Background jobs.
+
+Work that shouldn't hold up a request (sending reminders) is written to the
+`jobs` table in the request's own transaction, so a job exists exactly when
+the change that caused it was committed, and is run later by worker
+processes (`python -m app.worker`).
+
+Workers claim due jobs in batches with one statement:
+
+    UPDATE jobs SET status='running', locked_by=..., locked_until=now+lease
+    WHERE id IN (SELECT id FROM jobs WHERE <due> ORDER BY run_at LIMIT n
+                 FOR UPDATE SKIP LOCKED)
+
+On Postgres, SKIP LOCKED lets any number of workers claim concurrently
+without waiting on, or double-claiming, each other's rows. SQLite has no row
+locks (the clause is not rendered); there the UPDATE itself is the claim, as
+the database runs one write at a time.
+
+Delivery is at least once: a job whose worker dies is claimed again once its
+lease (JOB_LEASE_SECONDS) runs out, so handlers must tolerate repeats and
+rows that have since been deleted. A failing job is retried with exponential
+backoff and marked `failed` after JOB_MAX_ATTEMPTS.
+"""
+import logging
+import os
+import socket
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from .database import DBSession
+from .models.models import Job
+
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "50"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = int(os.getenv("JOB_RETRY_BASE_SECONDS", "30"))  # doubles per attempt
+JOB_RETENTION_HOURS = int(os.getenv("JOB_RETENTION_HOURS", "168"))  # finished jobs kept for a week
+
+log = logging.getLogger("app.jobs")
+
+# kind -> handler(session, payload); a handler raising marks the attempt failed
+HANDLERS: dict[str, Callable[[Session, dict], None]] = {}
+
+
+def job_handler(kind: str):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def new_job(kind: str, payload: dict, run_at: Optional[datetime] = None, key: Optional[str] = None) -> dict:
+    """A `jobs` row for enqueue(); run_at is naive UTC, default now."""
+    return {"kind": kind, "payload": payload, "key": key, "status": "pending",
+            "run_at": run_at or datetime.utcnow(), "attempts": 0}
+
+
+async def enqueue(db: DBSession, jobs: list[dict]) -> None:
+    """Insert jobs in the caller's transaction (one multi-row INSERT); the caller commits."""
+    if jobs:
+        await db.execute(insert(Job), jobs)
+
+
+async def cancel(db: DBSession, key: str) -> None:
+    """Drop jobs about `key` that haven't started; the caller commits."""
+    await db.execute(delete(Job).where(Job.key == key, Job.status == "pending"))
+
+
+def claim(session: Session, worker: str, limit: int = JOB_BATCH_SIZE) -> tuple[str, list]:
+    """
+    Claim up to `limit` due jobs (pending, or running with an expired lease)
+    and commit. Returns the claim token, stored in locked_by, and the
+    claimed (id, kind, payload, attempts) rows.
+    """
+    now = datetime.utcnow()
+    token = f"{worker}:{uuid.uuid4().hex[:12]}"
+    due = (
+        select(Job.id)
+        .where(or_(and_(Job.status == "pending", Job.run_at <= now),
+                   and_(Job.status == "running", Job.locked_until < now)))
+        .order_by(Job.run_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        update(Job)
+        .where(Job.id.in_(due))
+        .values(status="running", locked_by=token, attempts=Job.attempts + 1,
+                locked_until=now + timedelta(seconds=JOB_LEASE_SECONDS))
+        .execution_options(synchronize_session=False)
+    )
+    columns = (Job.id, Job.kind, Job.payload, Job.attempts)
+    if session.get_bind(clause=stmt).dialect.update_returning:
+        rows = session.execute(stmt.returning(*columns)).all()
+    else:
+        session.execute(stmt)
+        rows = session.execute(select(*columns).where(Job.locked_by == token)).all()
+    session.commit()
+    return token, rows
+
+
+def _finish(session: Session, job_id: int, token: str, **values) -> None:
+    # only while this claim still holds it: after a lease expiry another worker may own the job
+    session.execute(
+        update(Job).where(Job.id == job_id, Job.locked_by == token)
+        .values(locked_until=None, **values).execution_options(synchronize_session=False)
+    )
+    session.commit()
+
+
+def run_job(session: Session, token: str, job_id: int, kind: str, payload: dict, attempts: int) -> bool:
+    handler = HANDLERS.get(kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler for job kind {kind!r}")
+        handler(session, payload)
+    except Exception as e:
+        session.rollback()
+        error = "".join(traceback.format_exception_only(type(e), e)).strip()
+        if attempts >= JOB_MAX_ATTEMPTS or handler is None:
+            log.error("job %s (%s) failed for good after %d attempt(s): %s", job_id, kind, attempts, error)
+            _finish(session, job_id, token, status="failed", last_error=error)
+        else:
+            delay = JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+            log.warning("job %s (%s) attempt %d failed, retrying in %ds: %s", job_id, kind, attempts, delay, error)
+            _finish(session, job_id, token, status="pending", last_error=error,
+                    run_at=datetime.utcnow() + timedelta(seconds=delay))
+        return False
+    _finish(session, job_id, token, status="done", last_error=None)
+    return True
+
+
+def run_batch(session: Session, worker: str, limit: int = JOB_BATCH_SIZE) -> int:
+    """Claim and run one batch; returns how many jobs were claimed (0: nothing due)."""
+    token, rows = claim(session, worker, limit)
+    for job_id, kind, payload, attempts in rows:
+        run_job(session, token, job_id, kind, payload, attempts)
+    return len(rows)
+
+
+def purge(session: Session) -> int:
+    """Delete finished jobs older than JOB_RETENTION_HOURS."""
+    cutoff = datetime.utcnow() - timedelta(hours=JOB_RETENTION_HOURS)
+    deleted = session.execute(
+        delete(Job).where(Job.status.in_(("done", "failed")), Job.run_at < cutoff)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    session.commit()
+    return deleted
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def queue_report(db: DBSession) -> dict:
+    """Job counts by status and how late the oldest due job is."""
+    counts = dict((await db.execute(select(Job.status, func.count()).group_by(Job.status))).all())
+    oldest = await db.scalar(
+        select(func.min(Job.run_at)).where(Job.status == "pending", Job.run_at <= datetime.utcnow())
+    )
+    return {
+        "counts": {status: counts.get(status, 0) for status in ("pending", "running", "done", "failed")},
+        "oldest_due_seconds": round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else 0.0,
+    }
@@ -1,25 +1,85 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Header, HTTPException, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine
-from .models.models import Base
-from .routers import doctors, patients, patient_records, appointments
+from starlette.concurrency import run_in_threadpool
+from .database import dispose_engines
+from .health import readiness
+from .migrate import migrate, migrate_on_startup
+from .events import broker
+from .routers import admin, auth, doctors, events, patients, patient_records, appointments, search, sync, vitals
+from .pagination import NEXT_CURSOR_HEADER
+from .idempotency import REPLAYED_HEADER
+from .hashing import shutdown_pool
+from .pooling import POOL_STATS, apply_threadpool_size
+from .ratelimit import AdmissionMiddleware
+from . import metrics
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # no database work here unless asked for (see app/migrate.py): workers
+    # should be serving as soon as they're imported
+    apply_threadpool_size()
+    if migrate_on_startup():
+        await run_in_threadpool(migrate)
+    readiness.start()
+    broker.start()
+    yield
+    await broker.stop()
+    await readiness.stop()
+    shutdown_pool()
+    await dispose_engines()
 
-Base.metadata.create_all(bind=engine)
-app = FastAPI(title="HealthConnect API", version="2.0")
+app = FastAPI(title="HealthConnect API", version="2.0", lifespan=lifespan)
 
+# added before CORS, so refusals (429/503) still carry CORS headers
+app.add_middleware(AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", REPLAYED_HEADER, "Retry-After"],
 )
 
+if metrics.METRICS_ENABLED:
+    # added last, so it is the outermost middleware and times everything
+    app.add_middleware(metrics.MetricsMiddleware)
+    for name, stats in POOL_STATS.items():
+        metrics.instrument_engine(stats.engine, name)
+
+    if metrics.METRICS_TOKEN:
+        @app.get("/metrics", include_in_schema=False)
+        def prometheus_metrics(authorization: str = Header(None)):
+            if not metrics.scrape_allowed(authorization):
+                raise HTTPException(status_code=401, detail="Missing or invalid metrics token",
+                                    headers={"WWW-Authenticate": "Bearer"})
+            return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+app.include_router(auth.router)
 app.include_router(doctors.router)
 app.include_router(patients.router)
 app.include_router(patient_records.router)
 app.include_router(appointments.router)
+app.include_router(search.router)
+app.include_router(vitals.router)
+app.include_router(events.router)
+app.include_router(sync.router)
+app.include_router(admin.router)
 
 @app.get("/")
 def root():
     return {"status": "ok"}
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving. No database access."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: recent database check passed and the pool isn't saturated; 503 otherwise."""
+    ready, body = (await readiness.current()).report()
+    return JSONResponse(body, status_code=200 if ready else 503)
@@ -0,0 +1,215 @@
+"""
+Request and database instrumentation, exposed in the Prometheus text format
+at /metrics.
+
+MetricsMiddleware times every request under its route template (so
+/patients/{patient_id} is one series, not one per id) and counts the SQL
+statements the request issued. instrument_engine() hooks an engine's
+before/after_cursor_execute events for per-statement timing and observes its
+pool checkout waits (timed by app.pooling). Metrics live in the process: with
+several workers, each one exposes its own.
+
+The endpoint only answers requests carrying `Authorization: Bearer
+<METRICS_TOKEN>`, and is not mounted at all without METRICS_TOKEN: route
+names, latencies and pool sizes describe the deployment to whoever can
+reach it.
+
+SLOW_QUERY_MS > 0 logs statements slower than that (with the request path
+that ran them) to the "app.slow_query" logger.
+"""
+import hmac
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .pooling import POOL_STATS
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+slow_log = logging.getLogger("app.slow_query")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace('"', r'\"').replace("\n", r"\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            lines += [f"{self.name}{_labels(self.labels, k)} {v}" for k, v in self._values.items()]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, labels
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            v = self._values.get(labels)
+            if v is None:
+                v = self._values[labels] = [0] * (len(self.buckets) + 2)
+            v[i] += 1
+            v[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        for key, v in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), v):
+                cumulative += n
+                le = _labels(self.labels + ("le",), key + (bound,))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {v[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+REQUESTS = Counter("http_requests_total", "Requests served.", ("method", "route", "status"))
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Request latency.", ("method", "route"))
+REQUEST_QUERIES = Histogram("http_request_db_queries", "SQL statements issued per request.",
+                            ("method", "route"), COUNT_BUCKETS)
+REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", "Time spent in SQL per request.", ("method", "route"))
+QUERY_SECONDS = Histogram("db_query_duration_seconds", "SQL statement latency.", ("engine",))
+SLOW_QUERIES = Counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS.", ("engine",))
+CHECKOUT_SECONDS = Histogram("db_pool_checkout_wait_seconds", "Time to get a connection from the pool.", ("engine",))
+REQUESTS_SHED = Counter("http_requests_shed_total", "Requests refused by rate limits or concurrency caps.",
+                        ("route_class", "reason"))
+
+METRICS = [REQUESTS, REQUEST_SECONDS, REQUEST_QUERIES, REQUEST_DB_SECONDS, QUERY_SECONDS, SLOW_QUERIES, CHECKOUT_SECONDS,
+           REQUESTS_SHED]
+_engines: dict[str, Engine] = {}
+
+# [statements, seconds] for the request being served. A mutable list, so
+# hooks running on threadpool threads (which get a copy of the context)
+# still add to the request's totals.
+_request_db: ContextVar[Optional[list]] = ContextVar("request_db", default=None)
+_request_path: ContextVar[str] = ContextVar("request_path", default="")
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """Record statement timings and pool checkout waits for an engine registered with app.pooling.track_pool()."""
+    _engines[name] = engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _end(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        QUERY_SECONDS.observe(elapsed, name)
+        acc = _request_db.get()
+        if acc is not None:
+            acc[0] += 1
+            acc[1] += elapsed
+        if SLOW_QUERY_MS > 0 and elapsed * 1000 >= SLOW_QUERY_MS:
+            SLOW_QUERIES.inc(name)
+            slow_log.warning("%.1f ms [%s] %s", elapsed * 1000, _request_path.get() or "-",
+                             " ".join(statement.split())[:1000])
+
+    POOL_STATS[name].observers.append(lambda seconds: CHECKOUT_SECONDS.observe(seconds, name))
+
+
+def _pool_gauges() -> list[str]:
+    # only QueuePool-style pools have these (not NullPool / SingletonThreadPool)
+    lines = []
+    for metric, help, attr in (
+        ("db_pool_checked_out", "Connections currently checked out.", "checkedout"),
+        ("db_pool_size", "Configured pool size.", "size"),
+        ("db_pool_overflow", "Connections open beyond the pool size.", "overflow"),
+    ):
+        # overflow() counts up from -size until the pool is full
+        values = [(name, max(0, getattr(e.pool, attr)())) for name, e in _engines.items() if hasattr(e.pool, attr)]
+        if values:
+            lines += [f"# HELP {metric} {help}", f"# TYPE {metric} gauge"]
+            lines += [f'{metric}{{engine="{name}"}} {v}' for name, v in values]
+    return lines
+
+
+def render() -> bytes:
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    lines += _pool_gauges()
+    return ("\n".join(lines) + "\n").encode()
+
+
+def scrape_allowed(authorization: Optional[str]) -> bool:
+    """Whether an Authorization header carries METRICS_TOKEN (compared in constant time)."""
+    scheme, _, token = (authorization or "").partition(" ")
+    if not METRICS_TOKEN or scheme.lower() != "bearer":
+        return False
+    return hmac.compare_digest(token.strip().encode(), METRICS_TOKEN.encode())
+
+
+class MetricsMiddleware:
+    """ASGI middleware: per-route latency, status and SQL statement counts."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = 500
+        acc = [0, 0.0]
+        token = _request_db.set(acc)
+        path_token = _request_path.set(scope["path"])
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - t0
+            _request_db.reset(token)
+            _request_path.reset(path_token)
+            # the template of the matched route; the router records it in the scope
+            route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+            method = scope["method"]
+            REQUESTS.inc(method, route, status)
+            REQUEST_SECONDS.observe(elapsed, method, route)
+            REQUEST_QUERIES.observe(acc[0], method, route)
+            REQUEST_DB_SECONDS.observe(acc[1], method, route)
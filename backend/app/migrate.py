@@ -0,0 +1,175 @@
+"""
+Schema management.
+
+Base.metadata.create_all() creates missing tables but never touches tables
+that already exist, so indexes added to models.py later would never reach an
+existing database. migrate() creates missing tables, adds nullable columns
+that existing tables lack, and then any declared index the live schema lacks
+(CONCURRENTLY on Postgres, so writes keep flowing). On Postgres it also
+brings foreign keys' ON DELETE rules in line with the models; SQLite can't
+alter constraints, so older SQLite files keep theirs (the routers delete
+children explicitly either way).
+It also backfills derived tables (vitals rollups) and `updated_at` columns
+that are new to a database with existing data.
+
+    python -m app.migrate
+
+The app itself does no schema work on import. At startup it runs migrate()
+only when MIGRATE_ON_STARTUP asks for it; the default, "auto", does so for
+local SQLite files only, so a fresh checkout works without an extra step
+while server databases are migrated once per deploy instead of per worker.
+"""
+import os
+from datetime import datetime
+
+from sqlalchemy import inspect, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from .database import engine
+from .models.models import Base
+from .search import create_search_schema
+from .vitals import needs_backfill, rebuild_rollups
+
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "auto").lower()  # "auto" | "1" | "0"
+
+
+def missing_columns(bind: Engine) -> list:
+    insp = inspect(bind)
+    tables = set(insp.get_table_names())
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {c["name"] for c in insp.get_columns(table.name)}
+        missing += [c for c in table.columns if c.name not in existing]
+    return missing
+
+
+def add_columns(bind: Engine = engine) -> list[str]:
+    """ALTER TABLE ... ADD COLUMN for new nullable columns; anything else needs a hand-written migration."""
+    added = []
+    with bind.begin() as conn:
+        for column in missing_columns(bind):
+            name = f"{column.table.name}.{column.name}"
+            if not column.nullable or column.primary_key:
+                raise RuntimeError(f"Cannot add non-nullable column {name} automatically")
+            spec = CreateColumn(column).compile(dialect=bind.dialect)
+            conn.execute(text(f"ALTER TABLE {bind.dialect.identifier_preparer.format_table(column.table)} ADD COLUMN {spec}"))
+            added.append(name)
+    return added
+
+
+def backfill_updated_at(bind: Engine = engine) -> dict[str, int]:
+    """Stamp rows from before updated_at existed (with created_at where there is one), so /sync sees them."""
+    now = datetime.utcnow()
+    counts = {}
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if "updated_at" not in table.c:
+                continue
+            stamp = table.c.created_at if "created_at" in table.c else now
+            result = conn.execute(update(table).where(table.c.updated_at.is_(None)).values(updated_at=stamp))
+            if result.rowcount:
+                counts[table.name] = result.rowcount
+    return counts
+
+
+def stale_foreign_keys(bind: Engine) -> list[tuple]:
+    """(live constraint name, model constraint) pairs whose ON DELETE rule differs."""
+    insp = inspect(bind)
+    tables = set(insp.get_table_names())
+    stale = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        live = {tuple(fk["constrained_columns"]): fk for fk in insp.get_foreign_keys(table.name)}
+        for constraint in table.foreign_key_constraints:
+            fk = live.get(tuple(c.name for c in constraint.columns))
+            if fk is None or not fk["name"]:
+                continue
+            if (fk["options"].get("ondelete") or "NO ACTION").upper() != (constraint.ondelete or "NO ACTION").upper():
+                stale.append((fk["name"], constraint))
+    return stale
+
+
+def update_foreign_keys(bind: Engine = engine) -> list[str]:
+    if bind.dialect.name != "postgresql":
+        return []
+    quote = bind.dialect.identifier_preparer.quote
+    updated = []
+    for name, constraint in stale_foreign_keys(bind):
+        table = constraint.table.name
+        columns = ", ".join(quote(c.name) for c in constraint.columns)
+        referred = ", ".join(quote(e.column.name) for e in constraint.elements)
+        # NOT VALID skips the full-table check under the ALTER's lock; VALIDATE then runs without blocking writes
+        with bind.begin() as conn:
+            conn.execute(text(
+                f"ALTER TABLE {quote(table)} DROP CONSTRAINT {quote(name)}, "
+                f"ADD CONSTRAINT {quote(name)} FOREIGN KEY ({columns}) "
+                f"REFERENCES {quote(constraint.referred_table.name)} ({referred}) "
+                f"ON DELETE {constraint.ondelete or 'NO ACTION'} NOT VALID"
+            ))
+        with bind.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {quote(table)} VALIDATE CONSTRAINT {quote(name)}"))
+        updated.append(name)
+    return updated
+
+
+def missing_indexes(bind: Engine) -> list:
+    insp = inspect(bind)
+    tables = set(insp.get_table_names())
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {ix["name"] for ix in insp.get_indexes(table.name)}
+        missing += [ix for ix in table.indexes if ix.name not in existing]
+    return missing
+
+
+def create_indexes(bind: Engine = engine) -> list[str]:
+    created = []
+    pg = bind.dialect.name == "postgresql"
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for index in missing_indexes(bind):
+            if pg:
+                index.dialect_options["postgresql"]["concurrently"] = True
+            try:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+            finally:
+                if pg:
+                    index.dialect_options["postgresql"]["concurrently"] = False
+            created.append(index.name)
+    return created
+
+
+def migrate(bind: Engine = engine) -> list[str]:
+    Base.metadata.create_all(bind=bind)
+    for name in add_columns(bind):
+        print(f"[DB] Added column {name}")
+    for name in update_foreign_keys(bind):
+        print(f"[DB] Updated ON DELETE rule of {name}")
+    for name, count in backfill_updated_at(bind).items():
+        print(f"[DB] Backfilled updated_at of {count} {name} row(s)")
+    created = create_indexes(bind)
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        created += create_search_schema(conn, concurrently=bind.dialect.name == "postgresql")
+    with bind.begin() as conn:
+        if needs_backfill(conn):
+            print(f"[DB] Backfilled {rebuild_rollups(conn)} vitals rollup row(s)")
+    return created
+
+
+def migrate_on_startup(bind: Engine = engine) -> bool:
+    if MIGRATE_ON_STARTUP == "auto":
+        return bind.dialect.name == "sqlite"
+    return MIGRATE_ON_STARTUP in ("1", "true", "yes")
+
+
+if __name__ == "__main__":
+    created = migrate()
+    for name in created:
+        print(f"[DB] Created index {name}")
+    print(f"[DB] Schema up to date ({len(created)} index(es) added)")
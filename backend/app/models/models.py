@@ -1,7 +1,18 @@
-from sqlalchemy import Integer, String, Date, Time, Text, ForeignKey, DateTime
+from sqlalchemy import JSON, Integer, String, Date, Time, Text, Float, ForeignKey, DateTime, Index, LargeBinary, event
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from datetime import datetime
 from ..database import Base
+from ..search import create_search_schema
+
+# Relationships are lazy="raise_on_sql": touching an unloaded relationship in a
+# request raises instead of silently issuing one query per row (and async
+# sessions cannot lazy-load at all). Load them explicitly with
+# selectinload()/joinedload() where needed; cascades still work.
+# Deleting a patient or doctor is left to the database (ON DELETE rules,
+# passive_deletes) rather than loading the children; the routers issue the
+# same statements explicitly for databases created before the rules existed.
+# updated_at is set by every INSERT/UPDATE, ORM or Core, for GET /sync (see
+# app/sync.py); it is NULL only in old rows until app.migrate backfills them.
 
 class Doctor(Base):
     __tablename__ = "doctors"
@@ -11,9 +22,11 @@ class Doctor(Base):
     specialty: Mapped[str] = mapped_column(String, default="")
     phone: Mapped[str] = mapped_column(String, default="")
     email: Mapped[str] = mapped_column(String, default="")
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, default=datetime.utcnow,
+                                                        onupdate=datetime.utcnow)
 
-    appointments = relationship("Appointment", back_populates="doctor")
-    records = relationship("PatientRecord", back_populates="doctor")
+    appointments = relationship("Appointment", back_populates="doctor", lazy="raise_on_sql", passive_deletes=True)
+    records = relationship("PatientRecord", back_populates="doctor", lazy="raise_on_sql", passive_deletes=True)
 
 class Patient(Base):
     __tablename__ = "patients"
@@ -24,9 +37,12 @@ class Patient(Base):
     phone: Mapped[str] = mapped_column(String, default="")
     email: Mapped[str] = mapped_column(String, default="")
     address: Mapped[str] = mapped_column(String, default="")
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, default=datetime.utcnow,
+                                                        onupdate=datetime.utcnow)
 
-    appointments = relationship("Appointment", back_populates="patient")
-    records = relationship("PatientRecord", back_populates="patient", cascade="all, delete-orphan")
+    appointments = relationship("Appointment", back_populates="patient", lazy="raise_on_sql", passive_deletes=True)
+    records = relationship("PatientRecord", back_populates="patient", cascade="all, delete-orphan",
+                           lazy="raise_on_sql", passive_deletes=True)
 
 class PatientRecord(Base):
     __tablename__ = "patient_records"
@@ -36,12 +52,14 @@ class PatientRecord(Base):
     height_in: Mapped[int | None] = mapped_column(Integer, nullable=True)
     weight_lb: Mapped[int | None] = mapped_column(Integer, nullable=True)
     diagnosis: Mapped[str] = mapped_column(String, default="")
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, default=datetime.utcnow,
+                                                        onupdate=datetime.utcnow)
 
-    patient_id: Mapped[int] = mapped_column(ForeignKey("patients.id"))
-    doctor_id: Mapped[int | None] = mapped_column(ForeignKey("doctors.id"), nullable=True)
+    patient_id: Mapped[int] = mapped_column(ForeignKey("patients.id", ondelete="CASCADE"))
+    doctor_id: Mapped[int | None] = mapped_column(ForeignKey("doctors.id", ondelete="SET NULL"), nullable=True)
 
-    patient = relationship("Patient", back_populates="records")
-    doctor = relationship("Doctor", back_populates="records")
+    patient = relationship("Patient", back_populates="records", lazy="raise_on_sql")
+    doctor = relationship("Doctor", back_populates="records", lazy="raise_on_sql")
 
 class Appointment(Base):
     __tablename__ = "appointments"
@@ -50,9 +68,112 @@ class Appointment(Base):
     time: Mapped[datetime | None] = mapped_column(Time, nullable=True)
     purpose: Mapped[str] = mapped_column(String, default="")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # who to remind (see app/reminders.py); not part of the API's output
+    full_name: Mapped[str | None] = mapped_column(String, nullable=True)
+    email: Mapped[str | None] = mapped_column(String, nullable=True)
+    phone: Mapped[str | None] = mapped_column(String, nullable=True)
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, default=datetime.utcnow,
+                                                        onupdate=datetime.utcnow)
+
+    doctor_id: Mapped[int | None] = mapped_column(ForeignKey("doctors.id", ondelete="SET NULL"), nullable=True)
+    patient_id: Mapped[int | None] = mapped_column(ForeignKey("patients.id", ondelete="SET NULL"), nullable=True)
+
+    doctor = relationship("Doctor", back_populates="appointments", lazy="raise_on_sql")
+    patient = relationship("Patient", back_populates="appointments", lazy="raise_on_sql")
+
+class User(Base):
+    __tablename__ = "users"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    username: Mapped[str] = mapped_column(String, unique=True, index=True)
+    password_hash: Mapped[str] = mapped_column(String)
+
+class AuthToken(Base):
+    __tablename__ = "auth_tokens"
+    token_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+
+class VitalsRollup(Base):
+    # Per-month vitals totals, kept up to date by the record write paths (see
+    # app/vitals.py) so dashboards read O(months) rows instead of every record.
+    __tablename__ = "vitals_rollups"
+    dimension: Mapped[str] = mapped_column(String(16), primary_key=True)  # "all" | "doctor" | "diagnosis"
+    key: Mapped[str] = mapped_column(String, primary_key=True)  # doctor id / normalized diagnosis; "" for "all"
+    month: Mapped[datetime] = mapped_column(Date, primary_key=True)  # first day of the month
+    records: Mapped[int] = mapped_column(Integer, default=0)
+    weight_n: Mapped[int] = mapped_column(Integer, default=0)
+    weight_sum: Mapped[float] = mapped_column(Float, default=0)
+    height_n: Mapped[int] = mapped_column(Integer, default=0)
+    height_sum: Mapped[float] = mapped_column(Float, default=0)
+    bmi_n: Mapped[int] = mapped_column(Integer, default=0)
+    bmi_sum: Mapped[float] = mapped_column(Float, default=0)
+
+class Job(Base):
+    # Background work queue, claimed in batches by `python -m app.worker` (see app/jobs.py).
+    __tablename__ = "jobs"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    kind: Mapped[str] = mapped_column(String(64))
+    key: Mapped[str | None] = mapped_column(String, nullable=True, index=True)  # e.g. "appointment:12", to cancel by
+    payload: Mapped[dict] = mapped_column(JSON, default=dict)
+    status: Mapped[str] = mapped_column(String(16), default="pending")  # pending | running | done | failed
+    run_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    locked_by: Mapped[str | None] = mapped_column(String, nullable=True)
+    locked_until: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class IdempotencyRecord(Base):
+    # Responses to requests sent with an Idempotency-Key, replayed on retries (see app/idempotency.py).
+    __tablename__ = "idempotency_keys"
+    scope: Mapped[str] = mapped_column(String(64), primary_key=True)  # "POST /appointments"
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    fingerprint: Mapped[str] = mapped_column(String(64))  # sha256 of the request body
+    status_code: Mapped[int | None] = mapped_column(Integer, nullable=True)  # None while the first request runs
+    body: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+class Event(Base):
+    # Change feed outbox: one row per committed insert/delete batch, streamed by /events (see app/events.py).
+    __tablename__ = "events"
+    __table_args__ = {"sqlite_autoincrement": True}  # ids are never reused, even once old rows are purged
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)  # the SSE event id clients resume from
+    topic: Mapped[str] = mapped_column(String(32))  # "appointments" | "patients" | "patient_records"
+    op: Mapped[str] = mapped_column(String(16))  # "insert" | "delete"
+    payload: Mapped[dict] = mapped_column(JSON)  # {"rows": [...]} or {"ids": [...]}
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+class Tombstone(Base):
+    # One row per deleted doctor/patient/record/appointment, so GET /sync can report deletions (see app/sync.py).
+    __tablename__ = "tombstones"
+    __table_args__ = {"sqlite_autoincrement": True}
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    entity: Mapped[str] = mapped_column(String(32))  # table name
+    entity_id: Mapped[int] = mapped_column(Integer)
+    deleted_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class RateLimitBucket(Base):
+    # Token buckets shared by every worker with RATE_LIMIT_STORE=db (see app/ratelimit.py).
+    __tablename__ = "rate_limits"
+    key: Mapped[str] = mapped_column(String(128), primary_key=True)  # "api:ip:10.0.0.1", "api:token:<sha256>"
+    tokens: Mapped[float] = mapped_column(Float)
+    refilled_at: Mapped[float] = mapped_column(Float, index=True)  # unix time
 
-    doctor_id: Mapped[int | None] = mapped_column(ForeignKey("doctors.id"), nullable=True)
-    patient_id: Mapped[int | None] = mapped_column(ForeignKey("patients.id"), nullable=True)
+# Composite indexes for the hot access paths. create_all() only builds these
+# for new tables; run `python -m app.migrate` to add them to an existing DB.
+Index("ix_patient_records_patient_id_date", PatientRecord.patient_id, PatientRecord.date.desc())
+Index("ix_patient_records_doctor_id", PatientRecord.doctor_id)
+Index("ix_appointments_date_id", Appointment.date, Appointment.id)
+Index("ix_appointments_doctor_id_date_time", Appointment.doctor_id, Appointment.date, Appointment.time)
+Index("ix_appointments_patient_id_date", Appointment.patient_id, Appointment.date)
+Index("ix_jobs_status_run_at", Job.status, Job.run_at)
+Index("ix_doctors_updated_at_id", Doctor.updated_at, Doctor.id)
+Index("ix_patients_updated_at_id", Patient.updated_at, Patient.id)
+Index("ix_patient_records_updated_at_id", PatientRecord.updated_at, PatientRecord.id)
+Index("ix_appointments_updated_at_id", Appointment.updated_at, Appointment.id)
+Index("ix_tombstones_deleted_at_id", Tombstone.deleted_at, Tombstone.id)
 
-    doctor = relationship("Doctor", back_populates="appointments")
-    patient = relationship("Patient", back_populates="appointments")
+@event.listens_for(Base.metadata, "after_create")
+def _create_search_schema(target, connection, tables=(), **kw):
+    # search indexes for tables create_all() just made; existing tables get them from app.migrate
+    create_search_schema(connection, tables={t.name for t in tables})
@@ -0,0 +1,85 @@
+"""
+Outgoing email/SMS, behind a small Sender interface so delivery can be swapped
+without touching the jobs that send.
+
+NOTIFY_SENDER picks the implementation:
+  - "log" (default): logs each message and keeps it in memory; nothing leaves
+    the machine, for local runs and tests
+  - "smtp": email through SMTP_HOST; it has no SMS channel
+  - "package.module:ClassName": any Sender subclass, e.g. an SMS provider's
+"""
+import importlib
+import logging
+import os
+import smtplib
+from abc import ABC, abstractmethod
+from email.message import EmailMessage
+from functools import lru_cache
+
+NOTIFY_SENDER = os.getenv("NOTIFY_SENDER", "log")
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1").lower() in ("1", "true", "yes")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "10"))
+NOTIFY_FROM = os.getenv("NOTIFY_FROM", "HealthConnect <no-reply@healthconnect.local>")
+
+log = logging.getLogger("app.notify")
+
+
+class Sender(ABC):
+    # channels this sender can deliver on; jobs skip the others
+    channels: frozenset = frozenset({"email", "sms"})
+
+    @abstractmethod
+    def send_email(self, to: str, subject: str, body: str) -> None: ...
+
+    @abstractmethod
+    def send_sms(self, to: str, body: str) -> None: ...
+
+
+class LogSender(Sender):
+    def __init__(self):
+        self.outbox: list[dict] = []
+
+    def send_email(self, to: str, subject: str, body: str) -> None:
+        self.outbox.append({"channel": "email", "to": to, "subject": subject, "body": body})
+        log.info("email to %s: %s", to, subject)
+
+    def send_sms(self, to: str, body: str) -> None:
+        self.outbox.append({"channel": "sms", "to": to, "body": body})
+        log.info("sms to %s: %s", to, body)
+
+
+class SmtpSender(Sender):
+    channels = frozenset({"email"})
+
+    def send_email(self, to: str, subject: str, body: str) -> None:
+        msg = EmailMessage()
+        msg["From"], msg["To"], msg["Subject"] = NOTIFY_FROM, to, subject
+        msg.set_content(body)
+        with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT) as smtp:
+            if SMTP_STARTTLS:
+                smtp.starttls()
+            if SMTP_USER:
+                smtp.login(SMTP_USER, SMTP_PASSWORD or "")
+            smtp.send_message(msg)
+
+    def send_sms(self, to: str, body: str) -> None:
+        # not in `channels`, so jobs never call it
+        raise ValueError("SmtpSender has no SMS channel")
+
+
+SENDERS = {"log": LogSender, "smtp": SmtpSender}
+
+
+@lru_cache(maxsize=None)
+def get_sender() -> Sender:
+    """The configured sender, created once per process."""
+    if NOTIFY_SENDER in SENDERS:
+        return SENDERS[NOTIFY_SENDER]()
+    module, _, name = NOTIFY_SENDER.partition(":")
+    if not name:
+        raise ValueError(f"Unknown NOTIFY_SENDER {NOTIFY_SENDER!r}: use log, smtp or package.module:ClassName")
+    return getattr(importlib.import_module(module), name)()
@@ -0,0 +1,63 @@
+import base64
+import json
+from datetime import date
+
+from fastapi import HTTPException, Response
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# list endpoints keep returning a plain JSON array; the cursor for the
+# next page travels in this header (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, date) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(400, "Invalid cursor")
+    return values
+
+
+def decode_id_cursor(cursor: str) -> int:
+    (last_id,) = decode_cursor(cursor, 1)
+    if not isinstance(last_id, int):
+        raise HTTPException(400, "Invalid cursor")
+    return last_id
+
+
+def decode_date_id_cursor(cursor: str) -> tuple[date, int]:
+    last_date, last_id = decode_cursor(cursor, 2)
+    try:
+        last_date = date.fromisoformat(last_date)
+    except (TypeError, ValueError):
+        raise HTTPException(400, "Invalid cursor")
+    if not isinstance(last_id, int):
+        raise HTTPException(400, "Invalid cursor")
+    return last_date, last_id
+
+
+def prefix_pattern(prefix: str) -> str:
+    """LIKE pattern matching values that start with `prefix` (wildcards escaped)."""
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%"
+
+
+def finish_page(rows: list, limit: int, response: Response, cursor_key) -> list:
+    """
+    Trim a query fetched with `limit + 1` rows down to one page and, when
+    more rows exist, set the next-page cursor header from the last row kept.
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*cursor_key(rows[-1]))
+    return rows
@@ -0,0 +1,148 @@
+"""
+Connection pool sizing and statistics.
+
+Each worker process has its own pool, so the database sees up to
+WEB_CONCURRENCY x (pool_size + max_overflow) connections. In sync mode a
+worker can't use more connections than it has threadpool threads.
+With DB_MAX_CONNECTIONS set (the server's limit minus what other clients
+need), pools are sized so all workers together stay under it:
+
+    per worker = min(THREADPOOL_SIZE, DB_MAX_CONNECTIONS // WEB_CONCURRENCY)
+    pool_size  = min(DB_POOL_SIZE or 5, per worker); max_overflow = the rest
+
+Behind an external pooler (PgBouncer), DB_POOL_MODE=external uses NullPool
+so connections are handed back to the pooler as soon as each session ends.
+"""
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from anyio.to_thread import current_default_thread_limiter
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import NullPool
+
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "queue")  # "queue" | "external"
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))  # uvicorn/gunicorn worker processes
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "40"))  # anyio's default is 40
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "0"))  # across all workers; 0 = no budget
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = os.getenv("DB_MAX_OVERFLOW")  # default: up to the per-worker limit
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# without a budget, keep the previous default of at most 15 per worker
+DEFAULT_WORKER_CONNECTIONS = 15
+
+
+def worker_connections() -> int:
+    """The most connections one worker's pool may open."""
+    limit = min(THREADPOOL_SIZE, DEFAULT_WORKER_CONNECTIONS)
+    if DB_MAX_CONNECTIONS > 0:
+        limit = min(THREADPOOL_SIZE, DB_MAX_CONNECTIONS // max(WEB_CONCURRENCY, 1))
+    return max(limit, 1)
+
+
+def pool_options(driver: str) -> dict:
+    """create_engine() / create_async_engine() pool arguments for a server database."""
+    if DB_POOL_MODE == "external":
+        # the pooler may run in transaction mode, where server-side prepared
+        # statements don't survive between transactions
+        if driver == "asyncpg":
+            return {"poolclass": NullPool, "connect_args": {"statement_cache_size": 0, "prepared_statement_cache_size": 0}}
+        if driver == "psycopg":
+            return {"poolclass": NullPool, "connect_args": {"prepare_threshold": None}}
+        return {"poolclass": NullPool}
+    limit = worker_connections()
+    size = min(DB_POOL_SIZE, limit)
+    overflow = int(DB_MAX_OVERFLOW) if DB_MAX_OVERFLOW is not None else limit - size
+    return {
+        "pool_pre_ping": True,  # good for RDS: avoids stale connections
+        "pool_size": size,
+        "max_overflow": overflow,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+
+
+class PoolStats:
+    """Checkout wait times for one engine's pool."""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        # called with each checkout's wait in seconds (e.g. by app.metrics)
+        self.observers: list[Callable[[float], None]] = []
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, timed_out: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+        for observe in self.observers:
+            observe(seconds)
+
+    def snapshot(self) -> dict:
+        pool = self.engine.pool
+        status = {"pool": type(pool).__name__}
+        # QueuePool-style pools only; NullPool opens a connection per checkout
+        for attr in ("size", "checkedin", "checkedout", "overflow"):
+            if hasattr(pool, attr):
+                status[attr] = getattr(pool, attr)()
+        if "overflow" in status:
+            status["overflow"] = max(0, status["overflow"])  # counts up from -size
+            status["max_overflow"] = pool._max_overflow
+            status["timeout"] = pool.timeout()
+        with self._lock:
+            status.update(
+                checkouts=self.checkouts,
+                checkout_timeouts=self.timeouts,
+                wait_avg_ms=round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                wait_max_ms=round(self.wait_max * 1000, 3),
+            )
+        return status
+
+
+POOL_STATS: dict[str, PoolStats] = {}
+
+
+def track_pool(engine: Engine, name: str) -> PoolStats:
+    """Time every checkout from `engine`'s pool (a sync engine, or an async engine's sync_engine)."""
+    stats = POOL_STATS[name] = PoolStats(engine)
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        t0 = time.perf_counter()
+        timed_out = False
+        try:
+            return connect()
+        except PoolTimeout:
+            timed_out = True
+            raise
+        finally:
+            stats.record(time.perf_counter() - t0, timed_out)
+
+    pool.connect = timed_connect
+    return stats
+
+
+def pool_report() -> dict:
+    return {
+        "mode": DB_POOL_MODE,
+        "workers": WEB_CONCURRENCY,
+        "threadpool_size": THREADPOOL_SIZE,
+        "max_connections": DB_MAX_CONNECTIONS or None,
+        "engines": {name: stats.snapshot() for name, stats in POOL_STATS.items()},
+    }
+
+
+def apply_threadpool_size(size: Optional[int] = None) -> None:
+    """Resize the threadpool sync endpoints and ThreadedSession run on; call from the event loop."""
+    current_default_thread_limiter().total_tokens = size or THREADPOOL_SIZE
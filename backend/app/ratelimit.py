@@ -0,0 +1,317 @@
+"""
+Admission control: per-client rate limits and per-route concurrency caps.
+
+Every request except health checks and the docs (/metrics included) first
+takes a token from its client's bucket (token bucket: RATE sustained, BURST at
+once). The client is the bearer token when there is one, else the IP
+address; requests with a token also draw on a larger per-IP bucket, so made-up
+tokens don't buy fresh buckets. Signup and login (bcrypt) have their own, much
+smaller, per-IP bucket. An empty bucket gets 429 with Retry-After.
+
+Admitted requests then need a slot in their route class: plain API requests
+share CONCURRENCY_LIMIT slots per worker (by default the pool's capacity, so
+requests wait here, briefly, rather than on a pool checkout), bulk writes and
+exports get BULK_CONCURRENCY_LIMIT, signup and login AUTH_CONCURRENCY_LIMIT.
+A request waits at most CONCURRENCY_WAIT_SECONDS for a slot, behind at most
+as many others as there are slots, and gets 503 otherwise. /events streams
+are long-lived and only rate limited.
+
+RATE_LIMIT_STORE=memory (default) keeps buckets in the worker, so each of
+WEB_CONCURRENCY workers allows the full rate. RATE_LIMIT_STORE=db keeps them
+in the `rate_limits` table (one upsert per bucket per request, Postgres or
+SQLite) so limits hold across workers and instances; if that check fails
+the request is let through. Concurrency caps are always per worker.
+
+Behind a load balancer set RATE_LIMIT_PROXY_HOPS to the number of proxies
+that append to X-Forwarded-For (1 for the ALB), or every client shares the
+balancer's address.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import NamedTuple, Optional
+
+from sqlalchemy import case, delete
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from . import metrics
+from .database import DB_ASYNC, async_engine, engine
+from .hashing import BCRYPT_WORKERS
+from .models.models import RateLimitBucket
+from .pooling import worker_connections
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1").lower() in ("1", "true", "yes")
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")  # "memory" | "db"
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "20"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "100"))
+# ceiling for all of one IP's tokens together
+RATE_LIMIT_IP_PER_SECOND = float(os.getenv("RATE_LIMIT_IP_PER_SECOND", "100"))
+RATE_LIMIT_IP_BURST = float(os.getenv("RATE_LIMIT_IP_BURST", "500"))
+AUTH_RATE_LIMIT_PER_MINUTE = float(os.getenv("AUTH_RATE_LIMIT_PER_MINUTE", "10"))
+AUTH_RATE_LIMIT_BURST = float(os.getenv("AUTH_RATE_LIMIT_BURST", "10"))
+RATE_LIMIT_PROXY_HOPS = int(os.getenv("RATE_LIMIT_PROXY_HOPS", "0"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_PURGE_SECONDS = 300
+# a bucket idle this long has refilled under any sane limit; dropping it changes nothing
+RATE_LIMIT_IDLE_SECONDS = 3600
+
+# in-flight requests per worker and route class; 0 = no cap
+CONCURRENCY_LIMIT = int(os.getenv("CONCURRENCY_LIMIT", str(worker_connections())))
+BULK_CONCURRENCY_LIMIT = int(os.getenv("BULK_CONCURRENCY_LIMIT", "2"))
+AUTH_CONCURRENCY_LIMIT = int(os.getenv("AUTH_CONCURRENCY_LIMIT", str(2 * max(BCRYPT_WORKERS, 1))))
+CONCURRENCY_WAIT_SECONDS = float(os.getenv("CONCURRENCY_WAIT_SECONDS", "0.5"))
+
+EXEMPT_PATHS = frozenset({"/", "/healthz", "/readyz", "/docs", "/redoc", "/openapi.json"})
+AUTH_PATHS = frozenset({"/auth/signup", "/auth/login"})
+BULK_SUFFIXES = ("/bulk", "/bulk_delete", "/export")
+
+log = logging.getLogger("app.ratelimit")
+
+
+class Limit(NamedTuple):
+    rate: float  # tokens per second
+    burst: float  # bucket size
+
+
+class RouteClass(NamedTuple):
+    bucket: str  # "api" | "auth"
+    concurrency: int
+
+
+LIMITS = {
+    "api": Limit(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST),
+    "ip": Limit(RATE_LIMIT_IP_PER_SECOND, RATE_LIMIT_IP_BURST),
+    "auth": Limit(AUTH_RATE_LIMIT_PER_MINUTE / 60, AUTH_RATE_LIMIT_BURST),
+}
+
+ROUTE_CLASSES = {
+    "api": RouteClass("api", CONCURRENCY_LIMIT),
+    "bulk": RouteClass("api", BULK_CONCURRENCY_LIMIT),
+    "auth": RouteClass("auth", AUTH_CONCURRENCY_LIMIT),
+    "stream": RouteClass("api", 0),
+}
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """The class of a request by method and path, or None when it is exempt."""
+    if path in EXEMPT_PATHS:
+        return None
+    if method == "POST" and path in AUTH_PATHS:
+        return "auth"
+    if path == "/events" or path.startswith("/events/"):
+        return "stream"
+    if path.rstrip("/").endswith(BULK_SUFFIXES):
+        return "bulk"
+    return "api"
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def client_ip(scope) -> str:
+    if RATE_LIMIT_PROXY_HOPS > 0:
+        forwarded = [h.strip() for h in (_header(scope, b"x-forwarded-for") or "").split(",") if h.strip()]
+        # entries before the ones our proxies appended are whatever the client sent
+        if len(forwarded) >= RATE_LIMIT_PROXY_HOPS:
+            return forwarded[-RATE_LIMIT_PROXY_HOPS]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def bucket_keys(scope, bucket: str) -> list[tuple[str, Limit]]:
+    """The (key, limit) buckets a request draws on."""
+    ip = client_ip(scope)
+    if bucket == "auth":
+        return [(f"auth:ip:{ip}", LIMITS["auth"])]
+    authorization = _header(scope, b"authorization") or ""
+    if authorization.startswith("Bearer ") and len(authorization) > 7:
+        token = hashlib.sha256(authorization[7:].encode()).hexdigest()
+        return [(f"api:ip:{ip}", LIMITS["ip"]), (f"api:token:{token}", LIMITS["api"])]
+    return [(f"api:ip:{ip}", LIMITS["api"])]
+
+
+class RateLimiter(ABC):
+    @abstractmethod
+    async def take(self, key: str, limit: Limit) -> float:
+        """Take a token from `key`'s bucket: 0 when there was one, else seconds until there will be."""
+
+
+class MemoryRateLimiter(RateLimiter):
+    # only touched from the event loop, so no locking is needed
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()  # key -> (tokens, monotonic time)
+
+    async def take(self, key, limit):
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        tokens = limit.burst if bucket is None else min(limit.burst, bucket[0] + (now - bucket[1]) * limit.rate)
+        if tokens < 1:
+            return (1 - tokens) / limit.rate
+        self._buckets[key] = (tokens - 1, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)  # evict least recently used (a full bucket again)
+        return 0.0
+
+
+def _upsert(key: str, limit: Limit, now: float):
+    # imported here: the Postgres dialect is slow to import and unused on SQLite
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    refilled = RateLimitBucket.tokens + (now - RateLimitBucket.refilled_at) * limit.rate
+    tokens = case((refilled > limit.burst, limit.burst), else_=refilled)
+    # the row only changes, and is only returned, when there is a token to take
+    return (
+        insert(RateLimitBucket).values(key=key, tokens=limit.burst - 1, refilled_at=now)
+        .on_conflict_do_update(index_elements=["key"], set_={"tokens": tokens - 1, "refilled_at": now},
+                               where=tokens >= 1)
+        .returning(RateLimitBucket.tokens)
+    )
+
+
+def _execute_sync(stmt) -> list:
+    with engine.begin() as conn:
+        result = conn.execute(stmt)
+        return result.all() if result.returns_rows else []
+
+
+async def _execute(stmt) -> list:
+    if DB_ASYNC:
+        async with async_engine.begin() as conn:
+            result = await conn.execute(stmt)
+            return result.all() if result.returns_rows else []
+    return await run_in_threadpool(_execute_sync, stmt)
+
+
+class DatabaseRateLimiter(RateLimiter):
+    def __init__(self):
+        self._purged_at = 0.0  # monotonic
+
+    async def take(self, key, limit):
+        now = time.time()
+        try:
+            if time.monotonic() - self._purged_at >= RATE_LIMIT_PURGE_SECONDS:
+                self._purged_at = time.monotonic()
+                await _execute(delete(RateLimitBucket).where(RateLimitBucket.refilled_at < now - RATE_LIMIT_IDLE_SECONDS))
+            taken = await _execute(_upsert(key, limit, now))
+        except SQLAlchemyError as e:
+            log.warning("rate limit check failed, letting the request through: %s", e)
+            return 0.0
+        # refused: at most one token short
+        return 0.0 if taken else 1 / limit.rate
+
+
+def make_rate_limiter(kind: str = RATE_LIMIT_STORE) -> RateLimiter:
+    if kind == "db":
+        if engine.dialect.name not in ("postgresql", "sqlite"):
+            raise ValueError("RATE_LIMIT_STORE=db needs Postgres or SQLite")
+        return DatabaseRateLimiter()
+    if kind == "memory":
+        return MemoryRateLimiter()
+    raise ValueError(f"Unknown RATE_LIMIT_STORE: {kind!r} (expected 'memory' or 'db')")
+
+
+class Gate:
+    """At most `limit` requests inside; up to `limit` more may wait for a slot."""
+
+    # only touched from the event loop, so no locking is needed
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.shed = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    def _wake_next(self) -> None:
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+
+    async def enter(self, wait: float) -> bool:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        while self.active >= self.limit:
+            remaining = deadline - loop.time()
+            if remaining <= 0 or len(self._waiters) >= self.limit:
+                return False
+            fut = loop.create_future()
+            self._waiters.append(fut)
+            try:
+                await asyncio.wait_for(fut, remaining)
+            except asyncio.TimeoutError:
+                return False
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    self._wake_next()  # pass on the wake-up this request can't use
+                raise
+            finally:
+                if fut in self._waiters:
+                    self._waiters.remove(fut)
+        self.active += 1
+        return True
+
+    def leave(self) -> None:
+        self.active -= 1
+        self._wake_next()
+
+
+rate_limiter = make_rate_limiter()
+gates = {name: Gate(c.concurrency) for name, c in ROUTE_CLASSES.items() if c.concurrency > 0}
+
+
+def admission_report() -> dict:
+    """In-flight and waiting requests per capped route class (this worker)."""
+    return {name: {"active": g.active, "waiting": len(g._waiters), "limit": g.limit, "shed": g.shed}
+            for name, g in gates.items()}
+
+
+async def _refuse(scope, receive, send, status: int, detail: str, retry_after: float, kind: str, reason: str):
+    metrics.REQUESTS_SHED.inc(kind, reason)
+    response = JSONResponse({"detail": detail}, status_code=status,
+                            headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+    await response(scope, receive, send)
+
+
+class AdmissionMiddleware:
+    """ASGI middleware: rate limits (429), then concurrency caps (503)."""
+
+    def __init__(self, app, limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        kind = route_class(scope["method"], scope["path"])
+        if kind is None:
+            return await self.app(scope, receive, send)
+        if RATE_LIMIT_ENABLED:
+            for key, limit in bucket_keys(scope, ROUTE_CLASSES[kind].bucket):
+                wait = await self.limiter.take(key, limit)
+                if wait > 0:
+                    return await _refuse(scope, receive, send, 429, "Too many requests", wait, kind, "rate")
+        gate = gates.get(kind)
+        if gate is None:
+            return await self.app(scope, receive, send)
+        if not await gate.enter(CONCURRENCY_WAIT_SECONDS):
+            gate.shed += 1
+            return await _refuse(scope, receive, send, 503, "Server busy, retry shortly", 1, kind, "concurrency")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.leave()
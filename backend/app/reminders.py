@@ -0,0 +1,98 @@
+"""
+Appointment reminders.
+
+Booking an appointment with an email or phone number queues one
+"appointment_reminder" job (app/jobs.py) due REMINDER_LEAD_HOURS before the
+appointment, or right away if that is already past. A worker sends it through
+the configured sender (app/notify.py). Deleting the appointment cancels the
+job; a job that is already running finds the appointment gone and does
+nothing.
+
+Appointment dates and times are clinic-local (CLINIC_TIMEZONE, default the
+server's zone); job times are UTC.
+"""
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .database import DBSession
+from .jobs import cancel, enqueue, job_handler, new_job
+from .models.models import Appointment, Doctor
+from .notify import get_sender
+
+REMINDER_LEAD_HOURS = float(os.getenv("REMINDER_LEAD_HOURS", "24"))
+CLINIC_TIMEZONE = os.getenv("CLINIC_TIMEZONE")  # e.g. "Europe/Paris"
+# appointments booked without a time are treated as starting at this hour
+REMINDER_DEFAULT_HOUR = int(os.getenv("REMINDER_DEFAULT_HOUR", "9"))
+
+KIND = "appointment_reminder"
+
+
+def reminder_key(appointment_id: int) -> str:
+    return f"appointment:{appointment_id}"
+
+
+def starts_at(day: date, at: Optional[time]) -> datetime:
+    """An appointment's start as naive UTC."""
+    local = datetime.combine(day, at or time(REMINDER_DEFAULT_HOUR))
+    aware = local.replace(tzinfo=ZoneInfo(CLINIC_TIMEZONE)) if CLINIC_TIMEZONE else local.astimezone()
+    return aware.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def reminder_job(appointment_id: int, data) -> Optional[dict]:
+    """
+    The reminder job for an appointment (a model or a column dict), or None
+    when there is nobody to remind or it has already started.
+    """
+    get = data.get if isinstance(data, dict) else lambda name: getattr(data, name)
+    if not (get("email") or get("phone")):
+        return None
+    start = starts_at(get("date"), get("time"))
+    now = datetime.utcnow()
+    if start <= now:
+        return None
+    run_at = max(start - timedelta(hours=REMINDER_LEAD_HOURS), now)
+    return new_job(KIND, {"appointment_id": appointment_id}, run_at, key=reminder_key(appointment_id))
+
+
+async def schedule_reminders(db: DBSession, appointments: list[tuple[int, object]]) -> None:
+    """Queue reminders for `[(id, appointment or column dict), ...]`, in the caller's transaction."""
+    await enqueue(db, [job for id_, a in appointments if (job := reminder_job(id_, a))])
+
+
+async def cancel_reminder(db: DBSession, appointment_id: int) -> None:
+    await cancel(db, reminder_key(appointment_id))
+
+
+def reminder_text(a: Appointment, doctor: Optional[tuple]) -> tuple[str, str]:
+    when = a.date.strftime("%A %d %B %Y")
+    if a.time is not None:
+        when += f" at {a.time.strftime('%H:%M')}"
+    who = f" with Dr. {doctor[0]} {doctor[1]}" if doctor else ""
+    greeting = f"Hello {a.full_name},\n\n" if a.full_name else ""
+    body = f"{greeting}This is a reminder of your appointment{who} on {when}."
+    if a.purpose:
+        body += f"\nPurpose: {a.purpose}"
+    return f"Appointment reminder: {when}", body
+
+
+@job_handler(KIND)
+def send_reminder(session: Session, payload: dict) -> None:
+    a = session.get(Appointment, payload["appointment_id"])
+    if a is None or starts_at(a.date, a.time) <= datetime.utcnow():
+        return  # cancelled, or too late to be useful
+    doctor = None
+    if a.doctor_id is not None:
+        doctor = session.execute(
+            select(Doctor.first_name, Doctor.last_name).where(Doctor.id == a.doctor_id)
+        ).first()
+    subject, body = reminder_text(a, doctor)
+    sender = get_sender()
+    if a.email and "email" in sender.channels:
+        sender.send_email(a.email, subject, body)
+    if a.phone and "sms" in sender.channels:
+        sender.send_sms(a.phone, body)
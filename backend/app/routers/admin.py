@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends
+from ..auth import require_admin
+from ..database import DBSession, get_db
+from ..jobs import queue_report
+from ..pooling import pool_report
+from ..ratelimit import admission_report
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+@router.get("/pool")
+def pool_stats():
+    """Live connection pool state and checkout wait times for this worker."""
+    return pool_report()
+
+@router.get("/admission")
+def admission_stats():
+    """In-flight, waiting and shed requests per capped route class, for this worker."""
+    return admission_report()
+
+@router.get("/jobs")
+async def job_stats(db: DBSession = Depends(get_db)):
+    """Background job counts by status and the oldest due job's delay."""
+    return await queue_report(db)
@@ -1,17 +1,28 @@
 # backend/app/routers/appointments.py
 
-from datetime import datetime, time as Time
+from datetime import date, datetime, time as Time
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import and_, or_, select
 
-from ..database import get_db
-from ..schemas.schemas import AppointmentCreate, AppointmentOut
+from ..database import DBSession, get_db
+from ..bulk import DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE, bulk_body, existing_ids, run_bulk
+from ..events import publish_deletes, publish_inserts
+from ..export import ExportFormat, export_response
+from ..idempotency import Idempotency, idempotency
+from ..sync import record_deletes
+from ..schemas.schemas import AppointmentCreate, AppointmentOut, BulkRowResult
 from ..models.models import Appointment, Doctor, Patient
+from ..serialization import ListSerializer
+from ..scheduling import book, bookings_for, find_conflict, lock_doctors
+from ..reminders import cancel_reminder, schedule_reminders
+from ..pagination import DEFAULT_LIMIT, MAX_LIMIT, decode_date_id_cursor, finish_page
 
 router = APIRouter(prefix="/appointments", tags=["appointments"])
 
+APPOINTMENT_LIST = ListSerializer(AppointmentOut, Appointment)
+
 
 def _parse_time(value: Optional[str]) -> Optional[Time]:
     """
@@ -37,18 +48,68 @@ def _parse_time(value: Optional[str]) -> Optional[Time]:
 
 
 @router.get("", response_model=list[AppointmentOut])
-def list_appointments(db: Session = Depends(get_db)):
-    return db.query(Appointment).order_by(Appointment.date.asc()).all()
+async def list_appointments(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    doctor_id: Optional[int] = None,
+    patient_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: DBSession = Depends(get_db),
+):
+    stmt = APPOINTMENT_LIST.select()
+    if doctor_id is not None:
+        stmt = stmt.where(Appointment.doctor_id == doctor_id)
+    if patient_id is not None:
+        stmt = stmt.where(Appointment.patient_id == patient_id)
+    if date_from is not None:
+        stmt = stmt.where(Appointment.date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(Appointment.date <= date_to)
+    if cursor:
+        # keyset on (date, id): resume strictly after the last row of the previous page
+        last_date, last_id = decode_date_id_cursor(cursor)
+        stmt = stmt.where(or_(Appointment.date > last_date,
+                              and_(Appointment.date == last_date, Appointment.id > last_id)))
+    stmt = stmt.order_by(Appointment.date.asc(), Appointment.id.asc()).limit(limit + 1)
+    rows = finish_page(await APPOINTMENT_LIST.fetch(db, stmt), limit, response, lambda a: (a.date, a.id))
+    return APPOINTMENT_LIST.respond(rows, response)
+
+
+@router.get("/export")
+def export_appointments(
+    format: ExportFormat = "ndjson",
+    doctor_id: Optional[int] = None,
+    patient_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    stmt = select(Appointment.id, Appointment.date, Appointment.time, Appointment.purpose,
+                  Appointment.doctor_id, Appointment.patient_id, Appointment.created_at)
+    if doctor_id is not None:
+        stmt = stmt.where(Appointment.doctor_id == doctor_id)
+    if patient_id is not None:
+        stmt = stmt.where(Appointment.patient_id == patient_id)
+    if date_from is not None:
+        stmt = stmt.where(Appointment.date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(Appointment.date <= date_to)
+    return export_response(stmt.order_by(Appointment.date, Appointment.id), format, "appointments")
 
 
 @router.post("", response_model=AppointmentOut)
-def create_appointment(payload: AppointmentCreate, db: Session = Depends(get_db)):
+async def create_appointment(payload: AppointmentCreate, db: DBSession = Depends(get_db),
+                             idem: Idempotency = Depends(idempotency)):
+    return await idem.run(db, lambda: _add_appointment(payload, db), AppointmentOut)
+
+
+async def _add_appointment(payload: AppointmentCreate, db: DBSession) -> Appointment:
     # Dump all fields (including frontend-only ones)
     data = payload.model_dump(exclude_none=True)
 
-    # Remove UI-only fields
-    for field in ("full_name", "email", "phone", "department"):
-        data.pop(field, None)
+    # Remove UI-only fields (name/email/phone are kept for reminders)
+    data.pop("department", None)
 
     # Convert string "time" to Python time object for SQLite
     time_str = data.get("time")
@@ -56,26 +117,79 @@ def create_appointment(payload: AppointmentCreate, db: Session = Depends(get_db)
 
     # If doctor_id / patient_id are provided but don't exist, just drop them
     doc_id = data.get("doctor_id")
-    if doc_id is not None and not db.get(Doctor, doc_id):
+    if doc_id is not None and not await db.get(Doctor, doc_id):
         data["doctor_id"] = None
 
     pat_id = data.get("patient_id")
-    if pat_id is not None and not db.get(Patient, pat_id):
+    if pat_id is not None and not await db.get(Patient, pat_id):
         data["patient_id"] = None
 
-    # Create and return appointment
+    # Reject double-booking the doctor
+    if data.get("doctor_id") is not None and data["time"] is not None:
+        await lock_doctors(db, [data["doctor_id"]])
+        if await find_conflict(db, data["doctor_id"], data["date"], data["time"]):
+            raise HTTPException(status_code=409, detail="Doctor already has an appointment at that time")
+
+    # Create the appointment; the caller commits
     a = Appointment(**data)
     db.add(a)
-    db.commit()
-    db.refresh(a)
+    await db.flush()
+    await schedule_reminders(db, [(a.id, a)])
+    await publish_inserts(db, "appointments", AppointmentOut, [a])
     return a
 
 
+async def _prepare_appointments(db: DBSession, batch: list):
+    # same rules as create_appointment, with one IN query per referenced table
+    doctors = await existing_ids(db, Doctor, (a.doctor_id for _, a in batch))
+    patients = await existing_ids(db, Patient, (a.patient_id for _, a in batch))
+    await lock_doctors(db, {a.doctor_id for _, a in batch if a.doctor_id in doctors and a.time})
+    booked = await bookings_for(db, doctors, {a.date for _, a in batch})
+    rows, errors = [], []
+    for i, a in batch:
+        data = a.model_dump(exclude_none=True)
+        data.pop("department", None)
+        try:
+            data["time"] = _parse_time(data.get("time"))
+        except HTTPException as e:
+            errors.append({"index": i, "error": e.detail})
+            continue
+        if data.get("doctor_id") not in doctors:
+            data["doctor_id"] = None
+        if data.get("patient_id") not in patients:
+            data["patient_id"] = None
+        # checked against existing bookings and earlier rows of the batch
+        if data["doctor_id"] is not None and data["time"] is not None \
+                and not book(booked, data["doctor_id"], data["date"], data["time"]):
+            errors.append({"index": i, "error": "Doctor already has an appointment at that time"})
+            continue
+        rows.append((i, data))
+    return rows, errors
+
+
+async def _after_insert(db: DBSession, rows: list[dict], ids: list[int]):
+    await schedule_reminders(db, list(zip(ids, rows)))
+    await publish_inserts(db, "appointments", AppointmentOut, [{**r, "id": i} for r, i in zip(rows, ids)])
+
+
+@router.post("/bulk", response_model=list[BulkRowResult])
+async def create_appointments_bulk(
+    items: list = Depends(bulk_body),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=MAX_BATCH_SIZE),
+    db: DBSession = Depends(get_db),
+):
+    return await run_bulk(db, items, AppointmentCreate, Appointment, batch_size, _prepare_appointments,
+                          _after_insert)
+
+
 @router.delete("/{appointment_id}")
-def delete_appointment(appointment_id: int, db: Session = Depends(get_db)):
-    a = db.get(Appointment, appointment_id)
+async def delete_appointment(appointment_id: int, db: DBSession = Depends(get_db)):
+    a = await db.get(Appointment, appointment_id)
     if not a:
         raise HTTPException(status_code=404, detail="Not found")
-    db.delete(a)
-    db.commit()
+    await db.delete(a)
+    await cancel_reminder(db, appointment_id)
+    await publish_deletes(db, "appointments", [appointment_id])
+    await record_deletes(db, "appointments", [appointment_id])
+    await db.commit()
     return {"ok": True}
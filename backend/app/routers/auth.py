@@ -1,22 +1,24 @@
 
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from ..database import get_db, Base, engine
+from ..database import DBSession, get_db
 from ..schemas.schemas import UserCreate, TokenOut
-from ..auth import create_user, login_user
-
-# Create tables on startup
-Base.metadata.create_all(bind=engine)
+from ..auth import bearer_token, create_user, issue_token, login_user
+from ..tokens import token_store
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 @router.post("/signup", response_model=TokenOut)
-def signup(payload: UserCreate, db: Session = Depends(get_db)):
-    create_user(db, payload.username, payload.password)
-    token = login_user(db, payload.username, payload.password)
-    return TokenOut(token=token)
+async def signup(payload: UserCreate, db: DBSession = Depends(get_db)):
+    # the password was just hashed: no need to verify it again
+    u = await create_user(db, payload.username, payload.password)
+    return TokenOut(token=await issue_token(db, u.id))
 
 @router.post("/login", response_model=TokenOut)
-def login(payload: UserCreate, db: Session = Depends(get_db)):
-    token = login_user(db, payload.username, payload.password)
+async def login(payload: UserCreate, db: DBSession = Depends(get_db)):
+    token = await login_user(db, payload.username, payload.password)
     return TokenOut(token=token)
+
+@router.post("/logout")
+async def logout(token: str = Depends(bearer_token), db: DBSession = Depends(get_db)):
+    await token_store.revoke(db, token)
+    return {"ok": True}
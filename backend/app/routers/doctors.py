@@ -1,25 +1,103 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from ..database import get_db
-from ..schemas.schemas import DoctorCreate, DoctorOut
-from ..models.models import Doctor
+from datetime import date, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import delete, or_, update
+from ..database import DBSession, get_db
+from ..schemas.schemas import AvailabilityOut, BulkDeleteResult, BulkRowResult, DoctorCreate, DoctorOut, DaySlots
+from ..models.models import Appointment, Doctor, PatientRecord
+from ..cache import list_cache
+from ..serialization import ListSerializer
+from ..sync import record_deletes
+from ..bulk import DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE, bulk_body, existing_ids, run_bulk
+from ..scheduling import APPOINTMENT_SLOT_MINUTES, MAX_AVAILABILITY_DAYS, free_slots
+from ..vitals import drop_doctor_vitals
+from ..pagination import DEFAULT_LIMIT, MAX_LIMIT, decode_id_cursor, finish_page, prefix_pattern
 
 router = APIRouter(prefix="/doctors", tags=["doctors"])
 
+DOCTOR_LIST = ListSerializer(DoctorOut, Doctor)
+
 @router.get("", response_model=list[DoctorOut])
-def list_doctors(db: Session = Depends(get_db)):
-    return db.query(Doctor).all()
+async def list_doctors(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    name: Optional[str] = Query(None, description="First or last name prefix"),
+    specialty: Optional[str] = None,
+    db: DBSession = Depends(get_db),
+):
+    async def load(response: Response):
+        stmt = DOCTOR_LIST.select()
+        if name:
+            pattern = prefix_pattern(name)
+            stmt = stmt.where(or_(Doctor.first_name.ilike(pattern, escape="\\"),
+                                  Doctor.last_name.ilike(pattern, escape="\\")))
+        if specialty:
+            stmt = stmt.where(Doctor.specialty == specialty)
+        if cursor:
+            stmt = stmt.where(Doctor.id > decode_id_cursor(cursor))
+        rows = await DOCTOR_LIST.fetch(db, stmt.order_by(Doctor.id.asc()).limit(limit + 1))
+        return finish_page(rows, limit, response, lambda d: (d.id,))
+    return await list_cache.respond(request, "doctors", DOCTOR_LIST, load)
 
 @router.post("", response_model=DoctorOut)
-def create_doctor(payload: DoctorCreate, db: Session = Depends(get_db)):
+async def create_doctor(payload: DoctorCreate, db: DBSession = Depends(get_db)):
     d = Doctor(**payload.dict())
-    db.add(d); db.commit(); db.refresh(d)
+    db.add(d); await db.commit(); await db.refresh(d)
+    list_cache.invalidate("doctors")
     return d
 
+@router.post("/bulk", response_model=list[BulkRowResult])
+async def create_doctors_bulk(
+    items: list = Depends(bulk_body),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=MAX_BATCH_SIZE),
+    db: DBSession = Depends(get_db),
+):
+    results = await run_bulk(db, items, DoctorCreate, Doctor, batch_size)
+    list_cache.invalidate("doctors")
+    return results
+
+@router.get("/{doctor_id}/availability", response_model=AvailabilityOut)
+async def doctor_availability(
+    doctor_id: int,
+    date_from: date = Query(alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    db: DBSession = Depends(get_db),
+):
+    date_to = date_to or date_from
+    if date_to < date_from:
+        raise HTTPException(400, "'to' must not be before 'from'")
+    if date_to - date_from >= timedelta(days=MAX_AVAILABILITY_DAYS):
+        raise HTTPException(400, f"Range is limited to {MAX_AVAILABILITY_DAYS} days")
+    if not await db.get(Doctor, doctor_id):
+        raise HTTPException(404, "Doctor not found")
+    days = await free_slots(db, doctor_id, date_from, date_to)
+    return AvailabilityOut(doctor_id=doctor_id, slot_minutes=APPOINTMENT_SLOT_MINUTES,
+                           days=[DaySlots(date=d, slots=s) for d, s in days])
+
+async def _delete_doctors(db: DBSession, ids) -> list[int]:
+    # records and appointments are kept, unassigned (ON DELETE SET NULL)
+    found = sorted(await existing_ids(db, Doctor, ids))
+    if not found:
+        return []
+    await drop_doctor_vitals(db, found)
+    await db.execute(update(PatientRecord).where(PatientRecord.doctor_id.in_(found)).values(doctor_id=None))
+    await db.execute(update(Appointment).where(Appointment.doctor_id.in_(found)).values(doctor_id=None))
+    await db.execute(delete(Doctor).where(Doctor.id.in_(found)))
+    await record_deletes(db, "doctors", found)
+    await db.commit()
+    list_cache.invalidate("doctors")
+    return found
+
+@router.post("/bulk_delete", response_model=BulkDeleteResult)
+async def delete_doctors_bulk(ids: list[int] = Body(..., max_length=MAX_BATCH_SIZE), db: DBSession = Depends(get_db)):
+    """Delete the doctors with these ids; their records and appointments are kept, unassigned."""
+    deleted = await _delete_doctors(db, ids)
+    return {"deleted": deleted, "missing": sorted(set(ids) - set(deleted))}
+
 @router.delete("/{doctor_id}")
-def delete_doctor(doctor_id: int, db: Session = Depends(get_db)):
-    d = db.get(Doctor, doctor_id)
-    if not d:
+async def delete_doctor(doctor_id: int, db: DBSession = Depends(get_db)):
+    if not await _delete_doctors(db, [doctor_id]):
         raise HTTPException(404, "Doctor not found")
-    db.delete(d); db.commit()
     return {"ok": True}
@@ -0,0 +1,29 @@
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from ..events import TOPICS, stream
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+@router.get("")
+async def events(
+    topics: Optional[str] = Query(None, description=f"Comma-separated subset of: {', '.join(TOPICS)}"),
+    after: Optional[int] = Query(None, ge=0, description="Resume after this event id (for clients that can't send Last-Event-ID)"),
+    last_event_id: Optional[int] = Header(None, ge=0),
+):
+    """
+    Server-Sent Events: one `data:` JSON message per committed change,
+    `{"topic", "op": "insert", "rows": [...]}` or `{"topic", "op": "delete", "ids": [...]}`.
+    Deleting a patient also sends a patient_records delete for their records.
+    """
+    wanted = frozenset(t.strip() for t in topics.split(",") if t.strip()) if topics else frozenset(TOPICS)
+    if unknown := wanted - set(TOPICS):
+        raise HTTPException(400, f"Unknown topic(s): {', '.join(sorted(unknown))}")
+    resume = last_event_id if last_event_id is not None else after
+    return StreamingResponse(
+        stream(wanted, resume),
+        media_type="text/event-stream",
+        # no caching, and no buffering in proxies (nginx) so events go out as they happen
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,29 +1,98 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from ..database import get_db
-from ..schemas.schemas import PatientRecordCreate, PatientRecordOut
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from ..database import DBSession, get_db
+from ..bulk import DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE, bulk_body, existing_ids, run_bulk
+from ..events import publish_deletes, publish_inserts
+from ..export import ExportFormat, export_response
+from ..idempotency import Idempotency, idempotency
+from ..sync import record_deletes
+from ..schemas.schemas import BulkRowResult, PatientRecordCreate, PatientRecordOut
 from ..models.models import PatientRecord, Patient, Doctor
+from ..serialization import ListSerializer
+from ..vitals import apply_vitals, record_vitals
 
 router = APIRouter(prefix="/patient_records", tags=["patient_records"])
 
+RECORD_LIST = ListSerializer(PatientRecordOut, PatientRecord)
+
+@router.get("/export")
+def export_records(
+    format: ExportFormat = "ndjson",
+    patient_id: Optional[int] = None,
+    doctor_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    stmt = select(PatientRecord.id, PatientRecord.patient_id, PatientRecord.doctor_id,
+                  PatientRecord.date, PatientRecord.height_in, PatientRecord.weight_lb,
+                  PatientRecord.diagnosis, PatientRecord.notes)
+    if patient_id is not None:
+        stmt = stmt.where(PatientRecord.patient_id == patient_id)
+    if doctor_id is not None:
+        stmt = stmt.where(PatientRecord.doctor_id == doctor_id)
+    if date_from is not None:
+        stmt = stmt.where(PatientRecord.date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(PatientRecord.date <= date_to)
+    return export_response(stmt.order_by(PatientRecord.id), format, "patient_records")
+
 @router.get("/{patient_id}", response_model=list[PatientRecordOut])
-def list_records(patient_id: int, db: Session = Depends(get_db)):
-    return db.query(PatientRecord).filter(PatientRecord.patient_id==patient_id).order_by(PatientRecord.date.desc()).all()
+async def list_records(patient_id: int, response: Response, db: DBSession = Depends(get_db)):
+    stmt = RECORD_LIST.select().where(PatientRecord.patient_id==patient_id).order_by(PatientRecord.date.desc())
+    return RECORD_LIST.respond(await RECORD_LIST.fetch(db, stmt), response)
 
 @router.post("", response_model=PatientRecordOut)
-def create_record(payload: PatientRecordCreate, db: Session = Depends(get_db)):
-    if not db.get(Patient, payload.patient_id):
+async def create_record(payload: PatientRecordCreate, db: DBSession = Depends(get_db),
+                        idem: Idempotency = Depends(idempotency)):
+    return await idem.run(db, lambda: _add_record(payload, db), PatientRecordOut)
+
+async def _add_record(payload: PatientRecordCreate, db: DBSession) -> PatientRecord:
+    if not await db.get(Patient, payload.patient_id):
         raise HTTPException(400, "Invalid patient")
-    if payload.doctor_id and not db.get(Doctor, payload.doctor_id):
+    if payload.doctor_id and not await db.get(Doctor, payload.doctor_id):
         raise HTTPException(400, "Invalid doctor")
     r = PatientRecord(**payload.dict())
-    db.add(r); db.commit(); db.refresh(r)
+    db.add(r)
+    await apply_vitals(db, [record_vitals(r)])
+    await db.flush()
+    await publish_inserts(db, "patient_records", PatientRecordOut, [r])
     return r
 
+async def _prepare_records(db: DBSession, batch: list):
+    patients = await existing_ids(db, Patient, (r.patient_id for _, r in batch))
+    doctors = await existing_ids(db, Doctor, (r.doctor_id for _, r in batch))
+    rows, errors = [], []
+    for i, r in batch:
+        if r.patient_id not in patients:
+            errors.append({"index": i, "error": "Invalid patient"})
+        elif r.doctor_id and r.doctor_id not in doctors:
+            errors.append({"index": i, "error": "Invalid doctor"})
+        else:
+            rows.append((i, r.model_dump()))
+    return rows, errors
+
+async def _after_insert(db: DBSession, rows: list[dict], ids: list[int]):
+    await apply_vitals(db, map(record_vitals, rows))
+    await publish_inserts(db, "patient_records", PatientRecordOut, [{**r, "id": i} for r, i in zip(rows, ids)])
+
+@router.post("/bulk", response_model=list[BulkRowResult])
+async def create_records_bulk(
+    items: list = Depends(bulk_body),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=MAX_BATCH_SIZE),
+    db: DBSession = Depends(get_db),
+):
+    return await run_bulk(db, items, PatientRecordCreate, PatientRecord, batch_size, _prepare_records, _after_insert)
+
 @router.delete("/{record_id}")
-def delete_record(record_id: int, db: Session = Depends(get_db)):
-    r = db.get(PatientRecord, record_id)
+async def delete_record(record_id: int, db: DBSession = Depends(get_db)):
+    r = await db.get(PatientRecord, record_id)
     if not r:
         raise HTTPException(404, "Record not found")
-    db.delete(r); db.commit()
+    await apply_vitals(db, [record_vitals(r)], -1)
+    await publish_deletes(db, "patient_records", [record_id])
+    await record_deletes(db, "patient_records", [record_id])
+    await db.delete(r); await db.commit()
     return {"ok": True}
@@ -1,25 +1,156 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from ..database import get_db
-from ..schemas.schemas import PatientCreate, PatientOut
-from ..models.models import Patient
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.orm import joinedload
+from ..database import DBSession, get_db
+from ..schemas.schemas import BulkDeleteResult, BulkRowResult, PatientCreate, PatientOut, PatientSummaryOut
+from ..models.models import Appointment, Patient, PatientRecord
+from ..cache import list_cache
+from ..events import publish_deletes, publish_inserts
+from ..serialization import ListSerializer
+from ..sync import record_deletes
+from ..bulk import DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE, bulk_body, existing_ids, run_bulk
+from ..vitals import remove_patient_vitals
+from ..pagination import DEFAULT_LIMIT, MAX_LIMIT, decode_id_cursor, finish_page, prefix_pattern
 
 router = APIRouter(prefix="/patients", tags=["patients"])
 
+PATIENT_LIST = ListSerializer(PatientOut, Patient)
+
 @router.get("", response_model=list[PatientOut])
-def list_patients(db: Session = Depends(get_db)):
-    return db.query(Patient).all()
+async def list_patients(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    name: Optional[str] = Query(None, description="First or last name prefix"),
+    db: DBSession = Depends(get_db),
+):
+    async def load(response: Response):
+        stmt = PATIENT_LIST.select()
+        if name:
+            pattern = prefix_pattern(name)
+            stmt = stmt.where(or_(Patient.first_name.ilike(pattern, escape="\\"),
+                                  Patient.last_name.ilike(pattern, escape="\\")))
+        if cursor:
+            stmt = stmt.where(Patient.id > decode_id_cursor(cursor))
+        rows = await PATIENT_LIST.fetch(db, stmt.order_by(Patient.id.asc()).limit(limit + 1))
+        return finish_page(rows, limit, response, lambda p: (p.id,))
+    return await list_cache.respond(request, "patients", PATIENT_LIST, load)
+
+MAX_SUMMARY_IDS = 100
+
+def _latest_per_patient(model, ids: list[int], n: int, where, order_by):
+    """Rows of `model` for `ids`, at most `n` per patient, as one window-function query."""
+    ranked = (
+        select(model.id, func.row_number().over(partition_by=model.patient_id, order_by=order_by).label("rn"))
+        .where(model.patient_id.in_(ids), *where)
+        .subquery()
+    )
+    return (
+        select(model)
+        .join(ranked, ranked.c.id == model.id)
+        .where(ranked.c.rn <= n)
+        .options(joinedload(model.doctor))
+        .order_by(*order_by)
+    )
+
+async def _load_summaries(db: DBSession, ids: list[int], n_records: int, n_appointments: int) -> list[dict]:
+    # three queries whatever the number of patients: patients, records + doctors, appointments + doctors
+    patients = (await db.scalars(select(Patient).where(Patient.id.in_(ids)))).all()
+    records = (await db.scalars(_latest_per_patient(
+        PatientRecord, ids, n_records, (),
+        (PatientRecord.date.desc(), PatientRecord.id.desc()),
+    ))).all()
+    appointments = (await db.scalars(_latest_per_patient(
+        Appointment, ids, n_appointments, (Appointment.date >= date.today(),),
+        (Appointment.date.asc(), Appointment.time.asc(), Appointment.id.asc()),
+    ))).all()
+
+    summaries = {p.id: {"patient": p, "records": [], "upcoming_appointments": [], "doctors": {}} for p in patients}
+    for r in records:
+        summaries[r.patient_id]["records"].append(r)
+    for a in appointments:
+        summaries[a.patient_id]["upcoming_appointments"].append(a)
+    for s in summaries.values():
+        for item in s["records"] + s["upcoming_appointments"]:
+            if item.doctor is not None:
+                s["doctors"][item.doctor.id] = item.doctor
+        s["doctors"] = list(s["doctors"].values())
+    return [summaries[i] for i in ids if i in summaries]
+
+@router.get("/summary", response_model=list[PatientSummaryOut])
+async def patient_summaries(
+    ids: list[int] = Query(..., max_length=MAX_SUMMARY_IDS),
+    records: int = Query(10, ge=0, le=100),
+    appointments: int = Query(10, ge=0, le=100),
+    db: DBSession = Depends(get_db),
+):
+    return await _load_summaries(db, list(dict.fromkeys(ids)), records, appointments)
+
+@router.get("/{patient_id}/summary", response_model=PatientSummaryOut)
+async def patient_summary(
+    patient_id: int,
+    records: int = Query(10, ge=0, le=100),
+    appointments: int = Query(10, ge=0, le=100),
+    db: DBSession = Depends(get_db),
+):
+    summaries = await _load_summaries(db, [patient_id], records, appointments)
+    if not summaries:
+        raise HTTPException(404, "Patient not found")
+    return summaries[0]
 
 @router.post("", response_model=PatientOut)
-def create_patient(payload: PatientCreate, db: Session = Depends(get_db)):
+async def create_patient(payload: PatientCreate, db: DBSession = Depends(get_db)):
     p = Patient(**payload.dict())
-    db.add(p); db.commit(); db.refresh(p)
+    db.add(p); await db.flush()
+    await publish_inserts(db, "patients", PatientOut, [p])
+    await db.commit(); await db.refresh(p)
+    list_cache.invalidate("patients")
     return p
 
+async def _publish_inserts(db: DBSession, rows: list[dict], ids: list[int]):
+    await publish_inserts(db, "patients", PatientOut, [{**r, "id": i} for r, i in zip(rows, ids)])
+
+@router.post("/bulk", response_model=list[BulkRowResult])
+async def create_patients_bulk(
+    items: list = Depends(bulk_body),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=MAX_BATCH_SIZE),
+    db: DBSession = Depends(get_db),
+):
+    results = await run_bulk(db, items, PatientCreate, Patient, batch_size, on_insert=_publish_inserts)
+    list_cache.invalidate("patients")
+    return results
+
+async def _delete_patients(db: DBSession, ids) -> list[int]:
+    # a few set-based statements however many records the patients have
+    found = sorted(await existing_ids(db, Patient, ids))
+    if not found:
+        return []
+    await remove_patient_vitals(db, found)
+    records = (await db.scalars(
+        delete(PatientRecord).where(PatientRecord.patient_id.in_(found)).returning(PatientRecord.id)
+    )).all()
+    await db.execute(update(Appointment).where(Appointment.patient_id.in_(found)).values(patient_id=None))
+    await db.execute(delete(Patient).where(Patient.id.in_(found)))
+    await publish_deletes(db, "patients", found)
+    await record_deletes(db, "patients", found)
+    if records:
+        await publish_deletes(db, "patient_records", records)
+        await record_deletes(db, "patient_records", records)
+    await db.commit()
+    list_cache.invalidate("patients")
+    return found
+
+@router.post("/bulk_delete", response_model=BulkDeleteResult)
+async def delete_patients_bulk(ids: list[int] = Body(..., max_length=MAX_BATCH_SIZE), db: DBSession = Depends(get_db)):
+    """Delete the patients with these ids, with their records; their appointments are kept, unassigned."""
+    deleted = await _delete_patients(db, ids)
+    return {"deleted": deleted, "missing": sorted(set(ids) - set(deleted))}
+
 @router.delete("/{patient_id}")
-def delete_patient(patient_id: int, db: Session = Depends(get_db)):
-    p = db.get(Patient, patient_id)
-    if not p:
+async def delete_patient(patient_id: int, db: DBSession = Depends(get_db)):
+    if not await _delete_patients(db, [patient_id]):
         raise HTTPException(404, "Patient not found")
-    db.delete(p); db.commit()
     return {"ok": True}
@@ -0,0 +1,35 @@
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import text
+from ..database import DBSession, engine, get_db
+from ..schemas.schemas import SearchHit
+from ..search import SEARCH_TYPES, match_expression, parse_query, search_sql
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+MAX_OFFSET = 1000
+
+@router.get("", response_model=list[SearchHit])
+async def search(
+    q: str = Query(..., min_length=1, description="Words to match; the last one also matches as a prefix"),
+    type: Optional[Literal["patients", "doctors", "records"]] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=MAX_OFFSET),
+    db: DBSession = Depends(get_db),
+):
+    terms = parse_query(q)
+    if not terms:
+        return []
+    dialect = engine.dialect.name
+    match = match_expression(dialect, terms)
+    hits = []
+    # each type contributes its own top (offset + limit); merged by rank below
+    for entity in ([type] if type else SEARCH_TYPES):
+        sql = search_sql(dialect, entity)
+        if sql is None:
+            raise HTTPException(501, f"Search is not supported on {dialect}")
+        rows = (await db.execute(text(sql), {"q": match, "n": offset + limit})).all()
+        hits += [{"type": entity, **row._mapping} for row in rows]
+    hits.sort(key=lambda h: h["rank"], reverse=True)
+    return hits[offset:offset + limit]
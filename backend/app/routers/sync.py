@@ -0,0 +1,29 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+import orjson
+from fastapi import APIRouter, Depends, Query, Response
+from ..database import DBSession, get_db
+from ..schemas.schemas import SyncPage
+from ..sync import DEFAULT_SYNC_LIMIT, MAX_SYNC_LIMIT, sync_page
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+@router.get("", response_model=SyncPage)
+async def sync(
+    since: Optional[datetime] = Query(None, description="The watermark returned by your last completed sync; omit for a full sync"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; `since` is then ignored"),
+    limit: int = Query(DEFAULT_SYNC_LIMIT, ge=1, le=MAX_SYNC_LIMIT),
+    db: DBSession = Depends(get_db),
+):
+    """
+    Rows created or updated, and ids deleted, since `since`, across doctors,
+    patients, patient records and appointments, at most `limit` rows per page.
+    Follow `next_cursor` until it is null, apply `deleted` after `changes`,
+    then keep `watermark` for the next sync. `reset: true` means a full sync:
+    replace the local copy.
+    """
+    if since is not None and since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    page = await sync_page(db, since, cursor, limit)
+    return Response(orjson.dumps(page), media_type="application/json")
@@ -0,0 +1,32 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from ..database import DBSession, get_db
+from ..schemas.schemas import RollupPoint, VitalsPoint
+from ..models.models import Patient
+from ..vitals import Bucket, Dimension, patient_series, rollup_series
+
+router = APIRouter(prefix="/vitals", tags=["vitals"])
+
+@router.get("/patients/{patient_id}", response_model=list[VitalsPoint])
+async def patient_vitals(
+    patient_id: int,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    db: DBSession = Depends(get_db),
+):
+    if not await db.get(Patient, patient_id):
+        raise HTTPException(404, "Patient not found")
+    return await patient_series(db, patient_id, date_from, date_to)
+
+@router.get("/rollups", response_model=list[RollupPoint])
+async def vitals_rollups(
+    by: Dimension = "all",
+    key: Optional[str] = Query(None, description="Doctor id or diagnosis; all keys if omitted"),
+    bucket: Bucket = "month",
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    db: DBSession = Depends(get_db),
+):
+    return await rollup_series(db, by, key, bucket, date_from, date_to)
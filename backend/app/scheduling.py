@@ -0,0 +1,122 @@
+"""
+Doctor availability and double-booking checks.
+
+Appointments have a start time but no duration, so every booking is treated
+as occupying APPOINTMENT_SLOT_MINUTES. Two bookings for the same doctor on the
+same day conflict when their start times are less than one slot apart. All
+lookups go through the (doctor_id, date, time) index on appointments.
+
+A check followed by an insert races with a concurrent booking, so booking
+transactions first lock_doctors(): later bookings for the same doctors wait
+for the commit and then see the new appointment.
+"""
+import os
+from bisect import bisect_right, insort
+from datetime import date, datetime, time as Time, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import select, update
+
+from .database import DBSession, engine
+from .models.models import Appointment, Doctor
+
+APPOINTMENT_SLOT_MINUTES = int(os.getenv("APPOINTMENT_SLOT_MINUTES", "30"))
+CLINIC_OPEN = Time.fromisoformat(os.getenv("CLINIC_OPEN", "09:00"))
+CLINIC_CLOSE = Time.fromisoformat(os.getenv("CLINIC_CLOSE", "17:00"))
+MAX_AVAILABILITY_DAYS = 62
+
+
+def _minutes(t: Time) -> int:
+    return t.hour * 60 + t.minute
+
+
+def overlaps(booked: list[int], start: int, slot: int = APPOINTMENT_SLOT_MINUTES) -> bool:
+    """Whether a booking at `start` (minutes) clashes with the sorted start minutes in `booked`."""
+    i = bisect_right(booked, start - slot)
+    return i < len(booked) and booked[i] < start + slot
+
+
+def booked_by_day(rows: Iterable[tuple[date, Optional[Time]]]) -> dict[date, list[int]]:
+    days: dict[date, list[int]] = {}
+    for day, t in rows:
+        if t is not None:  # untimed appointments don't block a slot
+            days.setdefault(day, []).append(_minutes(t))
+    for booked in days.values():
+        booked.sort()
+    return days
+
+
+async def bookings_for(db: DBSession, doctor_ids: set[int], days: set[date]) -> dict[tuple[int, date], list[int]]:
+    """Sorted booked start minutes per (doctor_id, date), for checking a batch of new bookings at once."""
+    if not doctor_ids or not days:
+        return {}
+    rows = (await db.execute(
+        select(Appointment.doctor_id, Appointment.date, Appointment.time)
+        .where(Appointment.doctor_id.in_(doctor_ids), Appointment.date.in_(days), Appointment.time.is_not(None))
+    )).all()
+    booked: dict[tuple[int, date], list[int]] = {}
+    for doctor_id, day, t in rows:
+        insort(booked.setdefault((doctor_id, day), []), _minutes(t))
+    return booked
+
+
+def book(booked: dict[tuple[int, date], list[int]], doctor_id: int, day: date, at: Time) -> bool:
+    """Record a booking in a `bookings_for` map; False (nothing recorded) if it would conflict."""
+    taken = booked.setdefault((doctor_id, day), [])
+    start = _minutes(at)
+    if overlaps(taken, start):
+        return False
+    insort(taken, start)
+    return True
+
+
+async def lock_doctors(db: DBSession, doctor_ids: Iterable[int]) -> None:
+    """Hold these doctors' bookings until the transaction ends; call before checking for conflicts."""
+    ids = sorted(set(doctor_ids))
+    if not ids:
+        return
+    if engine.dialect.name == "sqlite":
+        # no row locks: a no-op write takes the database write lock instead (updated_at is
+        # set to itself, which also keeps the onupdate stamp off, so /sync sees no change)
+        await db.execute(update(Doctor).where(Doctor.id.in_(ids)).values(updated_at=Doctor.updated_at)
+                         .execution_options(synchronize_session=False))
+    else:
+        # in id order, so batches locking several doctors can't deadlock
+        await db.execute(select(Doctor.id).where(Doctor.id.in_(ids)).order_by(Doctor.id).with_for_update())
+
+
+async def find_conflict(db: DBSession, doctor_id: int, day: date, at: Time) -> Optional[int]:
+    """Id of an existing appointment that `at` would overlap, if any."""
+    start = datetime.combine(day, at)
+    slot = timedelta(minutes=APPOINTMENT_SLOT_MINUTES)
+    lo, hi = (start - slot), (start + slot)
+    stmt = select(Appointment.id).where(
+        Appointment.doctor_id == doctor_id, Appointment.date == day, Appointment.time.is_not(None)
+    )
+    # clamp the window to the day; times are compared within a single date
+    if lo.date() == day:
+        stmt = stmt.where(Appointment.time > lo.time())
+    if hi.date() == day:
+        stmt = stmt.where(Appointment.time < hi.time())
+    return await db.scalar(stmt.limit(1))
+
+
+async def free_slots(db: DBSession, doctor_id: int, date_from: date, date_to: date) -> list[tuple[date, list[Time]]]:
+    rows = (await db.execute(
+        select(Appointment.date, Appointment.time)
+        .where(Appointment.doctor_id == doctor_id, Appointment.date >= date_from, Appointment.date <= date_to)
+    )).all()
+    booked = booked_by_day(rows)
+    open_, close = _minutes(CLINIC_OPEN), _minutes(CLINIC_CLOSE)
+    days = []
+    day = date_from
+    while day <= date_to:
+        taken = booked.get(day, [])
+        slots = [
+            Time(m // 60, m % 60)
+            for m in range(open_, close - APPOINTMENT_SLOT_MINUTES + 1, APPOINTMENT_SLOT_MINUTES)
+            if not overlaps(taken, m)
+        ]
+        days.append((day, slots))
+        day += timedelta(days=1)
+    return days
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from datetime import date, time as Time
+from datetime import date, datetime, time as Time
 from typing import Optional
 
 from pydantic import BaseModel, ConfigDict, EmailStr
@@ -103,3 +103,90 @@ class AppointmentOut(BaseModel):
 
     # Pydantic v2: replacement for orm_mode = True
     model_config = ConfigDict(from_attributes=True)
+
+
+# ---------- Patient summary ----------
+class PatientSummaryOut(BaseModel):
+    patient: PatientOut
+    records: list[PatientRecordOut]
+    upcoming_appointments: list[AppointmentOut]
+    # doctors referenced by the records and appointments above
+    doctors: list[DoctorOut]
+
+
+# ---------- Availability ----------
+class DaySlots(BaseModel):
+    date: date
+    slots: list[Time]
+
+class AvailabilityOut(BaseModel):
+    doctor_id: int
+    slot_minutes: int
+    days: list[DaySlots]
+
+
+# ---------- Vitals ----------
+class VitalsPoint(BaseModel):
+    record_id: int
+    date: date
+    height_in: Optional[int] = None
+    weight_lb: Optional[int] = None
+    bmi: Optional[float] = None
+    # against the previous record that has a weight
+    weight_change_lb: Optional[int] = None
+
+class RollupPoint(BaseModel):
+    # doctor id or normalized diagnosis ("" for dimension "all")
+    key: str
+    bucket: date
+    records: int
+    avg_weight_lb: Optional[float] = None
+    avg_height_in: Optional[float] = None
+    avg_bmi: Optional[float] = None
+
+
+# ---------- Search ----------
+class SearchHit(BaseModel):
+    type: str  # "patients" | "doctors" | "records"
+    id: int
+    label: str
+    # records: the owning patient and the matching part of the notes; doctors: specialty
+    patient_id: Optional[int] = None
+    snippet: Optional[str] = None
+    rank: float
+
+
+# ---------- Auth ----------
+class UserCreate(BaseModel):
+    username: str
+    password: str
+
+class TokenOut(BaseModel):
+    token: str
+
+
+# ---------- Bulk ----------
+class BulkRowResult(BaseModel):
+    # position of the item in the submitted array / NDJSON stream
+    index: int
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkDeleteResult(BaseModel):
+    deleted: list[int]
+    # requested ids that didn't exist
+    missing: list[int]
+
+
+# ---------- Sync ----------
+class SyncPage(BaseModel):
+    # per entity: rows as in its Out schema plus updated_at
+    changes: dict[str, list[dict]]
+    # per entity: ids deleted since the watermark
+    deleted: dict[str, list[int]]
+    # set while the pass has more pages: pass it back as ?cursor=
+    next_cursor: Optional[str] = None
+    # set on the last page: the `since` for the next sync
+    watermark: Optional[datetime] = None
+    # a full sync: replace the local copy instead of merging
+    reset: bool
@@ -0,0 +1,132 @@
+"""
+Search indexes and queries for patients, doctors and patient records.
+
+SQLite uses FTS5 external-content tables kept in sync by triggers; Postgres
+uses GIN indexes over tsvector expressions. Both are created with the tables
+(see models.py) and added to existing databases by `python -m app.migrate`.
+Every query term must match; the last one also matches as a prefix, so
+"smi" finds "Smith" while the user is still typing.
+"""
+import re
+from typing import Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+SEARCH_TYPES = ("patients", "doctors", "records")
+
+# entity -> (table, searchable columns, SQLite tokenizer, Postgres text search config)
+SEARCH_TABLES = {
+    "patients": ("patients", ("first_name", "last_name"), "unicode61", "simple"),
+    "doctors": ("doctors", ("first_name", "last_name", "specialty"), "unicode61", "simple"),
+    "records": ("patient_records", ("diagnosis", "notes"), "porter unicode61", "english"),
+}
+
+
+def _pg_vector(entity: str) -> str:
+    # must match the index expression exactly for the planner to use the GIN index
+    _, columns, _, config = SEARCH_TABLES[entity]
+    doc = " || ' ' || ".join(f"coalesce({c}, '')" for c in columns)
+    return f"to_tsvector('{config}', {doc})"
+
+
+def _sqlite_ddl(entity: str) -> list[str]:
+    table, columns, tokenizer, _ = SEARCH_TABLES[entity]
+    fts = f"{table}_fts"
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', content_rowid='id', tokenize='{tokenizer}')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+    ]
+
+
+def create_search_schema(conn: Connection, concurrently: bool = False, tables: Optional[set[str]] = None) -> list[str]:
+    """
+    Create any missing search index (only for `tables`, if given); returns
+    the names of the ones created. Idempotent.
+    """
+    existing = set(inspect(conn).get_table_names())
+    created = []
+    for entity, (table, *_rest) in SEARCH_TABLES.items():
+        if tables is not None and table not in tables:
+            continue
+        if conn.dialect.name == "sqlite":
+            fts = f"{table}_fts"
+            # triggers are re-created if their table was dropped and re-created
+            for stmt in _sqlite_ddl(entity):
+                conn.execute(text(stmt))
+            if fts not in existing:
+                # index rows that existed before the FTS table
+                conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+                created.append(fts)
+        elif conn.dialect.name == "postgresql":
+            name = f"ix_{table}_fts"
+            if any(ix["name"] == name for ix in inspect(conn).get_indexes(table)):
+                continue
+            conc = "CONCURRENTLY " if concurrently else ""
+            conn.execute(text(f"CREATE INDEX {conc}IF NOT EXISTS {name} ON {table} USING gin ({_pg_vector(entity)})"))
+            created.append(name)
+    return created
+
+
+def parse_query(q: str) -> list[str]:
+    return re.findall(r"\w+", q.lower())
+
+
+def _sqlite_match(terms: list[str]) -> str:
+    return " ".join(f'"{t}"' for t in terms[:-1]) + f' "{terms[-1]}"*'
+
+
+def _pg_tsquery(terms: list[str]) -> str:
+    # \w+ terms can't contain tsquery operators
+    return " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+
+
+_LABELS = {
+    "patients": ("t.first_name || ' ' || t.last_name", "NULL", "NULL"),
+    "doctors": ("t.first_name || ' ' || t.last_name", "NULL", "t.specialty"),
+    "records": ("t.diagnosis", "t.patient_id", None),  # snippet comes from notes
+}
+
+
+def search_sql(dialect: str, entity: str) -> Optional[str]:
+    """
+    Ranked query for one entity type, with :q (the match expression from
+    `match_expression`) and :n (row limit) parameters. None if unsupported.
+    """
+    table, *_rest = SEARCH_TABLES[entity]
+    label, patient_id, snippet = _LABELS[entity]
+    if dialect == "sqlite":
+        fts = f"{table}_fts"
+        if snippet is None:
+            snippet = f"snippet({fts}, 1, '[', ']', '…', 12)"
+        return (
+            f"SELECT t.id, {label} AS label, {patient_id} AS patient_id, {snippet} AS snippet, "
+            f"-bm25({fts}) AS rank "
+            f"FROM {fts} JOIN {table} t ON t.id = {fts}.rowid "
+            f"WHERE {fts} MATCH :q ORDER BY rank DESC LIMIT :n"
+        )
+    if dialect == "postgresql":
+        config = SEARCH_TABLES[entity][3]
+        if snippet is None:
+            snippet = f"ts_headline('{config}', t.notes, query, 'StartSel=[,StopSel=],MaxWords=12,MinWords=4')"
+        vector = _pg_vector(entity)
+        return (
+            f"SELECT t.id, {label} AS label, {patient_id} AS patient_id, {snippet} AS snippet, "
+            f"ts_rank({vector}, query) AS rank "
+            f"FROM {table} t, to_tsquery('{config}', :q) query "
+            f"WHERE {vector} @@ query ORDER BY rank DESC LIMIT :n"
+        )
+    return None
+
+
+def match_expression(dialect: str, terms: list[str]) -> str:
+    return _sqlite_match(terms) if dialect == "sqlite" else _pg_tsquery(terms)
@@ -0,0 +1,53 @@
+"""
+List response serialization.
+
+By default list endpoints load ORM objects and validate every row through the
+Out schema, as FastAPI's response_model does. FAST_LISTS=1 opts into a fast
+path: only the schema's columns are selected, as plain tuples, and the JSON
+array is built directly with orjson. Both produce the same body (same keys,
+same order, same date/time formats); see benchmarks/serialization.py.
+"""
+import os
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import Select, select
+
+from .database import DBSession
+
+FAST_LISTS = os.getenv("FAST_LISTS", "0").lower() in ("1", "true", "yes")
+
+
+class ListSerializer:
+    def __init__(self, schema: type[BaseModel], model, fast: bool = FAST_LISTS):
+        self.model = model
+        self.fast = fast
+        self.adapter = TypeAdapter(list[schema])
+        self.fields = list(schema.model_fields)
+        self.columns = [getattr(model, f) for f in self.fields]
+
+    def select(self) -> Select:
+        return select(*self.columns) if self.fast else select(self.model)
+
+    async def fetch(self, db: DBSession, stmt: Select) -> list:
+        # rows expose the same attribute names either way (ORM objects or Row tuples)
+        if self.fast:
+            return (await db.execute(stmt)).all()
+        return (await db.scalars(stmt)).all()
+
+    def dump(self, rows: list) -> bytes:
+        if self.fast:
+            return orjson.dumps([dict(zip(self.fields, row)) for row in rows])
+        return self.adapter.dump_json(self.adapter.validate_python(rows, from_attributes=True))
+
+    def respond(self, rows: list, response: Response):
+        """
+        Return value for a list endpoint: the rows themselves (FastAPI applies
+        response_model) or, on the fast path, the finished JSON response
+        carrying any headers already set on `response`.
+        """
+        if not self.fast:
+            return rows
+        headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+        return Response(self.dump(rows), media_type="application/json", headers=headers)
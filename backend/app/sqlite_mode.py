@@ -0,0 +1,83 @@
+"""
+SQLite production mode.
+
+Every connection to a file database gets WAL journaling (readers never block
+the writer or each other), synchronous=NORMAL (no fsync per commit in WAL;
+a power loss can lose the last commits but never corrupts), a larger page
+cache, memory-mapped reads, a busy timeout and foreign key enforcement (off
+by default in SQLite, and needed for the models' ON DELETE rules).
+
+SQLite allows one writer at a time. Left to contend, concurrent request
+transactions fail with "database is locked". With SQLITE_SINGLE_WRITER,
+request sessions send their writes to a pool holding a single connection:
+writers queue for it in the app, and reads keep using the normal pool.
+
+Set SQLITE_TUNED=0 to get SQLite's defaults back.
+"""
+import os
+
+from sqlalchemy import Delete, Insert, Update, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session
+
+SQLITE_TUNED = os.getenv("SQLITE_TUNED", "1").lower() in ("1", "true", "yes")
+SQLITE_SINGLE_WRITER = os.getenv("SQLITE_SINGLE_WRITER", "1").lower() in ("1", "true", "yes")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# how long a request waits for the writer connection
+SQLITE_WRITE_TIMEOUT = float(os.getenv("SQLITE_WRITE_TIMEOUT", "30"))
+
+
+def is_file_database(url: str) -> bool:
+    database = make_url(url).database
+    return bool(database) and database != ":memory:" and "mode=memory" not in url
+
+
+def pragmas() -> list[str]:
+    return [
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}",  # negative: KiB rather than pages
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+        "PRAGMA foreign_keys=ON",
+    ]
+
+
+def tune(engine: Engine) -> None:
+    """Apply the production pragmas to every new connection (a sync engine or an async engine's sync_engine)."""
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas():
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+class WriteRoutingSession(Session):
+    """
+    Sends INSERT/UPDATE/DELETE statements and ORM flushes to the single
+    writer connection (session.info["sqlite_writer"]); everything else uses
+    the session's normal bind. Once a transaction has written, its remaining
+    statements stay on the writer so they see its uncommitted changes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        writer = self.info.get("sqlite_writer")
+        if writer is None:
+            return super().get_bind(mapper, clause=clause, **kw)
+        if self.info.get("wrote") or self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            self.info["wrote"] = True
+            return writer
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+@event.listens_for(WriteRoutingSession, "after_transaction_end")
+def _release_writer(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("wrote", None)
@@ -0,0 +1,146 @@
+"""
+Incremental sync.
+
+Every synced table has an indexed `updated_at` (set on each INSERT and
+UPDATE) and deletions leave a row in `tombstones`, so GET /sync can return
+just what changed since a client's last watermark: for each entity in turn,
+and then the tombstones, rows with `since < updated_at <= until`, in
+(updated_at, id) order, LIMIT rows per page. A sync costs index range
+scans over the changes, not table scans.
+
+A sync pass fixes `until` at its start, SYNC_LAG_SECONDS in the past, so
+transactions still committing with an earlier timestamp aren't skipped
+(it also absorbs small clock differences between app servers). Follow-up
+pages carry the pass in an opaque cursor; the last page returns `until`
+as the watermark for the next pass.
+
+Tombstones are kept SYNC_TOMBSTONE_DAYS. A client whose watermark is older
+than that (or that has none) gets a full sync flagged `reset`: it should
+replace its copy rather than merge, as it can't be told about older deletes.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, insert, or_, select
+from sqlalchemy.orm import Session
+
+from .database import DBSession
+from .models.models import Appointment, Doctor, Patient, PatientRecord, Tombstone
+from .pagination import decode_cursor, encode_cursor
+from .schemas.schemas import AppointmentOut, DoctorOut, PatientOut, PatientRecordOut
+
+SYNC_LAG_SECONDS = float(os.getenv("SYNC_LAG_SECONDS", "5"))
+SYNC_TOMBSTONE_DAYS = int(os.getenv("SYNC_TOMBSTONE_DAYS", "30"))
+DEFAULT_SYNC_LIMIT = 500
+MAX_SYNC_LIMIT = 5000
+
+# in sync order; tombstones come last
+ENTITIES = {
+    "doctors": (Doctor, DoctorOut),
+    "patients": (Patient, PatientOut),
+    "patient_records": (PatientRecord, PatientRecordOut),
+    "appointments": (Appointment, AppointmentOut),
+}
+STEPS = [*ENTITIES, "tombstones"]
+
+
+async def record_deletes(db: DBSession, entity: str, ids: list[int]) -> None:
+    """Leave tombstones for deleted rows of `entity`, in the caller's transaction."""
+    if ids:
+        await db.execute(insert(Tombstone), [{"entity": entity, "entity_id": i} for i in ids])
+
+
+def purge_tombstones(session: Session) -> int:
+    cutoff = datetime.utcnow() - timedelta(days=SYNC_TOMBSTONE_DAYS)
+    deleted = session.execute(delete(Tombstone).where(Tombstone.deleted_at < cutoff)).rowcount
+    session.commit()
+    return deleted
+
+
+def _after(ts_column, id_column, last: Optional[tuple]):
+    if last is None:
+        return True
+    last_ts, last_id = last
+    return or_(ts_column > last_ts, and_(ts_column == last_ts, id_column > last_id))
+
+
+def _statement(step: str, since: Optional[datetime], until: datetime, last: Optional[tuple], limit: int):
+    if step == "tombstones":
+        ts, id_ = Tombstone.deleted_at, Tombstone.id
+        stmt = select(Tombstone.id, Tombstone.deleted_at, Tombstone.entity, Tombstone.entity_id)
+    else:
+        model, schema = ENTITIES[step]
+        ts, id_ = model.updated_at, model.id
+        stmt = select(model.id, model.updated_at, *(getattr(model, f) for f in schema.model_fields))
+    if since is not None:
+        stmt = stmt.where(ts > since)
+    return stmt.where(ts <= until, _after(ts, id_, last)).order_by(ts, id_).limit(limit)
+
+
+def _parse_ts(value) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(400, "Invalid cursor")
+
+
+def decode_sync_cursor(cursor: str) -> tuple:
+    since, until, step, last_ts, last_id = decode_cursor(cursor, 5)
+    if not isinstance(step, int) or not 0 <= step < len(STEPS):
+        raise HTTPException(400, "Invalid cursor")
+    last = None
+    if last_ts is not None:
+        if not isinstance(last_id, int):
+            raise HTTPException(400, "Invalid cursor")
+        last = (_parse_ts(last_ts), last_id)
+    return (_parse_ts(since) if since is not None else None), _parse_ts(until), step, last
+
+
+async def sync_page(db: DBSession, since: Optional[datetime], cursor: Optional[str], limit: int) -> dict:
+    reset = False
+    if cursor is not None:
+        since, until, step, last = decode_sync_cursor(cursor)
+        reset = since is None
+    else:
+        now = datetime.utcnow()
+        until = now - timedelta(seconds=SYNC_LAG_SECONDS)
+        if since is None or since < now - timedelta(days=SYNC_TOMBSTONE_DAYS):
+            since, reset = None, True
+        elif since >= until:
+            until = since  # synced moments ago: nothing settled yet, keep the watermark
+        step, last = 0, None
+
+    changes = {name: [] for name in ENTITIES}
+    deleted = {name: [] for name in ENTITIES}
+    next_cursor = None
+    remaining = limit
+    while step < len(STEPS):
+        name = STEPS[step]
+        rows = (await db.execute(_statement(name, since, until, last, remaining + 1))).all()
+        more = len(rows) > remaining
+        rows = rows[:remaining]
+        if name == "tombstones":
+            for _, _, entity, entity_id in rows:
+                if entity in deleted:
+                    deleted[entity].append(entity_id)
+        else:
+            fields = ["updated_at", *ENTITIES[name][1].model_fields]
+            changes[name] += [dict(zip(fields, row[1:])) for row in rows]
+        remaining -= len(rows)
+        if more:
+            next_cursor = encode_cursor(since, until, step, rows[-1][1], rows[-1][0])
+            break
+        step, last = step + 1, None
+        if remaining == 0 and step < len(STEPS):
+            next_cursor = encode_cursor(since, until, step, None, None)
+            break
+    return {
+        "changes": changes,
+        "deleted": deleted,
+        "next_cursor": next_cursor,
+        # only once the pass is complete: the `since` for the next one
+        "watermark": until if next_cursor is None else None,
+        "reset": reset,
+    }
@@ -0,0 +1,105 @@
+"""
+Session token stores.
+
+TOKEN_STORE=memory (default) keeps tokens in a per-process LRU map: fastest,
+but a token only works on the worker that issued it. TOKEN_STORE=db keeps
+them in the auth_tokens table so every worker and instance behind the load
+balancer accepts them. Both expire tokens after TOKEN_TTL_SECONDS.
+"""
+import hashlib
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, select
+
+from .database import DBSession
+from .models.models import AuthToken
+
+TOKEN_STORE = os.getenv("TOKEN_STORE", "memory")
+TOKEN_TTL_SECONDS = int(os.getenv("TOKEN_TTL_SECONDS", str(24 * 3600)))
+TOKEN_MAX_ENTRIES = int(os.getenv("TOKEN_MAX_ENTRIES", "100000"))
+
+
+class TokenStore(ABC):
+    """Maps bearer tokens to user ids. `db` is the request's session (unused by in-process stores)."""
+
+    @abstractmethod
+    async def put(self, db: DBSession, token: str, user_id: int) -> None: ...
+
+    @abstractmethod
+    async def get(self, db: DBSession, token: str) -> Optional[int]: ...
+
+    @abstractmethod
+    async def revoke(self, db: DBSession, token: str) -> None: ...
+
+
+class MemoryTokenStore(TokenStore):
+    # only touched from the event loop, so no locking is needed
+    def __init__(self, ttl: int = TOKEN_TTL_SECONDS, max_entries: int = TOKEN_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._tokens: OrderedDict[str, tuple[int, float]] = OrderedDict()
+
+    async def put(self, db, token, user_id):
+        self._tokens[token] = (user_id, time.monotonic() + self.ttl)
+        while len(self._tokens) > self.max_entries:
+            self._tokens.popitem(last=False)  # evict least recently used
+
+    async def get(self, db, token):
+        entry = self._tokens.get(token)
+        if entry is None:
+            return None
+        user_id, expires = entry
+        if expires <= time.monotonic():
+            del self._tokens[token]
+            return None
+        self._tokens.move_to_end(token)
+        return user_id
+
+    async def revoke(self, db, token):
+        self._tokens.pop(token, None)
+
+
+class DatabaseTokenStore(TokenStore):
+    # only a SHA-256 of each token is stored, so a leaked table grants no sessions
+    def __init__(self, ttl: int = TOKEN_TTL_SECONDS):
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    async def put(self, db, token, user_id):
+        now = datetime.utcnow()
+        # expired rows are purged on login, through the expires_at index
+        await db.execute(delete(AuthToken).where(AuthToken.expires_at <= now))
+        db.add(AuthToken(token_hash=self._key(token), user_id=user_id,
+                         expires_at=now + timedelta(seconds=self.ttl)))
+        await db.commit()
+
+    async def get(self, db, token):
+        row = (await db.execute(
+            select(AuthToken.user_id, AuthToken.expires_at).where(AuthToken.token_hash == self._key(token))
+        )).first()
+        if row is None or row.expires_at <= datetime.utcnow():
+            return None
+        return row.user_id
+
+    async def revoke(self, db, token):
+        await db.execute(delete(AuthToken).where(AuthToken.token_hash == self._key(token)))
+        await db.commit()
+
+
+def make_token_store(kind: str = TOKEN_STORE) -> TokenStore:
+    if kind == "db":
+        return DatabaseTokenStore()
+    if kind == "memory":
+        return MemoryTokenStore()
+    raise ValueError(f"Unknown TOKEN_STORE: {kind!r} (expected 'memory' or 'db')")
+
+
+token_store = make_token_store()
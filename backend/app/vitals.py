@@ -0,0 +1,190 @@
+"""
+Vitals time series and rollups.
+
+Per-patient series are read straight off the (patient_id, date) index on
+patient_records. Cohort rollups (everyone, per doctor, per diagnosis) come
+from vitals_rollups: per-month counts and sums that every record write path
+adjusts in the same transaction, so a dashboard query reads one row per
+month instead of scanning the records. Averages are sum / n at read time;
+months roll up into quarters and years by adding their totals.
+
+`python -m app.migrate` backfills the table for databases that had records
+before it existed.
+"""
+from datetime import date
+from typing import Iterable, Literal, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.engine import Connection
+
+from .database import DBSession, engine
+from .models.models import PatientRecord, VitalsRollup
+
+Dimension = Literal["all", "doctor", "diagnosis"]
+Bucket = Literal["month", "quarter", "year"]
+
+TOTALS = ("records", "weight_n", "weight_sum", "height_n", "height_sum", "bmi_n", "bmi_sum")
+ROLLUP_BATCH = 1000
+
+# (doctor_id, diagnosis, date, height_in, weight_lb)
+RecordVitals = tuple[Optional[int], Optional[str], date, Optional[int], Optional[int]]
+RECORD_VITALS = (PatientRecord.doctor_id, PatientRecord.diagnosis, PatientRecord.date,
+                 PatientRecord.height_in, PatientRecord.weight_lb)
+
+
+def bmi(height_in: Optional[int], weight_lb: Optional[int]) -> Optional[float]:
+    if not height_in or weight_lb is None:
+        return None
+    return round(703 * weight_lb / height_in ** 2, 1)
+
+
+def diagnosis_key(diagnosis: Optional[str]) -> str:
+    return " ".join((diagnosis or "").lower().split())
+
+
+def bucket_start(day: date, bucket: Bucket = "month") -> date:
+    if bucket == "year":
+        return date(day.year, 1, 1)
+    if bucket == "quarter":
+        return date(day.year, (day.month - 1) // 3 * 3 + 1, 1)
+    return date(day.year, day.month, 1)
+
+
+def contributions(records: Iterable[RecordVitals], sign: int = 1) -> dict[tuple[str, str, date], list]:
+    """Rollup deltas for adding (sign=1) or removing (sign=-1) `records`, keyed by (dimension, key, month)."""
+    deltas: dict[tuple[str, str, date], list] = {}
+    for doctor_id, diagnosis, day, height, weight in records:
+        b = bmi(height, weight)
+        row = (sign, weight is not None, weight or 0, height is not None, height or 0, b is not None, b or 0)
+        month = bucket_start(day)
+        keys = [("all", "", month)]
+        if doctor_id is not None:
+            keys.append(("doctor", str(doctor_id), month))
+        if diag := diagnosis_key(diagnosis):
+            keys.append(("diagnosis", diag, month))
+        for k in keys:
+            totals = deltas.setdefault(k, [0] * len(TOTALS))
+            for i, v in enumerate(row):
+                totals[i] += sign * v if i else v
+    return {k: v for k, v in deltas.items() if v[0]}
+
+
+def _upsert(rows: list[dict]):
+    # imported here: the Postgres dialect is slow to import and unused on SQLite
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(VitalsRollup)
+    return stmt.values(rows).on_conflict_do_update(
+        index_elements=["dimension", "key", "month"],
+        set_={c: getattr(VitalsRollup, c) + getattr(stmt.excluded, c) for c in TOTALS},
+    )
+
+
+async def apply_vitals(db: DBSession, records: Iterable[RecordVitals], sign: int = 1) -> None:
+    """
+    Add (sign=1) or subtract (sign=-1) `records` from the rollups; call it in
+    the transaction that inserts or deletes them. Does not commit.
+    """
+    deltas = contributions(records, sign)
+    rows = [{"dimension": d, "key": k, "month": m, **dict(zip(TOTALS, v))} for (d, k, m), v in deltas.items()]
+    if engine.dialect.name in ("postgresql", "sqlite"):
+        for i in range(0, len(rows), ROLLUP_BATCH):
+            await db.execute(_upsert(rows[i:i + ROLLUP_BATCH]))
+        return
+    for row in rows:
+        pk = [getattr(VitalsRollup, c) == row[c] for c in ("dimension", "key", "month")]
+        result = await db.execute(
+            update(VitalsRollup).where(*pk).values({c: getattr(VitalsRollup, c) + row[c] for c in TOTALS})
+        )
+        if not result.rowcount:
+            db.add(VitalsRollup(**row))
+    await db.flush()
+
+
+def record_vitals(r) -> RecordVitals:
+    """The rollup inputs of a PatientRecord (or any object/dict with the same fields)."""
+    get = r.get if isinstance(r, dict) else (lambda name: getattr(r, name))
+    return get("doctor_id"), get("diagnosis"), get("date"), get("height_in"), get("weight_lb")
+
+
+async def remove_patient_vitals(db: DBSession, patient_ids: list[int]) -> None:
+    """Subtract all of the patients' records, before the patients (and their records) are deleted."""
+    rows = (await db.execute(select(*RECORD_VITALS).where(PatientRecord.patient_id.in_(patient_ids)))).all()
+    await apply_vitals(db, rows, -1)
+
+
+async def drop_doctor_vitals(db: DBSession, doctor_ids: list[int]) -> None:
+    """Deleted doctors' records stay (unassigned) in the "all" and "diagnosis" rollups."""
+    await db.execute(delete(VitalsRollup).where(VitalsRollup.dimension == "doctor",
+                                                VitalsRollup.key.in_([str(i) for i in doctor_ids])))
+
+
+def rebuild_rollups(conn: Connection) -> int:
+    """Recompute vitals_rollups from patient_records; returns the number of rollup rows."""
+    result = conn.execution_options(yield_per=10_000).execute(select(*RECORD_VITALS))
+    deltas = contributions(row for part in result.partitions() for row in part)
+    conn.execute(delete(VitalsRollup))
+    rows = [{"dimension": d, "key": k, "month": m, **dict(zip(TOTALS, v))} for (d, k, m), v in deltas.items()]
+    for i in range(0, len(rows), ROLLUP_BATCH):
+        conn.execute(VitalsRollup.__table__.insert(), rows[i:i + ROLLUP_BATCH])
+    return len(rows)
+
+
+def needs_backfill(conn: Connection) -> bool:
+    has_records = conn.scalar(select(PatientRecord.id).limit(1)) is not None
+    return has_records and conn.scalar(select(VitalsRollup.month).limit(1)) is None
+
+
+async def patient_series(db: DBSession, patient_id: int, date_from: Optional[date], date_to: Optional[date]) -> list[dict]:
+    stmt = select(PatientRecord.id, PatientRecord.date, PatientRecord.height_in, PatientRecord.weight_lb) \
+        .where(PatientRecord.patient_id == patient_id)
+    if date_from is not None:
+        stmt = stmt.where(PatientRecord.date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(PatientRecord.date <= date_to)
+    rows = (await db.execute(stmt.order_by(PatientRecord.date, PatientRecord.id))).all()
+    points, last_weight = [], None
+    for id_, day, height, weight in rows:
+        if height is None and weight is None:
+            continue
+        change = weight - last_weight if weight is not None and last_weight is not None else None
+        points.append({"record_id": id_, "date": day, "height_in": height, "weight_lb": weight,
+                       "bmi": bmi(height, weight), "weight_change_lb": change})
+        if weight is not None:
+            last_weight = weight
+    return points
+
+
+def _avg(total: float, n: int) -> Optional[float]:
+    return round(total / n, 1) if n else None
+
+
+async def rollup_series(db: DBSession, dimension: Dimension, key: Optional[str], bucket: Bucket,
+                        date_from: Optional[date], date_to: Optional[date]) -> list[dict]:
+    """One point per (key, bucket); `key=None` returns every key of the dimension."""
+    stmt = select(VitalsRollup.key, VitalsRollup.month, *(getattr(VitalsRollup, c) for c in TOTALS)) \
+        .where(VitalsRollup.dimension == dimension, VitalsRollup.records > 0)
+    if dimension == "all":
+        key = ""
+    if key is not None:
+        stmt = stmt.where(VitalsRollup.key == (diagnosis_key(key) if dimension == "diagnosis" else key))
+    # whole buckets: a range starting mid-month includes that month
+    if date_from is not None:
+        stmt = stmt.where(VitalsRollup.month >= bucket_start(date_from, bucket))
+    if date_to is not None:
+        stmt = stmt.where(VitalsRollup.month <= date_to)
+    buckets: dict[tuple[str, date], list] = {}
+    for key_, month, *row in (await db.execute(stmt.order_by(VitalsRollup.key, VitalsRollup.month))).all():
+        totals = buckets.setdefault((key_, bucket_start(month, bucket)), [0] * len(TOTALS))
+        for i, v in enumerate(row):
+            totals[i] += v
+    points = []
+    for (k, start), t in buckets.items():
+        t = dict(zip(TOTALS, t))
+        points.append({"key": k, "bucket": start, "records": t["records"],
+                       "avg_weight_lb": _avg(t["weight_sum"], t["weight_n"]),
+                       "avg_height_in": _avg(t["height_sum"], t["height_n"]),
+                       "avg_bmi": _avg(t["bmi_sum"], t["bmi_n"])})
+    return points
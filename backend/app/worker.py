@@ -0,0 +1,99 @@
+"""
+Job worker processes (see app/jobs.py).
+
+    python -m app.worker                  # one process, polls until stopped
+    python -m app.worker --processes 4    # four, each with its own connections
+    python -m app.worker --once           # run what is due now, then exit (cron)
+
+Each process claims up to --batch jobs at a time and sleeps --poll seconds
+when nothing is due. Idle workers also purge old finished jobs, expired sync
+tombstones and old change-feed events, hourly. Run as many processes (on as
+many hosts) as needed; claiming keeps them off each other's jobs.
+"""
+import argparse
+import logging
+import multiprocessing
+import signal
+import time
+
+from . import reminders  # noqa: F401  (registers its job handlers)
+from .database import SessionLocal
+from .events import purge_events
+from .jobs import JOB_BATCH_SIZE, purge, run_batch, worker_name
+from .sync import purge_tombstones
+
+JOB_PURGE_INTERVAL_SECONDS = 3600
+
+log = logging.getLogger("app.worker")
+
+
+def work(batch: int = JOB_BATCH_SIZE, poll: float = 1.0, once: bool = False) -> int:
+    """Run jobs until stopped (SIGTERM/SIGINT), or until none are due with once=True; returns jobs run."""
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    if not once:
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+    name = worker_name()
+    ran = 0
+    purged_at = 0.0
+    with SessionLocal() as session:
+        while not stopping:
+            claimed = run_batch(session, name, batch)
+            ran += claimed
+            if claimed:
+                continue
+            if once:
+                break
+            if time.monotonic() - purged_at >= JOB_PURGE_INTERVAL_SECONDS:
+                purge(session)
+                purge_tombstones(session)
+                purge_events(session)
+                purged_at = time.monotonic()
+            time.sleep(poll)
+    log.info("worker %s stopped after %d job(s)", name, ran)
+    return ran
+
+
+def _setup_logging():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(name)s %(message)s")
+
+
+def _child(**kwargs):
+    _setup_logging()  # spawned children start without the parent's logging config
+    work(**kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--batch", type=int, default=JOB_BATCH_SIZE, help="jobs claimed per query")
+    parser.add_argument("--poll", type=float, default=1.0, help="seconds to sleep when nothing is due")
+    parser.add_argument("--once", action="store_true", help="exit once nothing is due")
+    args = parser.parse_args()
+    _setup_logging()
+
+    kwargs = {"batch": args.batch, "poll": args.poll, "once": args.once}
+    if args.processes <= 1:
+        work(**kwargs)
+        return
+    # spawn: every child opens its own engine instead of inheriting the parent's sockets
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_child, kwargs=kwargs, name=f"worker-{i}") for i in range(args.processes)]
+    for p in procs:
+        p.start()
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        for p in procs:
+            p.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Query-plan benchmark for the composite indexes in app/models/models.py.
+
+Seeds a synthetic dataset with only primary keys indexed (the schema an
+existing database has), prints the plan and timing of the hot queries, then
+applies app.migrate.create_indexes() and prints them again.
+
+    cd backend
+    python -m benchmarks.indexes                        # 1M records + 1M appointments, temp SQLite file
+    python -m benchmarks.indexes --url postgresql://... --yes-drop --rows 1000000
+
+It drops and recreates every app table, so --url must point at a scratch
+database and needs --yes-drop.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, time as Time, timedelta
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.schema import DropIndex
+
+from app.migrate import create_indexes
+from app.models.models import Appointment, Base, Doctor, Patient, PatientRecord, User
+
+QUERIES = {
+    "records for patient (list_records)": (
+        "SELECT * FROM patient_records WHERE patient_id = :pid ORDER BY date DESC",
+        {"pid": 4242},
+    ),
+    "appointments first page (list_appointments)": (
+        "SELECT * FROM appointments ORDER BY date, id LIMIT 100",
+        {},
+    ),
+    "doctor's appointments in a week": (
+        "SELECT * FROM appointments WHERE doctor_id = :did AND date BETWEEN :d0 AND :d1 ORDER BY date, time",
+        {"did": 17, "d0": date(2024, 3, 4), "d1": date(2024, 3, 10)},
+    ),
+    "patient's appointments": (
+        "SELECT * FROM appointments WHERE patient_id = :pid ORDER BY date",
+        {"pid": 4242},
+    ),
+    "login lookup": (
+        "SELECT * FROM users WHERE username = :u",
+        {"u": "user4242"},
+    ),
+}
+
+
+def seed(engine, rows: int, patients: int, doctors: int, batch: int = 50_000):
+    rnd = random.Random(1234)
+    start = date(2020, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Doctor), [
+            {"first_name": f"Doc{i}", "last_name": f"Tor{i}", "specialty": "", "phone": "", "email": ""}
+            for i in range(doctors)
+        ])
+        conn.execute(insert(Patient), [
+            {"first_name": f"Pat{i}", "last_name": f"Ient{i}", "phone": "", "email": "", "address": ""}
+            for i in range(patients)
+        ])
+        conn.execute(insert(User), [
+            {"username": f"user{i}", "password_hash": "x"} for i in range(patients)
+        ])
+    for offset in range(0, rows, batch):
+        n = min(batch, rows - offset)
+        with engine.begin() as conn:
+            conn.execute(insert(PatientRecord), [
+                {
+                    "date": start + timedelta(days=rnd.randrange(2000)),
+                    "notes": "", "diagnosis": "",
+                    "height_in": rnd.randint(55, 78), "weight_lb": rnd.randint(100, 300),
+                    "patient_id": rnd.randint(1, patients), "doctor_id": rnd.randint(1, doctors),
+                }
+                for _ in range(n)
+            ])
+            conn.execute(insert(Appointment), [
+                {
+                    "date": start + timedelta(days=rnd.randrange(2000)),
+                    "time": Time(rnd.randint(8, 17), rnd.choice((0, 15, 30, 45))),
+                    "purpose": "",
+                    "patient_id": rnd.randint(1, patients), "doctor_id": rnd.randint(1, doctors),
+                }
+                for _ in range(n)
+            ])
+
+
+def drop_secondary_indexes(engine):
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(DropIndex(index, if_exists=True))
+
+
+def report(engine, label: str, repeat: int):
+    explain = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    print(f"\n=== {label}")
+    with engine.connect() as conn:
+        for name, (sql, params) in QUERIES.items():
+            plan = conn.execute(text(explain + sql), params).fetchall()
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                conn.execute(text(sql), params).fetchall()
+            ms = (time.perf_counter() - t0) / repeat * 1000
+            print(f"- {name}: {ms:.2f} ms")
+            for row in plan:
+                print(f"    {row[-1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="database URL (default: fresh temp SQLite file)")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="patient records and appointments each")
+    parser.add_argument("--patients", type=int, default=20_000)
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--yes-drop", action="store_true", help="allow dropping every app table in --url")
+    args = parser.parse_args()
+
+    if args.url and not args.yes_drop:
+        parser.error("--url: every app table there is dropped and recreated; use a scratch database and pass --yes-drop")
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    drop_secondary_indexes(engine)
+
+    t0 = time.perf_counter()
+    seed(engine, args.rows, args.patients, args.doctors)
+    print(f"[bench] seeded {args.rows:,} records + {args.rows:,} appointments in {time.perf_counter() - t0:.1f}s ({url})")
+
+    report(engine, "primary keys only", args.repeat)
+    t0 = time.perf_counter()
+    created = create_indexes(engine)
+    print(f"\n[bench] created {len(created)} indexes in {time.perf_counter() - t0:.1f}s")
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("ANALYZE"))
+    else:
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+    report(engine, "after app.migrate.create_indexes()", args.repeat)
+
+
+if __name__ == "__main__":
+    main()
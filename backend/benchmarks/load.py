@@ -0,0 +1,304 @@
+"""
+Load test: every API endpoint under concurrent in-process clients.
+
+Seeds a synthetic dataset through the models, then drives each endpoint in
+turn with --concurrency clients over httpx's ASGI transport (the app runs
+in this process; no network, no server) and reports p50/p95/p99 latency and
+requests per second. Results are written as JSON so runs can be diffed.
+
+The app reads its settings from the environment, so compare configurations
+by running it with different ones:
+
+    cd backend
+    python -m benchmarks.load                                   # temp SQLite file
+    DB_ASYNC=1 FAST_LISTS=1 python -m benchmarks.load --out async.json
+    python -m benchmarks.load --url postgresql://... --patients 20000 --records 200000
+    python -m benchmarks.load --only patients appointments      # scenarios by name prefix
+    RATE_LIMIT_ENABLED=1 CONCURRENCY_LIMIT=8 python -m benchmarks.load  # with admission control
+
+Delete scenarios remove rows seeded for them; write scenarios add rows, so
+--url should point at a scratch database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, time as Time, timedelta
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="database URL (default: fresh temp SQLite file)")
+    parser.add_argument("--doctors", type=int, default=50)
+    parser.add_argument("--patients", type=int, default=2_000)
+    parser.add_argument("--records", type=int, default=20_000)
+    parser.add_argument("--appointments", type=int, default=20_000)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--auth-requests", type=int, default=20, help="requests per bcrypt-bound auth scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--only", nargs="+", metavar="PREFIX", help="run only scenarios starting with these")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--out", default="load-results.json")
+    return parser.parse_args()
+
+
+ARGS = parse_args() if __name__ == "__main__" else None
+if ARGS is not None:
+    # must be set before the app (app.database) is imported
+    os.environ["DATABASE_URL"] = ARGS.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load.db')}"
+    # /metrics is only mounted with a scrape token
+    os.environ.setdefault("METRICS_TOKEN", "load-test")
+    # admission control (app/ratelimit.py) is off unless set: every simulated
+    # client shares one address, and the runs measure the endpoints themselves
+    for name in ("RATE_LIMIT_ENABLED", "CONCURRENCY_LIMIT", "BULK_CONCURRENCY_LIMIT", "AUTH_CONCURRENCY_LIMIT"):
+        os.environ.setdefault(name, "0")
+
+import httpx  # noqa: E402
+import sqlalchemy  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app.database import dispose_engines, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.migrate import migrate  # noqa: E402
+from app.models.models import Appointment, Doctor, Patient, PatientRecord  # noqa: E402
+from app.vitals import rebuild_rollups  # noqa: E402
+
+SPECIALTIES = ["Cardiology", "Dermatology", "Neurology", "Pediatrics", "Oncology", "General Practice"]
+DIAGNOSES = ["Hypertension", "Type 2 diabetes", "Asthma", "Migraine", "Influenza", "Back pain", "Eczema"]
+FIRST = ["Ana", "Ben", "Chloe", "David", "Emma", "Farid", "Grace", "Hugo", "Ines", "Jamal", "Kara", "Liam"]
+LAST = ["Smith", "Garcia", "Nguyen", "Patel", "Kowalski", "Okafor", "Jensen", "Rossi", "Tanaka", "Silva"]
+START = date(2022, 1, 1)
+DAYS = 1000
+BATCH = 5_000
+
+
+def _ids(conn, model, rows: list[dict]) -> list[int]:
+    ids = []
+    for i in range(0, len(rows), BATCH):
+        ids += conn.scalars(insert(model).returning(model.id, sort_by_parameter_order=True), rows[i:i + BATCH]).all()
+    return ids
+
+
+class Dataset:
+    """Ids of the seeded rows, plus spares the delete scenarios consume."""
+
+    def __init__(self, args, rnd: random.Random):
+        spare = args.requests
+
+        def person(i):
+            return {"first_name": rnd.choice(FIRST), "last_name": f"{rnd.choice(LAST)}{i}",
+                    "phone": "", "email": f"p{i}@example.com"}
+
+        def record(patients, doctors):
+            return {"date": START + timedelta(days=rnd.randrange(DAYS)),
+                    "height_in": rnd.randint(55, 78), "weight_lb": rnd.randint(100, 300),
+                    "diagnosis": rnd.choice(DIAGNOSES), "notes": f"Seen for {rnd.choice(DIAGNOSES).lower()}",
+                    "patient_id": rnd.choice(patients), "doctor_id": rnd.choice(doctors)}
+
+        def appointment(patients, doctors):
+            return {"date": START + timedelta(days=rnd.randrange(DAYS)),
+                    "time": Time(rnd.randint(9, 16), rnd.choice((0, 30))), "purpose": "Check-up",
+                    "patient_id": rnd.choice(patients), "doctor_id": rnd.choice(doctors)}
+
+        with engine.begin() as conn:
+            self.doctors = _ids(conn, Doctor, [
+                {**person(i), "specialty": rnd.choice(SPECIALTIES)} for i in range(args.doctors)])
+            self.patients = _ids(conn, Patient, [
+                {**person(i), "address": ""} for i in range(args.patients)])
+            self.records = _ids(conn, PatientRecord, [
+                record(self.patients, self.doctors) for _ in range(args.records)])
+            self.appointments = _ids(conn, Appointment, [
+                appointment(self.patients, self.doctors) for _ in range(args.appointments)])
+            # rows for the delete scenarios; the spare patients and doctors have
+            # a record and an appointment each, so deletes do their full work
+            self.spare_doctors = _ids(conn, Doctor, [
+                {**person(i), "specialty": ""} for i in range(spare)])
+            self.spare_patients = _ids(conn, Patient, [
+                {**person(i), "address": ""} for i in range(spare)])
+            owners = self.spare_patients + self.spare_doctors
+            _ids(conn, PatientRecord, [record(self.spare_patients, self.spare_doctors) for _ in owners])
+            _ids(conn, Appointment, [appointment(self.spare_patients, self.spare_doctors) for _ in owners])
+            self.spare_records = _ids(conn, PatientRecord, [
+                record(self.patients, self.doctors) for _ in range(spare)])
+            self.spare_appointments = _ids(conn, Appointment, [
+                appointment(self.patients, self.doctors) for _ in range(spare)])
+            rebuild_rollups(conn)
+        self.tokens: list[str] = []
+
+
+def scenarios(ds: Dataset, rnd: random.Random, args) -> list[tuple]:
+    """(name, method, make, count): make() returns (url, request kwargs) or None when out of inputs."""
+    n, auth = args.requests, args.auth_requests
+    pick = rnd.choice
+
+    def day():
+        return START + timedelta(days=rnd.randrange(DAYS))
+
+    def future_slot():
+        # far-future dates, so new bookings rarely hit the double-booking check
+        d = date(2030, 1, 1) + timedelta(days=rnd.randrange(3650))
+        return d.isoformat(), f"{rnd.randint(9, 16):02d}:{pick(('00', '30'))}"
+
+    def new_record():
+        return {"patient_id": pick(ds.patients), "doctor_id": pick(ds.doctors), "date": day().isoformat(),
+                "height_in": rnd.randint(55, 78), "weight_lb": rnd.randint(100, 300), "diagnosis": pick(DIAGNOSES)}
+
+    def new_appointment():
+        d, t = future_slot()
+        return {"patient_id": pick(ds.patients), "doctor_id": pick(ds.doctors), "date": d, "time": t,
+                "purpose": "Follow-up"}
+
+    def new_person():
+        return {"first_name": pick(FIRST), "last_name": pick(LAST)}
+
+    def pop(ids, url):
+        return (lambda: (url.format(ids.pop()), {}) if ids else None)
+
+    def week(start="from", end="to"):
+        d = day()
+        return {start: d.isoformat(), end: (d + timedelta(days=6)).isoformat()}
+
+    return [
+        ("root", "GET", lambda: ("/", {}), n),
+        ("metrics", "GET",
+         lambda: ("/metrics", {"headers": {"Authorization": f"Bearer {os.environ['METRICS_TOKEN']}"}}), n),
+        ("doctors.list", "GET", lambda: ("/doctors", {"params": {"limit": 100}}), n),
+        ("doctors.list.specialty", "GET", lambda: ("/doctors", {"params": {"specialty": pick(SPECIALTIES)}}), n),
+        ("doctors.availability", "GET", lambda: (f"/doctors/{pick(ds.doctors)}/availability", {"params": week()}), n),
+        ("doctors.create", "POST", lambda: ("/doctors", {"json": {**new_person(), "specialty": pick(SPECIALTIES)}}), n),
+        ("doctors.bulk", "POST", lambda: ("/doctors/bulk", {"json": [new_person() for _ in range(100)]}), n // 10),
+        ("doctors.delete", "DELETE", pop(ds.spare_doctors, "/doctors/{}"), n),
+        ("patients.list", "GET", lambda: ("/patients", {"params": {"limit": 100}}), n),
+        ("patients.list.name", "GET", lambda: ("/patients", {"params": {"name": pick(LAST)[:3]}}), n),
+        ("patients.summary", "GET", lambda: (f"/patients/{pick(ds.patients)}/summary", {}), n),
+        ("patients.summary.batch", "GET",
+         lambda: ("/patients/summary", {"params": [("ids", i) for i in rnd.sample(ds.patients, 20)]}), n),
+        ("patients.create", "POST", lambda: ("/patients", {"json": new_person()}), n),
+        ("patients.bulk", "POST", lambda: ("/patients/bulk", {"json": [new_person() for _ in range(100)]}), n // 10),
+        ("patients.delete", "DELETE", pop(ds.spare_patients, "/patients/{}"), n),
+        ("records.list", "GET", lambda: (f"/patient_records/{pick(ds.patients)}", {}), n),
+        ("records.export", "GET",
+         lambda: ("/patient_records/export", {"params": {"patient_id": pick(ds.patients), "format": pick(("ndjson", "csv"))}}), n),
+        ("records.create", "POST", lambda: ("/patient_records", {"json": new_record()}), n),
+        ("records.bulk", "POST", lambda: ("/patient_records/bulk", {"json": [new_record() for _ in range(100)]}), n // 10),
+        ("records.delete", "DELETE", pop(ds.spare_records, "/patient_records/{}"), n),
+        ("appointments.list", "GET", lambda: ("/appointments", {"params": {"limit": 100}}), n),
+        ("appointments.list.doctor", "GET",
+         lambda: ("/appointments", {"params": {"doctor_id": pick(ds.doctors), **week("date_from", "date_to")}}), n),
+        ("appointments.export", "GET",
+         lambda: ("/appointments/export", {"params": {"patient_id": pick(ds.patients), "format": "ndjson"}}), n),
+        ("appointments.create", "POST", lambda: ("/appointments", {"json": new_appointment()}), n),
+        ("appointments.bulk", "POST",
+         lambda: ("/appointments/bulk", {"json": [new_appointment() for _ in range(100)]}), n // 10),
+        ("appointments.delete", "DELETE", pop(ds.spare_appointments, "/appointments/{}"), n),
+        ("search", "GET", lambda: ("/search", {"params": {"q": pick(LAST + DIAGNOSES)[:4]}}), n),
+        ("search.records", "GET", lambda: ("/search", {"params": {"q": pick(DIAGNOSES).lower(), "type": "records"}}), n),
+        ("vitals.patient", "GET", lambda: (f"/vitals/patients/{pick(ds.patients)}", {}), n),
+        ("vitals.rollups", "GET", lambda: ("/vitals/rollups", {"params": {"by": "doctor", "bucket": "quarter"}}), n),
+        ("auth.signup", "POST",
+         lambda: ("/auth/signup", {"json": {"username": f"load-{rnd.getrandbits(64):x}", "password": "bench-password"}}), auth),
+        ("auth.login", "POST", lambda: ("/auth/login", {"json": {"username": "load-bench", "password": "bench-password"}}), auth),
+        ("auth.logout", "POST",
+         lambda: ("/auth/logout", {"headers": {"Authorization": f"Bearer {ds.tokens.pop()}"}}) if ds.tokens else None, auth),
+    ]
+
+
+def percentile(sorted_ms: list[float], p: float) -> float:
+    # nearest-rank
+    if not sorted_ms:
+        return 0.0
+    k = max(0, min(len(sorted_ms) - 1, round(p / 100 * len(sorted_ms) + 0.5) - 1))
+    return sorted_ms[k]
+
+
+async def run_scenario(client: httpx.AsyncClient, ds: Dataset, method: str, make, count: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    remaining = count
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            request = make()
+            if request is None:
+                return
+            url, kw = request
+            t0 = time.perf_counter()
+            response = await client.request(method, url, **kw)
+            await response.aread()
+            latencies.append((time.perf_counter() - t0) * 1000)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+            if url in ("/auth/signup", "/auth/login") and response.status_code == 200:
+                ds.tokens.append(response.json()["token"])
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / wall, 1) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        "statuses": statuses,
+    }
+
+
+def settings() -> dict:
+    url = engine.url.render_as_string(hide_password=True)
+    keys = ("DB_ASYNC", "FAST_LISTS", "LIST_CACHE_TTL_SECONDS", "BCRYPT_ROUNDS", "BCRYPT_WORKERS", "TOKEN_STORE")
+    return {"database_url": url, **{k.lower(): os.getenv(k) for k in keys if os.getenv(k) is not None}}
+
+
+async def run(args) -> dict:
+    rnd = random.Random(args.seed)
+    t0 = time.perf_counter()
+    migrate(engine)
+    ds = Dataset(args, rnd)
+    seeded = time.perf_counter() - t0
+    print(f"[bench] seeded {args.doctors:,} doctors, {args.patients:,} patients, {args.records:,} records, "
+          f"{args.appointments:,} appointments in {seeded:.1f}s ({settings()['database_url']})")
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.post("/auth/signup", json={"username": "load-bench", "password": "bench-password"})
+        print(f"{'scenario':<28} {'reqs':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses")
+        for name, method, make, count in scenarios(ds, rnd, args):
+            if args.only and not name.startswith(tuple(args.only)):
+                continue
+            r = results[name] = await run_scenario(client, ds, method, make, count, args.concurrency)
+            print(f"{name:<28} {r['requests']:>6} {r['rps']:>8.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+                  f"{r['p99_ms']:>8.2f}  {r['statuses']}")
+    await dispose_engines()  # ASGITransport doesn't run the app's shutdown handlers
+
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "sqlalchemy": sqlalchemy.__version__,
+        "platform": platform.platform(),
+        "settings": settings(),
+        "dataset": {k: getattr(args, k) for k in ("doctors", "patients", "records", "appointments", "seed")},
+        "concurrency": args.concurrency,
+        "seed_seconds": round(seeded, 2),
+        "scenarios": results,
+    }
+
+
+def main():
+    report = asyncio.run(run(ARGS))
+    with open(ARGS.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[bench] wrote {ARGS.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+List serialization benchmark: the stock FastAPI path against FAST_LISTS.
+
+stock: ORM objects -> response_model validation -> jsonable dump -> json.dumps
+       (what FastAPI does for `response_model=list[AppointmentOut]`)
+fast:  column tuples -> orjson (app.serialization.ListSerializer, fast=True)
+
+    cd backend
+    python -m benchmarks.serialization                  # 10k and 100k appointments
+    python -m benchmarks.serialization --rows 10000 50000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import date, time as Time, timedelta
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from app.models.models import Appointment, Base
+from app.schemas.schemas import AppointmentOut
+from app.serialization import ListSerializer
+
+
+def seed(engine, rows: int):
+    rnd = random.Random(1234)
+    start = date(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Appointment), [
+            {
+                "date": start + timedelta(days=rnd.randrange(365)),
+                "time": Time(rnd.randint(8, 17), rnd.choice((0, 15, 30, 45))),
+                "purpose": "Follow-up visit",
+                "doctor_id": None, "patient_id": None,
+            }
+            for _ in range(rows)
+        ])
+
+
+def stock(session: Session) -> bytes:
+    adapter = TypeAdapter(list[AppointmentOut])
+    rows = session.scalars(select(Appointment)).all()
+    value = adapter.validate_python(rows, from_attributes=True)
+    content = adapter.dump_python(value, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def fast(session: Session) -> bytes:
+    serializer = ListSerializer(AppointmentOut, Appointment, fast=True)
+    return serializer.dump(session.execute(serializer.select()).all())
+
+
+def bench(fn, session: Session, repeat: int) -> tuple[float, bytes]:
+    best, body = float("inf"), b""
+    for _ in range(repeat):
+        session.expunge_all()  # no identity-map reuse between runs
+        t0 = time.perf_counter()
+        body = fn(session)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'stock ms':>10} {'fast ms':>10} {'speedup':>8}")
+    for n in args.rows:
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        seed(engine, n)
+        with Session(engine) as session:
+            stock_ms, stock_body = bench(stock, session, args.repeat)
+            fast_ms, fast_body = bench(fast, session, args.repeat)
+        assert json.loads(stock_body) == json.loads(fast_body), "fast path output differs"
+        print(f"{n:>8} {stock_ms:>10.1f} {fast_ms:>10.1f} {stock_ms / fast_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
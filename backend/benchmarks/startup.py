@@ -0,0 +1,96 @@
+"""
+Cold-start benchmark: how long a fresh worker takes to serve its first request.
+
+Each run is a new interpreter that imports app.main, runs the lifespan
+startup and serves GET / in-process, reporting the time of each phase. The
+process total is measured from outside, so it includes interpreter start.
+Compare against a startup that migrates the schema (what every worker used
+to do on import):
+
+    cd backend
+    python -m benchmarks.startup                       # temp SQLite file, MIGRATE_ON_STARTUP=0
+    python -m benchmarks.startup --migrate             # MIGRATE_ON_STARTUP=1
+    python -m benchmarks.startup --url postgresql://... --runs 10
+    python -m benchmarks.startup --imports             # slowest imports of app.main
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CHILD = """
+import asyncio, json, time
+import httpx  # harness, not part of the app's start
+
+async def main():
+    t0 = time.perf_counter()
+    from app.main import app
+    t1 = time.perf_counter()
+    async with app.router.lifespan_context(app):  # what uvicorn runs before accepting requests
+        t2 = time.perf_counter()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://startup") as client:
+            assert (await client.get("/")).status_code == 200
+        t3 = time.perf_counter()
+        print(json.dumps({"import_ms": (t1 - t0) * 1000, "startup_ms": (t2 - t1) * 1000,
+                          "first_request_ms": (t3 - t2) * 1000, "ready_at": time.time()}), flush=True)
+
+asyncio.run(main())
+"""
+
+PHASES = ("import_ms", "startup_ms", "first_request_ms", "process_ms")
+
+
+def run_once(env: dict) -> dict:
+    spawned = time.time()
+    out = subprocess.run([sys.executable, "-c", CHILD], env=env, capture_output=True, text=True, check=True)
+    phases = json.loads(out.stdout.strip().splitlines()[-1])
+    # process start to first response; excludes the shutdown after it
+    phases["process_ms"] = (phases.pop("ready_at") - spawned) * 1000
+    return phases
+
+
+def slowest_imports(env: dict, top: int = 15):
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                         env=env, capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    print(f"{'self ms':>8} {'total ms':>9}  module")
+    for self_us, cumulative_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{self_us / 1000:>8.1f} {cumulative_us / 1000:>9.1f}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="database URL (default: temp SQLite file, created by a first migrate)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--migrate", action="store_true", help="migrate the schema at startup")
+    parser.add_argument("--imports", action="store_true", help="list the slowest imports instead")
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}"
+    env = {**os.environ, "DATABASE_URL": url, "MIGRATE_ON_STARTUP": "1" if args.migrate else "0",
+           "PYTHONPATH": os.getcwd()}
+    if args.imports:
+        return slowest_imports(env)
+    # a deployed worker starts against an existing schema
+    subprocess.run([sys.executable, "-m", "app.migrate"], env=env, check=True, capture_output=True)
+    run_once(env)  # warm the OS file cache and __pycache__
+
+    runs = [run_once(env) for _ in range(args.runs)]
+    print(f"[bench] {args.runs} cold starts, MIGRATE_ON_STARTUP={env['MIGRATE_ON_STARTUP']} ({url})")
+    print(f"{'phase':<18} {'median ms':>10} {'min ms':>8}")
+    for phase in PHASES:
+        values = [r[phase] for r in runs]
+        print(f"{phase:<18} {statistics.median(values):>10.1f} {min(values):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+The app reads its settings at import, so they are set here first: a fresh
+SQLite file (or TEST_DATABASE_URL, e.g. a scratch Postgres database)
+migrated at startup, cheap bcrypt on the threadpool, known metrics and admin
+tokens, no sync lag, and no rate limits unless a test turns them on.
+"""
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+os.environ["MIGRATE_ON_STARTUP"] = "1"
+os.environ["BCRYPT_WORKERS"] = "0"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["METRICS_TOKEN"] = "test-metrics-token"
+os.environ["ADMIN_TOKEN"] = "test-admin-token"
+os.environ["SYNC_LAG_SECONDS"] = "0"
+os.environ["RATE_LIMIT_ENABLED"] = "0"
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def doctor(client):
+    r = client.post("/doctors", json={"first_name": "Ada", "last_name": "Lovelace"})
+    assert r.status_code == 200
+    return r.json()
+
+
+@pytest.fixture
+def patient(client):
+    r = client.post("/patients", json={"first_name": "Alan", "last_name": "Turing"})
+    assert r.status_code == 200
+    return r.json()
@@ -0,0 +1,28 @@
+ADMIN = {"Authorization": "Bearer test-admin-token"}
+
+
+def test_admin_endpoints_refuse_user_sessions(client):
+    token = client.post("/auth/signup", json={"username": "not-an-admin", "password": "pw"}).json()["token"]
+    assert client.get("/admin/pool").status_code == 401
+    assert client.get("/admin/pool", headers={"Authorization": f"Bearer {token}"}).status_code == 403
+    assert client.get("/admin/pool", headers={"Authorization": "Bearer test-admin-tokenX"}).status_code == 403
+
+
+def test_admin_token_reads_pool_stats(client):
+    r = client.get("/admin/pool", headers=ADMIN)
+    assert r.status_code == 200
+    assert r.json()["mode"] == "queue"
+
+
+def test_admin_token_reads_job_stats(client):
+    assert client.get("/admin/jobs").status_code == 401
+    r = client.get("/admin/jobs", headers=ADMIN)
+    assert r.status_code == 200
+    assert set(r.json()["counts"]) == {"pending", "running", "done", "failed"}
+
+
+def test_admin_token_reads_admission_stats(client):
+    assert client.get("/admin/admission").status_code == 401
+    r = client.get("/admin/admission", headers=ADMIN)
+    assert r.status_code == 200
+    assert r.json()["bulk"] == {"active": 0, "waiting": 0, "limit": 2, "shed": 0}
@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+def book(client, doctor_id, day, at):
+    return client.post("/appointments", json={"date": day, "time": at, "doctor_id": doctor_id})
+
+
+def test_double_booking_is_409(client, doctor):
+    assert book(client, doctor["id"], "2031-03-03", "10:00").status_code == 200
+    r = book(client, doctor["id"], "2031-03-03", "10:15")
+    assert r.status_code == 409
+    assert "already has an appointment" in r.json()["detail"]
+
+
+def test_next_slot_and_other_doctors_are_free(client, doctor):
+    other = client.post("/doctors", json={"first_name": "Grace", "last_name": "Hopper"}).json()
+    assert book(client, doctor["id"], "2031-03-04", "10:00").status_code == 200
+    assert book(client, doctor["id"], "2031-03-04", "10:30").status_code == 200
+    assert book(client, other["id"], "2031-03-04", "10:00").status_code == 200
+    assert book(client, doctor["id"], "2031-03-05", "10:00").status_code == 200
+
+
+def test_concurrent_bookings_for_one_slot_create_one(client, doctor):
+    with ThreadPoolExecutor(8) as pool:
+        codes = list(pool.map(lambda _: book(client, doctor["id"], "2031-03-06", "11:00").status_code, range(8)))
+    assert sorted(codes) == [200] + [409] * 7
+    rows = client.get("/appointments", params={"doctor_id": doctor["id"], "date_from": "2031-03-06",
+                                               "date_to": "2031-03-06"}).json()
+    assert len(rows) == 1
+
+
+def test_bulk_rejects_conflicts_with_existing_and_earlier_rows(client, doctor):
+    assert book(client, doctor["id"], "2031-03-07", "09:00").status_code == 200
+    rows = [
+        {"date": "2031-03-07", "time": "09:10", "doctor_id": doctor["id"]},  # clashes with the booking above
+        {"date": "2031-03-07", "time": "14:00", "doctor_id": doctor["id"]},
+        {"date": "2031-03-07", "time": "14:20", "doctor_id": doctor["id"]},  # clashes with the row before
+    ]
+    results = client.post("/appointments/bulk", json=rows).json()
+    assert [r["id"] is not None for r in results] == [False, True, False]
+    assert all("already has an appointment" in r["error"] for r in (results[0], results[2]))
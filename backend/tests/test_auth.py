@@ -0,0 +1,39 @@
+from passlib.hash import bcrypt
+from sqlalchemy import select
+
+from app import auth
+from app.database import SessionLocal
+from app.models.models import User
+
+
+def stored_hash(username):
+    with SessionLocal() as session:
+        return session.scalar(select(User.password_hash).where(User.username == username))
+
+
+def test_login_rehashes_a_hash_made_at_another_cost(client):
+    with SessionLocal() as session:
+        session.add(User(username="rehash", password_hash=bcrypt.using(rounds=5).hash("pw")))
+        session.commit()
+    assert client.post("/auth/login", json={"username": "rehash", "password": "pw"}).status_code == 200
+    upgraded = stored_hash("rehash")
+    assert upgraded.startswith("$2b$04$")
+    assert client.post("/auth/login", json={"username": "rehash", "password": "pw"}).status_code == 200
+    assert stored_hash("rehash") == upgraded
+
+
+def test_wrong_password_does_not_rehash(client):
+    with SessionLocal() as session:
+        session.add(User(username="rehash-wrong", password_hash=bcrypt.using(rounds=5).hash("pw")))
+        session.commit()
+    old = stored_hash("rehash-wrong")
+    assert client.post("/auth/login", json={"username": "rehash-wrong", "password": "nope"}).status_code == 401
+    assert stored_hash("rehash-wrong") == old
+
+
+def test_signup_does_not_verify_the_password_it_just_hashed(client, monkeypatch):
+    async def fail(*args):
+        raise AssertionError("signup verified the password")
+    monkeypatch.setattr(auth, "verify_password", fail)
+    r = client.post("/auth/signup", json={"username": "signup-once", "password": "pw"})
+    assert r.status_code == 200 and r.json()["token"]
@@ -0,0 +1,38 @@
+import json
+
+
+def test_json_rows_fail_individually(client):
+    rows = [
+        {"first_name": "Bulk", "last_name": "One"},
+        {"last_name": "Missing first name"},
+        {"first_name": "Bulk", "last_name": "Three"},
+    ]
+    results = client.post("/patients/bulk", params={"batch_size": 1}, json=rows).json()
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert results[0]["id"] and results[2]["id"] and results[2]["id"] > results[0]["id"]
+    assert results[1]["id"] is None and "first_name" in results[1]["error"]
+    listed = {p["id"]: p["last_name"] for p in client.get("/patients", params={"name": "Bulk"}).json()}
+    assert listed[results[0]["id"]] == "One" and listed[results[2]["id"]] == "Three"
+
+
+def test_ndjson_rows_with_unknown_references_are_rejected(client, patient, doctor):
+    rows = [
+        {"patient_id": patient["id"], "date": "2030-03-01", "doctor_id": doctor["id"]},
+        {"patient_id": 10 ** 9, "date": "2030-03-02"},
+        {"patient_id": patient["id"], "date": "2030-03-03", "doctor_id": 10 ** 9},
+        {"patient_id": patient["id"], "date": "not a date"},
+    ]
+    body = "\n".join(json.dumps(r) for r in rows) + "\n"
+    r = client.post("/patient_records/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert r.status_code == 200
+    results = r.json()
+    assert results[0]["id"] is not None
+    assert [r["error"] for r in results[1:3]] == ["Invalid patient", "Invalid doctor"]
+    assert "date" in results[3]["error"]
+    assert len(client.get(f"/patient_records/{patient['id']}").json()) == 1
+
+
+def test_body_must_be_an_array(client):
+    assert client.post("/doctors/bulk", json={"first_name": "x"}).status_code == 400
+    r = client.post("/doctors/bulk", content="{not json", headers={"Content-Type": "application/json"})
+    assert r.status_code == 400
@@ -0,0 +1,41 @@
+from app.database import SessionLocal
+from app.models.models import Doctor
+
+
+def list_doctors(client, etag=None):
+    headers = {"If-None-Match": etag} if etag else {}
+    return client.get("/doctors", params={"specialty": "cache-test"}, headers=headers)
+
+
+def test_matching_etag_is_304_without_a_body(client):
+    client.post("/doctors", json={"first_name": "C", "last_name": "One", "specialty": "cache-test"})
+    first = list_doctors(client)
+    assert first.status_code == 200 and first.headers["cache-control"] == "no-cache"
+    etag = first.headers["etag"]
+    again = list_doctors(client, etag)
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["etag"] == etag
+
+
+def test_create_and_delete_invalidate_the_list(client):
+    before = list_doctors(client)
+    created = client.post("/doctors", json={"first_name": "C", "last_name": "Two", "specialty": "cache-test"}).json()
+    after_create = list_doctors(client, before.headers["etag"])
+    assert after_create.status_code == 200
+    assert created["id"] in [d["id"] for d in after_create.json()]
+
+    assert client.delete(f"/doctors/{created['id']}").status_code == 200
+    after_delete = list_doctors(client, after_create.headers["etag"])
+    assert after_delete.status_code == 200
+    assert created["id"] not in [d["id"] for d in after_delete.json()]
+
+
+def test_writes_behind_the_api_show_up_only_after_invalidation(client):
+    first = list_doctors(client)
+    with SessionLocal() as session:
+        session.add(Doctor(first_name="C", last_name="Direct", specialty="cache-test"))
+        session.commit()
+    assert list_doctors(client, first.headers["etag"]).status_code == 304  # served from the cache
+    client.post("/doctors", json={"first_name": "C", "last_name": "Three", "specialty": "cache-test"})
+    names = [d["last_name"] for d in list_doctors(client).json()]
+    assert "Direct" in names and "Three" in names
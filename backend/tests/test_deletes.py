@@ -0,0 +1,107 @@
+import pytest
+from sqlalchemy import delete, event, inspect, select
+
+from app.database import SessionLocal, engine
+from app.models.models import Appointment, Patient, PatientRecord
+from app.pooling import POOL_STATS
+
+
+@pytest.fixture
+def statements():
+    """Statements sent to the database (any engine, reader or writer) while the test runs."""
+    seen = []
+
+    def count(conn, cursor, statement, *args):
+        seen.append(statement)
+
+    engines = [stats.engine for stats in POOL_STATS.values()]
+    for e in engines:
+        event.listen(e, "before_cursor_execute", count)
+    yield seen
+    for e in engines:
+        event.remove(e, "before_cursor_execute", count)
+
+
+def make_patient(client, doctor, records, appointments):
+    p = client.post("/patients", json={"first_name": "Del", "last_name": "Ete"}).json()
+    rows = [{"patient_id": p["id"], "doctor_id": doctor["id"], "date": "2030-09-01"}] * records
+    assert all(r["id"] for r in client.post("/patient_records/bulk", json=rows).json())
+    for i in range(appointments):
+        # no time, so the shared doctor's bookings never conflict
+        client.post("/appointments", json={"patient_id": p["id"], "doctor_id": doctor["id"],
+                                           "date": f"2030-09-{i + 1:02d}"})
+    return p
+
+
+def rows_of(model, **where):
+    with SessionLocal() as session:
+        return session.scalars(select(model).filter_by(**where)).all()
+
+
+def test_patient_delete_costs_the_same_whatever_it_owns(client, doctor, statements):
+    small = make_patient(client, doctor, 1, 1)
+    large = make_patient(client, doctor, 20, 5)
+    appointment_ids = [a.id for a in rows_of(Appointment, patient_id=large["id"])]
+
+    statements.clear()
+    assert client.delete(f"/patients/{small['id']}").status_code == 200
+    cost = len(statements)
+    statements.clear()
+    assert client.delete(f"/patients/{large['id']}").status_code == 200
+    assert len(statements) == cost
+
+    assert rows_of(PatientRecord, patient_id=large["id"]) == []
+    kept = [a for a in rows_of(Appointment) if a.id in appointment_ids]
+    assert len(kept) == 5 and all(a.patient_id is None for a in kept)
+
+
+def test_bulk_delete_reports_deleted_and_missing(client, doctor, statements):
+    one = make_patient(client, doctor, 2, 0)
+    statements.clear()
+    client.delete("/patients/999999999")
+    cost_of_none = len(statements)
+
+    patients = [one] + [make_patient(client, doctor, 3, 1) for _ in range(2)]
+    ids = [p["id"] for p in patients]
+    statements.clear()
+    r = client.post("/patients/bulk_delete", json=ids + [999999999])
+    assert r.json() == {"deleted": sorted(ids), "missing": [999999999]}
+    assert len(statements) > cost_of_none
+    assert client.post("/patients/bulk_delete", json=ids).json() == {"deleted": [], "missing": sorted(ids)}
+
+
+def test_doctor_delete_unassigns_records_and_appointments(client, patient, doctor):
+    client.post("/patient_records", json={"patient_id": patient["id"], "doctor_id": doctor["id"], "date": "2030-10-01"})
+    client.post("/appointments", json={"patient_id": patient["id"], "doctor_id": doctor["id"], "date": "2030-10-02",
+                                       "time": "10:00"})
+    other = client.post("/doctors", json={"first_name": "Del", "last_name": "Other"}).json()
+    r = client.post("/doctors/bulk_delete", json=[doctor["id"], other["id"]])
+    assert r.json() == {"deleted": sorted([doctor["id"], other["id"]]), "missing": []}
+    records = rows_of(PatientRecord, patient_id=patient["id"])
+    appointments = rows_of(Appointment, patient_id=patient["id"])
+    assert len(records) == 1 and records[0].doctor_id is None
+    assert len(appointments) == 1 and appointments[0].doctor_id is None
+
+
+def test_schema_declares_the_on_delete_rules():
+    rules = {(table, fk["referred_table"]): (fk["options"] or {}).get("ondelete", "").upper()
+             for table in ("patient_records", "appointments")
+             for fk in inspect(engine).get_foreign_keys(table)}
+    assert rules == {
+        ("patient_records", "patients"): "CASCADE",
+        ("patient_records", "doctors"): "SET NULL",
+        ("appointments", "patients"): "SET NULL",
+        ("appointments", "doctors"): "SET NULL",
+    }
+
+
+def test_the_database_applies_the_rules_by_itself(client, doctor):
+    p = make_patient(client, doctor, 2, 1)
+    with SessionLocal() as session:
+        conn = session.connection()
+        if conn.dialect.name == "sqlite" and not conn.exec_driver_sql("PRAGMA foreign_keys").scalar():
+            pytest.skip("SQLite foreign keys are off (SQLITE_TUNED=0)")
+        session.execute(delete(Patient).where(Patient.id == p["id"]))
+        session.commit()
+    assert rows_of(PatientRecord, patient_id=p["id"]) == []
+    assert [a.patient_id for a in rows_of(Appointment, doctor_id=doctor["id"])] == [None]
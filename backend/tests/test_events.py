@@ -0,0 +1,97 @@
+import asyncio
+import json
+import time
+
+from app import events
+from app.database import SessionLocal
+from app.events import latest_id, purge_events
+from app.routers.events import events as events_endpoint
+
+
+async def read(response, n: int, timeout: float = 5.0) -> list[dict]:
+    """The first `n` events of an SSE response, as {"id", "event", "data"} dicts."""
+    body = response.body_iterator
+    out = []
+    try:
+        async with asyncio.timeout(timeout):
+            async for chunk in body:
+                fields = dict(line.split(": ", 1) for line in chunk.strip().splitlines() if ": " in line)
+                if "data" in fields:
+                    out.append({"id": int(fields["id"]), "event": fields.get("event"),
+                                "data": json.loads(fields["data"])})
+                    if len(out) == n:
+                        break
+    finally:
+        await body.aclose()
+    return out
+
+
+def receive(client, n, **params):
+    async def run():
+        response = await events_endpoint(**{"topics": None, "after": None, "last_event_id": None, **params})
+        return await read(response, n)
+    return client.portal.call(run)
+
+
+def current_id(client) -> int:
+    return client.portal.call(latest_id)
+
+
+def new_patient(client, name):
+    return client.post("/patients", json={"first_name": name, "last_name": "Events"}).json()
+
+
+def test_last_event_id_replays_what_was_missed(client):
+    start = current_id(client)
+    a, b = new_patient(client, "EvA"), new_patient(client, "EvB")
+    missed = receive(client, 2, topics="patients", last_event_id=start)
+    assert [m["data"]["rows"][0]["id"] for m in missed] == [a["id"], b["id"]]
+    assert all(m["data"]["topic"] == "patients" and m["data"]["op"] == "insert" for m in missed)
+    assert missed[0]["id"] < missed[1]["id"]
+
+    # resuming from the first event only replays the second; the header wins over ?after=
+    rest = receive(client, 1, topics="patients", last_event_id=missed[0]["id"], after=start)
+    assert rest == missed[1:]
+
+
+def test_replay_is_filtered_by_topic(client, doctor):
+    start = current_id(client)
+    new_patient(client, "EvTopic")
+    client.post("/appointments", json={"date": "2030-11-01", "time": "09:00", "doctor_id": doctor["id"]})
+    [only] = receive(client, 1, topics="appointments", after=start)
+    assert only["data"]["topic"] == "appointments"
+    assert only["data"]["rows"][0]["doctor_id"] == doctor["id"]
+
+
+def test_live_events_reach_open_streams(client):
+    async def listen():
+        response = await events_endpoint(topics="patients", after=None, last_event_id=None)
+        return await read(response, 1)
+
+    future = client.portal.start_task_soon(listen)
+    deadline = time.monotonic() + 5
+    while not events.broker.subscribers and time.monotonic() < deadline:
+        client.portal.call(asyncio.sleep, 0.01)
+    p = new_patient(client, "EvLive")
+    [live] = future.result(timeout=5)
+    assert live["data"]["rows"][0]["id"] == p["id"]
+
+
+def test_too_far_behind_gets_a_reset(client, monkeypatch):
+    start = current_id(client)
+    new_patient(client, "EvFar1")
+    new_patient(client, "EvFar2")
+    monkeypatch.setattr(events, "EVENTS_REPLAY_LIMIT", 1)
+    [reset] = receive(client, 1, last_event_id=start)
+    assert reset["event"] == "reset" and reset["id"] == current_id(client)
+
+
+def test_purged_events_get_a_reset(client, monkeypatch):
+    start = current_id(client)
+    new_patient(client, "EvPurged")
+    monkeypatch.setattr(events, "EVENTS_RETENTION_HOURS", -1)
+    with SessionLocal() as session:
+        assert purge_events(session) >= 1
+    new_patient(client, "EvAfterPurge")
+    [reset] = receive(client, 1, last_event_id=start)
+    assert reset["event"] == "reset"
@@ -0,0 +1,42 @@
+import csv
+import io
+import json
+
+from app import export
+
+
+def add_records(client, patient_id, n):
+    for i in range(n):
+        r = client.post("/patient_records", json={"patient_id": patient_id, "date": f"2030-01-{i + 1:02d}",
+                                                  "weight_lb": 150 + i, "diagnosis": f"dx{i}"})
+        assert r.status_code == 200
+
+
+def test_ndjson_streams_every_matching_row_across_batches(client, patient, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_BATCH", 2)
+    add_records(client, patient["id"], 5)
+    with client.stream("GET", "/patient_records/export", params={"patient_id": patient["id"]}) as r:
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("application/x-ndjson")
+        assert 'filename="patient_records.ndjson"' in r.headers["content-disposition"]
+        rows = [json.loads(line) for line in r.iter_lines() if line]
+    assert [row["weight_lb"] for row in rows] == [150, 151, 152, 153, 154]
+    assert rows[0]["date"] == "2030-01-01"
+    assert {row["patient_id"] for row in rows} == {patient["id"]}
+
+
+def test_csv_has_a_header_and_one_line_per_row(client, patient, doctor):
+    for day in ("2030-02-02", "2030-02-01"):
+        assert client.post("/appointments", json={"date": day, "time": "09:00", "doctor_id": doctor["id"],
+                                                  "patient_id": patient["id"]}).status_code == 200
+    r = client.get("/appointments/export", params={"format": "csv", "patient_id": patient["id"]})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/csv")
+    header, *rows = list(csv.reader(io.StringIO(r.text)))
+    assert header == ["id", "date", "time", "purpose", "doctor_id", "patient_id", "created_at"]
+    assert [row[1] for row in rows] == ["2030-02-01", "2030-02-02"]  # ordered by date
+    assert rows[0][2] == "09:00:00"
+
+
+def test_unknown_format_is_422(client):
+    assert client.get("/appointments/export", params={"format": "xml"}).status_code == 422
@@ -0,0 +1,52 @@
+import pytest
+
+from app import health
+from app.database import engine
+from app.health import readiness
+
+
+@pytest.fixture
+def fresh_check():
+    # the next /readyz runs a new database check instead of serving the cached one
+    readiness.checked_at = 0.0
+    yield
+    readiness.checked_at = 0.0
+
+
+def test_healthz_and_readyz(client, fresh_check):
+    assert client.get("/healthz").json() == {"status": "ok"}
+    r = client.get("/readyz")
+    assert r.status_code == 200
+    assert r.json()["status"] == "ready" and r.json()["database"]["ok"]
+
+
+def test_readyz_fails_when_the_database_does(client, fresh_check, monkeypatch):
+    async def down():
+        raise ConnectionRefusedError("connection refused")
+    monkeypatch.setattr(health, "_ping", down)
+    r = client.get("/readyz")
+    assert r.status_code == 503
+    body = r.json()
+    assert body["status"] == "unavailable"
+    assert body["database"]["ok"] is False
+    assert "ConnectionRefusedError" in body["database"]["error"]
+    assert client.get("/healthz").status_code == 200  # liveness doesn't depend on the database
+
+
+def test_readyz_fails_while_a_pool_is_saturated(client, fresh_check, monkeypatch):
+    assert client.get("/readyz").status_code == 200
+    # any checked-out connection counts as saturation, so one held connection is enough
+    monkeypatch.setattr(health, "READINESS_MAX_POOL_SATURATION", 1e-9)
+    with engine.connect():
+        r = client.get("/readyz")
+        assert r.status_code == 503
+        assert "sync" in r.json()["saturated"]
+        assert r.json()["database"]["ok"] is True
+    assert client.get("/readyz").status_code == 200
+
+
+def test_stale_results_count_as_failures(client, fresh_check, monkeypatch):
+    assert client.get("/readyz").status_code == 200
+    monkeypatch.setattr(health, "READINESS_MAX_AGE_SECONDS", -1)
+    r = client.get("/readyz")
+    assert r.status_code == 503 and r.json()["database"]["error"] == "database check is stale"
@@ -0,0 +1,44 @@
+import uuid
+
+from app.idempotency import IDEMPOTENCY_HEADER, REPLAYED_HEADER
+
+
+def appointments_on(client, day):
+    return client.get("/appointments", params={"date_from": day, "date_to": day}).json()
+
+
+def test_retry_with_same_key_replays_the_response(client):
+    key = {IDEMPOTENCY_HEADER: str(uuid.uuid4())}
+    body = {"date": "2032-01-10", "purpose": "checkup"}
+    first = client.post("/appointments", json=body, headers=key)
+    retry = client.post("/appointments", json=body, headers=key)
+    assert first.status_code == retry.status_code == 200
+    assert REPLAYED_HEADER not in first.headers
+    assert retry.headers[REPLAYED_HEADER] == "true"
+    assert retry.json() == first.json()
+    assert len(appointments_on(client, "2032-01-10")) == 1
+
+
+def test_same_key_with_another_body_is_422(client):
+    key = {IDEMPOTENCY_HEADER: str(uuid.uuid4())}
+    assert client.post("/appointments", json={"date": "2032-01-11"}, headers=key).status_code == 200
+    assert client.post("/appointments", json={"date": "2032-01-12"}, headers=key).status_code == 422
+
+
+def test_without_key_every_post_creates(client):
+    for _ in range(2):
+        assert client.post("/appointments", json={"date": "2032-01-13"}).status_code == 200
+    assert len(appointments_on(client, "2032-01-13")) == 2
+
+
+def test_failed_request_releases_the_key(client, doctor):
+    key = {IDEMPOTENCY_HEADER: str(uuid.uuid4())}
+    body = {"date": "2032-01-14", "time": "10:00", "doctor_id": doctor["id"]}
+    assert client.post("/appointments", json=body).status_code == 200
+    assert client.post("/appointments", json=body, headers=key).status_code == 409  # double-booked
+    # not stored: once the slot is free, a retry with the key runs again
+    taken = appointments_on(client, "2032-01-14")[0]["id"]
+    client.delete(f"/appointments/{taken}")
+    retry = client.post("/appointments", json=body, headers=key)
+    assert retry.status_code == 200
+    assert REPLAYED_HEADER not in retry.headers
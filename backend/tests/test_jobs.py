@@ -0,0 +1,22 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from app.database import SessionLocal
+from app.jobs import claim, new_job
+from app.models.models import Job
+
+
+def test_claims_never_hand_out_a_job_twice():
+    past = datetime.utcnow() - timedelta(minutes=1)
+    with SessionLocal() as session:
+        session.execute(insert(Job), [new_job("test_noop", {"n": i}, past, key=f"claim-test:{i}") for i in range(5)])
+        session.commit()
+        _, first = claim(session, "w1", limit=3)
+        _, second = claim(session, "w2", limit=10)
+        mine = {r.id for r in first + second if r.kind == "test_noop"}
+        assert len(first) + len(second) == len({r.id for r in first + second})
+        ids = set(session.scalars(select(Job.id).where(Job.kind == "test_noop")))
+        assert mine == ids
+        _, third = claim(session, "w3")
+        assert not [r for r in third if r.kind == "test_noop"]  # all leased
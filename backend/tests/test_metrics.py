@@ -0,0 +1,9 @@
+def test_metrics_need_the_token(client):
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Basic test-metrics-token"}).status_code == 401
+
+    client.get("/doctors")
+    r = client.get("/metrics", headers={"Authorization": "Bearer test-metrics-token"})
+    assert r.status_code == 200
+    assert 'http_requests_total{method="GET",route="/doctors",status="200"}' in r.text
@@ -0,0 +1,34 @@
+from app.pagination import NEXT_CURSOR_HEADER
+
+
+def test_cursor_pages_cover_every_row_once(client):
+    created = [client.post("/doctors", json={"first_name": f"D{i}", "last_name": "Paged",
+                                             "specialty": "pagination-test"}).json()["id"] for i in range(25)]
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"specialty": "pagination-test", "limit": 10}
+        if cursor:
+            params["cursor"] = cursor
+        r = client.get("/doctors", params=params)
+        assert r.status_code == 200
+        assert len(r.json()) <= 10
+        seen += [d["id"] for d in r.json()]
+        pages += 1
+        cursor = r.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+    assert pages == 3
+    assert seen == sorted(created)
+
+
+def test_without_limit_returns_the_first_page(client):
+    for i in range(3):
+        client.post("/patients", json={"first_name": f"P{i}", "last_name": "Unpaged"})
+    r = client.get("/patients", params={"limit": 2})
+    assert len(r.json()) == 2
+    assert r.headers.get(NEXT_CURSOR_HEADER)
+
+
+def test_bad_cursor_is_400(client):
+    assert client.get("/doctors", params={"cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/appointments", params={"cursor": "bm90IGpzb24"}).status_code == 400
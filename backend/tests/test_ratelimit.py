@@ -0,0 +1,66 @@
+import asyncio
+from collections import OrderedDict
+
+import pytest
+
+from app import ratelimit
+from app.ratelimit import Gate, Limit, MemoryRateLimiter
+
+
+def test_bucket_allows_a_burst_then_refills(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    limiter = MemoryRateLimiter()
+    limit = Limit(rate=2, burst=3)
+    take = lambda: asyncio.run(limiter.take("k", limit))  # noqa: E731
+    assert [take() for _ in range(3)] == [0, 0, 0]
+    assert take() == pytest.approx(0.5)  # one token at 2/s
+    now[0] += 0.5
+    assert take() == 0
+    assert take() > 0
+    assert asyncio.run(limiter.take("other", limit)) == 0  # buckets are per key
+
+
+@pytest.fixture
+def limited(monkeypatch):
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setitem(ratelimit.LIMITS, "api", Limit(rate=0.1, burst=3))
+    monkeypatch.setattr(ratelimit.rate_limiter, "_buckets", OrderedDict())
+
+
+def test_empty_bucket_is_429_with_retry_after(client, limited):
+    assert [client.get("/doctors", params={"limit": 1}).status_code for _ in range(3)] == [200] * 3
+    r = client.get("/doctors", params={"limit": 1})
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) >= 1
+    assert client.get("/healthz").status_code == 200  # exempt
+
+
+def test_metrics_scrapes_are_rate_limited(client, limited):
+    headers = {"Authorization": "Bearer test-metrics-token"}
+    codes = [client.get("/metrics", headers=headers).status_code for _ in range(4)]
+    assert codes == [200, 200, 200, 429]
+
+
+def test_tokens_get_their_own_bucket_under_the_ip_ceiling(client, limited, monkeypatch):
+    monkeypatch.setitem(ratelimit.LIMITS, "ip", Limit(rate=0.1, burst=5))
+    for token in ("a", "b"):
+        headers = {"Authorization": f"Bearer {token}"}
+        codes = [client.get("/doctors", params={"limit": 1}, headers=headers).status_code for _ in range(3)]
+        assert codes == ([200] * 3 if token == "a" else [200, 200, 429])  # the IP's 5 are spent
+
+
+def test_gate_sheds_once_slots_and_queue_are_full():
+    async def scenario():
+        gate = Gate(1)
+        assert await gate.enter(0)
+        waiter = asyncio.ensure_future(gate.enter(1))
+        await asyncio.sleep(0)
+        assert await gate.enter(1) is False  # the one queue place is taken
+        gate.leave()
+        assert await waiter is True
+        assert await gate.enter(0.01) is False  # timed out waiting
+        gate.leave()
+        assert gate.active == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,46 @@
+def search(client, q, **params):
+    r = client.get("/search", params={"q": q, **params})
+    assert r.status_code == 200
+    return r.json()
+
+
+def test_names_match_by_prefix_and_every_term_must_match(client):
+    d = client.post("/doctors", json={"first_name": "Zephyrine", "last_name": "Quillfeather",
+                                      "specialty": "cardiology"}).json()
+    hits = search(client, "quillf", type="doctors")
+    assert [(h["type"], h["id"], h["label"], h["snippet"]) for h in hits] == [
+        ("doctors", d["id"], "Zephyrine Quillfeather", "cardiology")]
+    assert [h["id"] for h in search(client, "zephyrine cardio")] == [d["id"]]
+    assert search(client, "zephyrine dermatology") == []
+
+    assert client.delete(f"/doctors/{d['id']}").status_code == 200
+    assert search(client, "quillfeather") == []
+
+
+def test_records_rank_by_relevance_and_carry_a_snippet(client, patient):
+    weak = client.post("/patient_records", json={
+        "patient_id": patient["id"], "date": "2030-06-01", "diagnosis": "routine checkup",
+        "notes": "Blood pressure normal, diet reviewed, sleep fine, mild xylotomy mentioned, exercise advised, "
+                 "follow up in a year, no medication changes, vaccinations up to date",
+    }).json()
+    strong = client.post("/patient_records", json={
+        "patient_id": patient["id"], "date": "2030-06-02", "diagnosis": "xylotomy",
+        "notes": "Xylotomy confirmed.",
+    }).json()
+    hits = search(client, "xylotomy", type="records")
+    assert [h["id"] for h in hits] == [strong["id"], weak["id"]]
+    assert hits[0]["rank"] > hits[1]["rank"]
+    assert all(h["patient_id"] == patient["id"] for h in hits)
+    assert "[xylotomy]" in hits[1]["snippet"].lower()
+    assert hits[1]["label"] == "routine checkup"
+
+
+def test_limit_offset_and_empty_queries(client):
+    for i in range(3):
+        client.post("/patients", json={"first_name": "Vesperine", "last_name": f"Paging{i}"})
+    every = search(client, "vesperine", type="patients")
+    assert len(every) == 3
+    page = search(client, "vesperine", type="patients", limit=2, offset=1)
+    assert len(page) == 2 and all(h in every for h in page)
+    assert search(client, "!!") == []
+    assert client.get("/search", params={"q": "x", "type": "nope"}).status_code == 422
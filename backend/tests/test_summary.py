@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
+
+from app import database
+from app.database import SessionLocal
+from app.models.models import Patient
+
+
+@pytest.fixture
+def selects():
+    """SELECT statements sent to the database while the test runs."""
+    engine = database.async_engine.sync_engine if database.async_engine is not None else database.engine
+    seen = []
+
+    def count(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    yield seen
+    event.remove(engine, "before_cursor_execute", count)
+
+
+def make_patient(client, n, doctors):
+    p = client.post("/patients", json={"first_name": f"Sum{n}", "last_name": "Mary"}).json()
+    for i, d in enumerate(doctors):
+        client.post("/patient_records", json={"patient_id": p["id"], "doctor_id": d["id"], "date": f"2030-04-0{i + 1}"})
+        client.post("/appointments", json={"patient_id": p["id"], "doctor_id": d["id"], "date": f"2040-0{n + 1}-0{i + 1}",
+                                           "time": "09:00"})
+    client.post("/appointments", json={"patient_id": p["id"], "date": "2000-01-01"})  # past: not upcoming
+    return p
+
+
+def test_summaries_cost_three_queries_for_any_number_of_patients(client, doctor, selects):
+    other = client.post("/doctors", json={"first_name": "Sum", "last_name": "Other"}).json()
+    patients = [make_patient(client, n, [doctor, other]) for n in range(4)]
+
+    selects.clear()
+    one = client.get(f"/patients/{patients[0]['id']}/summary").json()
+    assert len(selects) == 3
+    selects.clear()
+    many = client.get("/patients/summary", params={"ids": [p["id"] for p in patients]}).json()
+    assert len(selects) == 3
+
+    assert [s["patient"]["id"] for s in many] == [p["id"] for p in patients]
+    assert many[0] == one
+    assert [r["date"] for r in one["records"]] == ["2030-04-02", "2030-04-01"]  # latest first
+    assert [a["date"] for a in one["upcoming_appointments"]] == ["2040-01-01", "2040-01-02"]
+    assert sorted(d["id"] for d in one["doctors"]) == sorted([doctor["id"], other["id"]])
+
+
+def test_limits_and_missing_patient(client, doctor):
+    p = make_patient(client, 5, [doctor])
+    client.post("/patient_records", json={"patient_id": p["id"], "date": "2030-05-01"})
+    s = client.get(f"/patients/{p['id']}/summary", params={"records": 1, "appointments": 0}).json()
+    assert [r["date"] for r in s["records"]] == ["2030-05-01"]
+    assert s["upcoming_appointments"] == [] and s["doctors"] == []
+    assert client.get("/patients/999999999/summary").status_code == 404
+
+
+def test_unloaded_relationships_raise_instead_of_lazy_loading(client, patient):
+    with SessionLocal() as session:
+        p = session.get(Patient, patient["id"])
+        with pytest.raises(InvalidRequestError):
+            p.records
@@ -0,0 +1,65 @@
+import time
+
+
+def sync_all(client, since=None, limit=500):
+    """Follow one sync pass to its end; returns (changes, deleted, last page)."""
+    changes, deleted, params = {}, {}, {"limit": limit}
+    if since:
+        params["since"] = since
+    while True:
+        page = client.get("/sync", params=params).json()
+        for entity, rows in page["changes"].items():
+            changes.setdefault(entity, []).extend(rows)
+        for entity, ids in page["deleted"].items():
+            deleted.setdefault(entity, []).extend(ids)
+        if not page["next_cursor"]:
+            return changes, deleted, page
+        params = {"cursor": page["next_cursor"], "limit": limit}
+
+
+def settle():
+    time.sleep(0.01)  # past the watermark, which is exclusive
+
+
+def test_first_sync_is_a_full_reset(client, patient):
+    settle()
+    changes, _, last = sync_all(client)
+    assert last["reset"] is True
+    assert patient["id"] in [p["id"] for p in changes["patients"]]
+    assert last["watermark"]
+
+
+def test_incremental_sync_reports_changes_and_deletions(client):
+    gone = client.post("/patients", json={"first_name": "Gone", "last_name": "Soon"}).json()
+    record = client.post("/patient_records", json={"patient_id": gone["id"], "date": "2024-05-01"}).json()
+    settle()
+    _, _, last = sync_all(client)
+    watermark = last["watermark"]
+    settle()
+
+    kept = client.post("/patients", json={"first_name": "Kept", "last_name": "Around"}).json()
+    assert client.delete(f"/patients/{gone['id']}").status_code == 200
+    settle()
+    changes, deleted, last = sync_all(client, since=watermark)
+    assert last["reset"] is False
+    assert [p["id"] for p in changes["patients"]] == [kept["id"]]
+    assert deleted["patients"] == [gone["id"]]
+    assert deleted["patient_records"] == [record["id"]]  # went with the patient
+
+
+def test_small_pages_return_every_change_once(client):
+    ids = [client.post("/doctors", json={"first_name": f"S{i}", "last_name": "Sync"}).json()["id"] for i in range(7)]
+    settle()
+    changes, _, _ = sync_all(client, limit=3)
+    synced = [d["id"] for d in changes["doctors"]]
+    assert len(synced) == len(set(synced))
+    assert set(ids) <= set(synced)
+
+
+def test_stale_watermark_forces_a_reset(client):
+    _, _, last = sync_all(client, since="2000-01-01T00:00:00")
+    assert last["reset"] is True
+
+
+def test_bad_cursor_is_400(client):
+    assert client.get("/sync", params={"cursor": "garbage"}).status_code == 400
@@ -0,0 +1,61 @@
+import asyncio
+import hashlib
+
+from sqlalchemy import select
+
+from app import tokens
+from app.database import SessionLocal, ThreadedSession
+from app.models.models import AuthToken, User
+from app.tokens import DatabaseTokenStore, MemoryTokenStore
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_memory_tokens_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(tokens.time, "monotonic", lambda: now[0])
+    store = MemoryTokenStore(ttl=60)
+    run(store.put(None, "t", 7))
+    now[0] += 59
+    assert run(store.get(None, "t")) == 7
+    now[0] += 2
+    assert run(store.get(None, "t")) is None
+
+
+def test_memory_store_evicts_the_least_recently_used():
+    store = MemoryTokenStore(max_entries=2)
+    run(store.put(None, "a", 1))
+    run(store.put(None, "b", 2))
+    assert run(store.get(None, "a")) == 1
+    run(store.put(None, "c", 3))
+    assert [run(store.get(None, t)) for t in "abc"] == [1, None, 3]
+
+
+def test_database_store_keeps_hashes_and_honours_expiry_and_revoke(client):
+    assert client.post("/auth/signup", json={"username": "token-db", "password": "pw"}).status_code == 200
+    with SessionLocal() as session:
+        user_id = session.scalar(select(User.id).where(User.username == "token-db"))
+        db = ThreadedSession(session)
+        store = DatabaseTokenStore(ttl=60)
+        run(store.put(db, "live", user_id))
+        run(store.put(db, "dead", user_id))
+        assert session.get(AuthToken, hashlib.sha256(b"live").hexdigest()).user_id == user_id
+        assert session.get(AuthToken, "live") is None
+
+        assert run(store.get(db, "live")) == user_id
+        run(DatabaseTokenStore(ttl=-1).put(db, "expired", user_id))
+        assert run(store.get(db, "expired")) is None
+        run(store.revoke(db, "dead"))
+        assert run(store.get(db, "dead")) is None
+        assert run(store.get(db, "live")) == user_id
+
+
+def test_signup_login_logout(client):
+    token = client.post("/auth/signup", json={"username": "token-flow", "password": "pw"}).json()["token"]
+    assert client.post("/auth/signup", json={"username": "token-flow", "password": "pw"}).status_code == 400
+    assert client.post("/auth/login", json={"username": "token-flow", "password": "nope"}).status_code == 401
+    assert client.post("/auth/login", json={"username": "token-flow", "password": "pw"}).json()["token"] != token
+    assert client.post("/auth/logout", headers={"Authorization": f"Bearer {token}"}).json() == {"ok": True}
+    assert client.post("/auth/logout").status_code == 401
@@ -0,0 +1,72 @@
+from app.vitals import bmi
+
+
+def add(client, patient_id, doctor_id, day, height=None, weight=None, diagnosis=""):
+    r = client.post("/patient_records", json={"patient_id": patient_id, "doctor_id": doctor_id, "date": day,
+                                              "height_in": height, "weight_lb": weight, "diagnosis": diagnosis})
+    assert r.status_code == 200
+    return r.json()
+
+
+def rollups(client, **params):
+    r = client.get("/vitals/rollups", params=params)
+    assert r.status_code == 200
+    return r.json()
+
+
+def by_doctor(client, doctor, **params):
+    return [(p["bucket"], p["records"], p["avg_weight_lb"], p["avg_height_in"], p["avg_bmi"])
+            for p in rollups(client, by="doctor", key=doctor["id"], **params)]
+
+
+def test_rollups_follow_creates_and_deletes(client, patient, doctor):
+    july_a = add(client, patient["id"], doctor["id"], "2030-07-03", 70, 150)
+    july_b = add(client, patient["id"], doctor["id"], "2030-07-20", 70, 170)
+    add(client, patient["id"], doctor["id"], "2030-08-05", None, 200)
+    assert by_doctor(client, doctor) == [
+        ("2030-07-01", 2, 160.0, 70.0, round((bmi(70, 150) + bmi(70, 170)) / 2, 1)),
+        ("2030-08-01", 1, 200.0, None, None),
+    ]
+    assert by_doctor(client, doctor, bucket="quarter") == [
+        ("2030-07-01", 3, round(520 / 3, 1), 70.0, round((bmi(70, 150) + bmi(70, 170)) / 2, 1)),
+    ]
+
+    assert client.delete(f"/patient_records/{july_b['id']}").status_code == 200
+    assert by_doctor(client, doctor)[0] == ("2030-07-01", 1, 150.0, 70.0, bmi(70, 150))
+
+    r = client.post("/patient_records/bulk", json=[
+        {"patient_id": patient["id"], "doctor_id": doctor["id"], "date": "2030-07-09", "weight_lb": 160},
+    ])
+    assert r.json()[0]["id"]
+    assert by_doctor(client, doctor)[0][:3] == ("2030-07-01", 2, 155.0)
+
+    assert client.delete(f"/patient_records/{july_a['id']}").status_code == 200
+    assert by_doctor(client, doctor)[0][:3] == ("2030-07-01", 1, 160.0)
+
+
+def test_diagnosis_keys_are_normalized_and_patient_deletes_subtract(client, doctor):
+    patient = client.post("/patients", json={"first_name": "Vit", "last_name": "Als"}).json()
+    add(client, patient["id"], None, "2031-01-10", 60, 120, diagnosis="Rollup  Test")
+    add(client, patient["id"], doctor["id"], "2031-01-11", 60, 130, diagnosis="rollup test")
+    points = rollups(client, by="diagnosis", key="ROLLUP test")
+    assert [(p["key"], p["records"], p["avg_weight_lb"]) for p in points] == [("rollup test", 2, 125.0)]
+
+    assert client.delete(f"/patients/{patient['id']}").status_code == 200
+    assert rollups(client, by="diagnosis", key="rollup test") == []
+    assert by_doctor(client, doctor) == []
+
+
+def test_deleting_a_doctor_drops_their_rollups_only(client, patient, doctor):
+    add(client, patient["id"], doctor["id"], "2032-02-02", 65, 140, diagnosis="doctor-drop-test")
+    assert client.delete(f"/doctors/{doctor['id']}").status_code == 200
+    assert by_doctor(client, doctor) == []
+    assert [p["records"] for p in rollups(client, by="diagnosis", key="doctor-drop-test")] == [1]
+
+
+def test_patient_series(client, patient):
+    add(client, patient["id"], None, "2033-01-02", 70, 150)
+    add(client, patient["id"], None, "2033-01-01", 70, 160)
+    add(client, patient["id"], None, "2033-01-03")  # no vitals: skipped
+    points = client.get(f"/vitals/patients/{patient['id']}", params={"from": "2033-01-01"}).json()
+    assert [(p["date"], p["weight_change_lb"]) for p in points] == [("2033-01-01", None), ("2033-01-02", -10)]
+    assert client.get("/vitals/patients/999999999").status_code == 404
@@ -28,3 +28,21 @@ export async function api(path: string, options: RequestInit = {}) {
   }
   return res.json();
 }
+
+// List endpoints return one page (100 rows by default) and send the cursor
+// for the next one in X-Next-Cursor; this follows it and returns every row.
+export async function apiList(path: string) {
+  const sep = path.includes("?") ? "&" : "?";
+  const rows: any[] = [];
+  let cursor: string | null = null;
+  do {
+    const query = `${sep}limit=1000` + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : "");
+    const res = await fetch(`${API}${path}${query}`);
+    if (!res.ok) {
+      throw new Error((await res.text().catch(() => "")) || `${res.status} ${res.statusText}`);
+    }
+    rows.push(...(await res.json()));
+    cursor = res.headers.get("X-Next-Cursor");
+  } while (cursor);
+  return rows;
+}
@@ -1,6 +1,6 @@
 // frontend/src/pages/Appointments.tsx
 import { useState, useEffect } from "react";
-import { api } from "../lib/api";
+import { api, apiList } from "../lib/api";
 import {
   CalendarDaysIcon,
   PhoneIcon,
@@ -41,9 +41,9 @@ export default function Appointments() {
   const refresh = async () => {
     try {
       const [appointments, doctors, pts] = await Promise.all([
-        api("/appointments"),
-        api("/doctors"),
-        api("/patients"),
+        apiList("/appointments"),
+        apiList("/doctors"),
+        apiList("/patients"),
       ]);
       setList(appointments);
       setDocs(doctors);
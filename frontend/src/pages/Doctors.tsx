@@ -1,5 +1,5 @@
 import { useEffect, useState } from 'react'
-import { api } from '../lib/api'
+import { api, apiList } from '../lib/api'
 import { showToast } from '../lib/toast'
 
 type Doctor = {
@@ -17,7 +17,7 @@ export default function Doctors() {
 
   const refresh = async () => {
     try {
-      const doctors = await api('/doctors')
+      const doctors = await apiList('/doctors')
       setList(doctors)
     } catch (err) {
       console.error(err)
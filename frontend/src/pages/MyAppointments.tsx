@@ -1,5 +1,5 @@
 import { useEffect, useState } from 'react'
-import { api } from '../lib/api'
+import { api, apiList } from '../lib/api'
 import { showToast } from '../lib/toast'
 
 type Appointment = {
@@ -14,7 +14,7 @@ export default function MyAppointments() {
 
   const refresh = async () => {
     try {
-      const appointments = await api('/appointments')
+      const appointments = await apiList('/appointments')
       setList(appointments)
     } catch (err) {
       console.error(err)
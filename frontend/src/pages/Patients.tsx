@@ -1,5 +1,5 @@
 import { useEffect, useState } from 'react'
-import { api } from '../lib/api'
+import { api, apiList } from '../lib/api'
 import { showToast } from '../lib/toast'
 
 type Patient = {
@@ -38,7 +38,7 @@ export default function Patients() {
 
   const loadPatientsAndDoctors = async () => {
     try {
-      const [pts, docs] = await Promise.all([api('/patients'), api('/doctors')])
+      const [pts, docs] = await Promise.all([apiList('/patients'), apiList('/doctors')])
       setPatients(pts)
       setDoctors(docs)
     } catch (err) {
@@ -27,7 +27,7 @@ resource "aws_lb_target_group" "main" {
     healthy_threshold   = 2
     interval            = 30
     matcher             = "200"
-    path                = "/"
+    path                = "/readyz"
     port                = "traffic-port"
     protocol            = "HTTP"
     timeout             = 10
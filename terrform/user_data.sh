@@ -126,11 +126,40 @@ DB_USER="${db_username}"
 DB_PASSWORD="${db_password}"
 DATABASE_URL="postgresql+psycopg2://$${DB_USER}:$${DB_PASSWORD}@$${RDS_ENDPOINT}:5432/$${DB_NAME}"
 
+# Schema migrations (app/migrate.py): the app doesn't migrate Postgres at
+# startup, so a one-shot unit applies them once per boot (each deploy replaces
+# the instance), and the API and worker only start after it succeeded
+MIGRATE_DEPS=""
+if [ "$${APP_MODULE}" = "app.main:app" ]; then
+cat > /etc/systemd/system/healthcare-migrate.service << SERVICEEOF
+[Unit]
+Description=Healthcare Backend Schema Migration
+After=network-online.target
+Wants=network-online.target
+
+[Service]
+Type=oneshot
+RemainAfterExit=yes
+User=ec2-user
+WorkingDirectory=/opt/healthcare-app
+Environment="PATH=/opt/healthcare-app/.venv/bin"
+Environment="DATABASE_URL=$${DATABASE_URL}"
+Environment="PYTHONPATH=/opt/healthcare-app"
+ExecStart=/opt/healthcare-app/.venv/bin/python -m app.migrate
+
+[Install]
+WantedBy=multi-user.target
+SERVICEEOF
+MIGRATE_DEPS="Requires=healthcare-migrate.service
+After=healthcare-migrate.service"
+fi
+
 # Create systemd service
 cat > /etc/systemd/system/healthcare-backend.service << SERVICEEOF
 [Unit]
 Description=Healthcare Backend FastAPI Application
 After=network.target
+$${MIGRATE_DEPS}
 
 [Service]
 Type=simple
@@ -139,6 +168,8 @@ WorkingDirectory=/opt/healthcare-app
 Environment="PATH=/opt/healthcare-app/.venv/bin"
 Environment="DATABASE_URL=$${DATABASE_URL}"
 Environment="PYTHONPATH=/opt/healthcare-app"
+# rate limits key on the client address the ALB appends to X-Forwarded-For
+Environment="RATE_LIMIT_PROXY_HOPS=1"
 ExecStart=/opt/healthcare-app/.venv/bin/uvicorn $${APP_MODULE} --host 0.0.0.0 --port 8000
 Restart=always
 RestartSec=10
@@ -147,10 +178,43 @@ RestartSec=10
 WantedBy=multi-user.target
 SERVICEEOF
 
+# Background job worker (appointment reminders); only the full backend has one
+if [ "$${APP_MODULE}" = "app.main:app" ]; then
+cat > /etc/systemd/system/healthcare-worker.service << SERVICEEOF
+[Unit]
+Description=Healthcare Backend Job Worker
+After=network.target
+$${MIGRATE_DEPS}
+
+[Service]
+Type=simple
+User=ec2-user
+WorkingDirectory=/opt/healthcare-app
+Environment="PATH=/opt/healthcare-app/.venv/bin"
+Environment="DATABASE_URL=$${DATABASE_URL}"
+Environment="PYTHONPATH=/opt/healthcare-app"
+ExecStart=/opt/healthcare-app/.venv/bin/python -m app.worker --processes 2
+Restart=always
+RestartSec=10
+
+[Install]
+WantedBy=multi-user.target
+SERVICEEOF
+fi
+
 # Start the service
 systemctl daemon-reload
+if [ -f /etc/systemd/system/healthcare-migrate.service ]; then
+    systemctl enable healthcare-migrate
+    # fails the script (set -e) rather than starting the API on an old schema
+    systemctl start healthcare-migrate
+fi
 systemctl enable healthcare-backend
 systemctl start healthcare-backend
+if [ -f /etc/systemd/system/healthcare-worker.service ]; then
+    systemctl enable healthcare-worker
+    systemctl start healthcare-worker
+fi
 
 echo "Application deployed and started successfully!"
 